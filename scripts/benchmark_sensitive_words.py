@@ -0,0 +1,96 @@
+"""敏感词匹配性能对比：逐词正则 vs AC自动机
+
+用法: python scripts/benchmark_sensitive_words.py
+"""
+import re
+import sys
+import random
+import time
+
+sys.path.insert(0, '.')
+
+from src.utils.aho_corasick import AhoCorasick, normalize_text
+
+# 用常用汉字随机组词，保证词表规模可控且可复现
+CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理世"
+SIZES = [100, 1000, 10000]
+MESSAGE_COUNT = 2000
+
+
+def build_words(count: int, rng: random.Random) -> list:
+    """生成 count 个 2-4 字的随机词"""
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(CHARS) for _ in range(rng.randint(2, 4))))
+    return list(words)
+
+
+def build_messages(words: list, rng: random.Random) -> list:
+    """生成测试消息，约10%包含插入了符号的敏感词"""
+    messages = []
+    for _ in range(MESSAGE_COUNT):
+        text = "".join(rng.choice(CHARS) for _ in range(rng.randint(10, 60)))
+        if rng.random() < 0.1:
+            word = rng.choice(words)
+            position = rng.randint(0, len(text))
+            text = text[:position] + " ".join(word) + text[position:]
+        messages.append(text)
+    return messages
+
+
+def regex_matcher(words: list):
+    """旧实现：每个词一个正则，逐个匹配"""
+    patterns = []
+    for word in words:
+        pattern = ''.join([f'{char}[\\s\\W]*' for char in word])
+        pattern = pattern.rstrip('[\\s\\W]*')
+        patterns.append(re.compile(pattern, re.IGNORECASE))
+
+    def match(text: str) -> list:
+        return [words[i] for i, pattern in enumerate(patterns) if pattern.search(text)]
+    return match
+
+
+def ac_matcher(words: list):
+    """新实现：规范化后AC自动机单次扫描"""
+    automaton = AhoCorasick()
+    for word in words:
+        automaton.add(normalize_text(word), word)
+    automaton.build()
+
+    def match(text: str) -> list:
+        return automaton.find_all(normalize_text(text))
+    return match
+
+
+def run(match, messages: list) -> tuple:
+    """执行匹配并计时，返回 (每条耗时微秒, 命中消息数)"""
+    start = time.perf_counter()
+    hits = sum(1 for text in messages if match(text))
+    elapsed = time.perf_counter() - start
+    return elapsed / len(messages) * 1_000_000, hits
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'词数':>6} | {'正则(us/条)':>12} | {'AC(us/条)':>10} | {'加速比':>7} | 命中数(正则/AC)")
+    print("-" * 64)
+    for size in SIZES:
+        words = build_words(size, rng)
+        messages = build_messages(words, rng)
+
+        start = time.perf_counter()
+        regex = regex_matcher(words)
+        regex_build = time.perf_counter() - start
+        start = time.perf_counter()
+        ac = ac_matcher(words)
+        ac_build = time.perf_counter() - start
+
+        regex_us, regex_hits = run(regex, messages)
+        ac_us, ac_hits = run(ac, messages)
+        print(f"{size:>6} | {regex_us:>12.1f} | {ac_us:>10.1f} | {regex_us / ac_us:>6.1f}x | {regex_hits}/{ac_hits}"
+              f"  (构建: 正则 {regex_build * 1000:.0f}ms, AC {ac_build * 1000:.0f}ms)")
+
+
+if __name__ == '__main__':
+    main()
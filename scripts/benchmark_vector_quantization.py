@@ -0,0 +1,110 @@
+"""向量量化召回率对比：float32 精确检索 vs float16 / int8 量化 + 全精度重排
+
+向量文件始终保存全精度，同一份数据用不同的量化方式重新打开即可对比。
+以 float32 精确检索的结果为基准，报告 Recall@k、检索耗时和内存矩阵大小，用于选择
+memory.vector_db.local.quantization 和 rerank_factor。
+
+用法: python scripts/benchmark_vector_quantization.py [--size 100000] [--dim 1536] [--k 5] [--index data/vectors]
+      （指定 --index 时使用已有的本地向量库数据，查询为库中随机向量加少量噪声）
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from src.memory.vector_index import LocalVectorIndex
+
+# (量化方式, 重排倍数)
+SETTINGS = [
+    ("none", 1),
+    ("float16", 1), ("float16", 2), ("float16", 4),
+    ("int8", 1), ("int8", 2), ("int8", 4), ("int8", 8),
+]
+QUERY_COUNT = 200
+BATCH_SIZE = 5000
+
+
+def build_synthetic(path: str, size: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """写入带聚类结构的随机向量（比纯高斯噪声更接近真实 embedding），返回查询向量"""
+    centers = rng.standard_normal((max(1, size // 500), dim)).astype(np.float32)
+    index = LocalVectorIndex(path)
+    for start in range(0, size, BATCH_SIZE):
+        count = min(BATCH_SIZE, size - start)
+        vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+        index.add_many(
+            (f"m{start + i}", vectors[i], "", {"session_id": f"group:{(start + i) % 10}", "timestamp": ""})
+            for i in range(count)
+        )
+    index.close()
+    return centers[rng.integers(0, len(centers), QUERY_COUNT)] + 0.5 * rng.standard_normal((QUERY_COUNT, dim)).astype(np.float32)
+
+
+def sample_queries(path: str, rng: np.random.Generator) -> np.ndarray:
+    """从已有向量中抽样并加噪声作为查询"""
+    index = LocalVectorIndex(path)
+    vectors = index._exact()
+    rows = np.sort(rng.choice(len(vectors), size=min(QUERY_COUNT, len(vectors)), replace=False))
+    queries = np.asarray(vectors[rows])
+    noise = 0.05 * float(queries.std())
+    index.close()
+    return queries + noise * rng.standard_normal(queries.shape).astype(np.float32)
+
+
+def run(path: str, queries: np.ndarray, k: int, quantization: str, rerank_factor: int):
+    """用指定量化方式打开索引并执行全部查询"""
+    start = time.perf_counter()
+    index = LocalVectorIndex(path, quantization=quantization, rerank_factor=rerank_factor)
+    load_seconds = time.perf_counter() - start
+
+    results, timings = [], []
+    for query in queries:
+        t = time.perf_counter()
+        results.append([r['id'] for r in index.query(query, k)])
+        timings.append(time.perf_counter() - t)
+    stats = index.get_stats()
+    index.close()
+    timings.sort()
+    return results, timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000, stats['matrix_mb'], load_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量量化召回率对比")
+    parser.add_argument("--size", type=int, default=100000, help="合成数据的向量条数")
+    parser.add_argument("--dim", type=int, default=1536, help="合成数据的向量维度（text-embedding-v1 为1536）")
+    parser.add_argument("--k", type=int, default=5, help="Recall@k 的 k（对应 vector_db.search_results）")
+    parser.add_argument("--index", help="使用已有的本地向量库目录（会先复制一份，不修改原数据）")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    workdir = tempfile.mkdtemp(prefix="bench_quant_")
+    path = f"{workdir}/vectors"
+    try:
+        if args.index:
+            shutil.copytree(args.index, path)
+            queries = sample_queries(path, rng)
+        else:
+            print(f"生成 {args.size} 条 {args.dim} 维向量...")
+            queries = build_synthetic(path, args.size, args.dim, rng)
+
+        baseline = None
+        print(f"{'量化':<10}{'重排倍数':>8}{f'Recall@{args.k}':>12}{'检索p50(ms)':>14}{'检索p95(ms)':>14}"
+              f"{'内存矩阵(MB)':>14}{'加载(秒)':>10}")
+        for quantization, rerank_factor in SETTINGS:
+            results, p50, p95, matrix_mb, load_seconds = run(path, queries, args.k, quantization, rerank_factor)
+            if baseline is None:
+                baseline = results
+            hits = sum(len(set(expected) & set(found)) for expected, found in zip(baseline, results))
+            total = sum(len(expected) for expected in baseline)
+            print(f"{quantization:<10}{rerank_factor:>8}{hits / total:>12.4f}{p50:>14.2f}{p95:>14.2f}"
+                  f"{matrix_mb:>14}{load_seconds:>10.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
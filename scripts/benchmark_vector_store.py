@@ -0,0 +1,144 @@
+"""向量库性能对比：Chroma vs 本地向量索引（写入/检索耗时、常驻内存）
+
+每个 后端×规模 在独立子进程中运行，常驻内存（RSS）互不影响。
+1536维、100万条的向量本身约 6GB，Chroma 在大规模下写入很慢，可以用 --chroma-max 跳过。
+
+用法: python scripts/benchmark_vector_store.py [--sizes 10000,100000,1000000] [--dim 1536] [--chroma-max 100000]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+
+import numpy as np
+
+QUERY_COUNT = 100
+BATCH_SIZE = 5000
+
+
+def make_batch(rng: np.random.Generator, start: int, count: int, dim: int):
+    """生成一批随机向量和元数据（10个群、200个发送者）"""
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    items = []
+    for i in range(count):
+        n = start + i
+        items.append((f"m{n}", vectors[i], f"消息{n}", {
+            "sender_id": str(n % 200),
+            "sender_name": f"群友{n % 200}",
+            "chat_type": "group",
+            "session_id": f"group:{n % 10}",
+            "timestamp": f"2026-10-{1 + n % 28:02d}T12:00:00",
+        }))
+    return items
+
+
+def open_backend(backend: str, path: str, index: str):
+    """创建存储后端"""
+    if backend == "chroma":
+        from src.memory.vector_store import ChromaBackend
+        return ChromaBackend(path)
+    from src.memory.vector_index import LocalVectorIndex
+    return LocalVectorIndex(path, index=index, ivf_min_size=50000)
+
+
+def worker(backend: str, size: int, dim: int, index: str) -> dict:
+    """子进程：写入 size 条向量后测检索耗时和内存"""
+    import psutil
+    process = psutil.Process()
+    rng = np.random.default_rng(42)
+    path = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        store = open_backend(backend, path, index)
+        base_rss = process.memory_info().rss
+
+        start = time.perf_counter()
+        for offset in range(0, size, BATCH_SIZE):
+            batch = make_batch(rng, offset, min(BATCH_SIZE, size - offset), dim)
+            if backend == "chroma":
+                store.collection.add(
+                    ids=[item[0] for item in batch],
+                    embeddings=np.stack([item[1] for item in batch]),
+                    documents=[item[2] for item in batch],
+                    metadatas=[item[3] for item in batch]
+                )
+            else:
+                store.add_many(batch)
+        add_seconds = time.perf_counter() - start
+
+        queries = rng.standard_normal((QUERY_COUNT, dim)).astype(np.float32)
+        latencies = {}
+        for name, filters in (("all", {}), ("session", {"session_id": "group:3"})):
+            timings = []
+            for query in queries:
+                t = time.perf_counter()
+                store.query(query.tolist(), 5, **filters)
+                timings.append(time.perf_counter() - t)
+            timings.sort()
+            latencies[name] = {
+                "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+                "p95_ms": round(timings[int(len(timings) * 0.95)] * 1000, 2),
+            }
+        rss = process.memory_info().rss
+
+        # 重新打开（模拟重启）的耗时
+        del store
+        start = time.perf_counter()
+        store = open_backend(backend, path, index)
+        store.query(queries[0], 5)
+        reopen_seconds = time.perf_counter() - start
+
+        return {
+            "backend": backend if backend == "chroma" else f"local-{index}",
+            "size": size,
+            "add_per_sec": round(size / add_seconds),
+            "query": latencies,
+            "rss_mb": round(rss / 1024 / 1024),
+            "rss_growth_mb": round((rss - base_rss) / 1024 / 1024),
+            "reopen_s": round(reopen_seconds, 2),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量库性能对比")
+    parser.add_argument("--sizes", default="10000,100000", help="向量条数，逗号分隔")
+    parser.add_argument("--dim", type=int, default=1536, help="向量维度（text-embedding-v1 为1536）")
+    parser.add_argument("--chroma-max", type=int, default=100000, help="超过该规模时跳过 Chroma")
+    parser.add_argument("--worker", nargs=3, metavar=("BACKEND", "SIZE", "INDEX"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        backend, size, index = args.worker
+        print(json.dumps(worker(backend, int(size), args.dim, index)))
+        return
+
+    print(f"{'后端':<12}{'条数':>10}{'写入/秒':>10}{'检索p50':>10}{'检索p95':>10}"
+          f"{'会话过滤p50':>12}{'RSS(MB)':>10}{'增长(MB)':>10}{'重开(秒)':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        runs = [("local", "flat"), ("local", "ivf")]
+        if size <= args.chroma_max:
+            runs.insert(0, ("chroma", "-"))
+        for backend, index in runs:
+            output = subprocess.run(
+                [sys.executable, __file__, "--dim", str(args.dim), "--worker", backend, str(size), index],
+                capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"}
+            )
+            if output.returncode != 0:
+                print(f"{backend:<12}{size:>10}  运行失败: {output.stderr.strip().splitlines()[-1][:200]}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{result['backend']:<12}{size:>10}{result['add_per_sec']:>10}"
+                  f"{result['query']['all']['p50_ms']:>10}{result['query']['all']['p95_ms']:>10}"
+                  f"{result['query']['session']['p50_ms']:>12}{result['rss_mb']:>10}"
+                  f"{result['rss_growth_mb']:>10}{result['reopen_s']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,8 @@ def clear_memory():
             # 清空对话上下文
             cursor.execute("DELETE FROM conversation_context")
             context_count = cursor.rowcount
+            cursor.execute("DELETE FROM context_message")
+            cursor.execute("DELETE FROM conversation_summary")
             print(f"   ✅ 已清空对话上下文表 (删除 {context_count} 条记录)")
             
             # 清空聊天记录
@@ -51,24 +53,23 @@ def clear_memory():
     
     # 2. 清空向量数据库
     print("\n2. 清空向量数据库...")
-    chroma_dir = Path("data/chroma")
-    
-    if chroma_dir.exists():
+    for vector_dir in (Path("data/chroma"), Path("data/vectors")):
+        if not vector_dir.exists():
+            print(f"   ℹ️  向量数据库目录不存在，跳过: {vector_dir}")
+            continue
         try:
-            # 删除整个chroma目录
-            shutil.rmtree(chroma_dir)
-            print(f"   ✅ 已删除向量数据库目录: {chroma_dir}")
+            # 删除整个目录
+            shutil.rmtree(vector_dir)
+            print(f"   ✅ 已删除向量数据库目录: {vector_dir}")
             
             # 重新创建空目录
-            chroma_dir.mkdir(parents=True, exist_ok=True)
+            vector_dir.mkdir(parents=True, exist_ok=True)
             print(f"   ✅ 已重新创建空的向量数据库目录")
             
         except Exception as e:
             print(f"   ❌ 清空向量数据库失败: {e}")
             logger.error(f"清空向量数据库失败: {e}", exc_info=True)
             return False
-    else:
-        print(f"   ℹ️  向量数据库目录不存在，跳过")
     
     # 3. 验证群友数据是否保留
     print("\n3. 验证群友数据...")
@@ -90,9 +91,9 @@ def clear_memory():
     print("  • 群友信息 (group_member 表)")
     print("  • 群友昵称、生日、备注等")
     print("\n已清空的数据:")
-    print("  • 对话上下文 (conversation_context 表)")
+    print("  • 对话上下文 (conversation_context、context_message、conversation_summary 表)")
     print("  • 聊天记录 (chat_log 表)")
-    print("  • 向量记忆 (data/chroma/ 目录)")
+    print("  • 向量记忆 (data/chroma/、data/vectors/ 目录)")
     print()
     
     return True
@@ -0,0 +1,86 @@
+"""训练本地内容审核模型
+
+训练数据：moderation_cache 表中记录的AI审核结论（不当 / 正常）。
+表里只有AI成功给出的结论；本地模型直接判断、AI调用失败、跳过审核的消息都不在其中，
+聊天记录也不作为正常样本，避免模型自己漏判的内容被当作正常样本反复强化。
+
+用法: python scripts/train_moderation_model.py [--holdout 0.2]
+"""
+import sys
+import random
+import argparse
+
+sys.path.insert(0, '.')
+
+from src.memory.database import get_database
+from src.utils.config import get_config
+from src.utils.moderation_model import NgramNaiveBayes
+
+
+def load_samples() -> list:
+    """从数据库读取AI审核结论作为训练样本 [(文本, 是否不当)]"""
+    db = get_database()
+    samples = {}
+    with db.get_connection() as conn:
+        table = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'moderation_cache'"
+        ).fetchone()
+        if table:
+            for row in conn.execute("SELECT text, flagged FROM moderation_cache WHERE text IS NOT NULL AND text != ''"):
+                samples[row["text"]] = bool(row["flagged"])
+
+    return list(samples.items())
+
+
+def evaluate(model: NgramNaiveBayes, samples: list, flag_threshold: float, clean_threshold: float) -> None:
+    """评估：本地能直接判断的比例，以及其中判断错误的比例"""
+    decided = wrong = 0
+    for text, flagged in samples:
+        probability = model.predict_proba(text)
+        if probability >= flag_threshold or probability <= clean_threshold:
+            decided += 1
+            if (probability >= flag_threshold) != flagged:
+                wrong += 1
+    total = len(samples)
+    print(f"   本地直接判断: {decided}/{total} ({decided / total:.1%})，需要AI审核: {total - decided}")
+    if decided:
+        print(f"   本地判断错误: {wrong}/{decided} ({wrong / decided:.2%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练本地内容审核模型")
+    parser.add_argument("--holdout", type=float, default=0.2, help="留出评估的样本比例")
+    args = parser.parse_args()
+
+    config = get_config()
+    path = config.get("content_filter.local_model.path", "data/moderation_model.json")
+    flag_threshold = config.get("content_filter.local_model.flag_threshold", 0.98)
+    clean_threshold = config.get("content_filter.local_model.clean_threshold", 0.02)
+
+    print("=" * 60)
+    print("训练本地内容审核模型")
+    print("=" * 60)
+
+    samples = load_samples()
+    flagged_count = sum(1 for _, flagged in samples if flagged)
+    print(f"1. 样本数: {len(samples)}（不当 {flagged_count}，正常 {len(samples) - flagged_count}）")
+    if not flagged_count or flagged_count == len(samples):
+        print("   ❌ 需要同时有不当和正常样本，请在积累更多AI审核结论后再训练")
+        return
+
+    random.Random(42).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    train_samples, test_samples = samples[:split], samples[split:]
+
+    if test_samples:
+        print(f"2. 留出评估（训练 {len(train_samples)} / 评估 {len(test_samples)}）:")
+        evaluate(NgramNaiveBayes().train(train_samples), test_samples, flag_threshold, clean_threshold)
+
+    # 最终模型使用全部样本
+    model = NgramNaiveBayes().train(samples)
+    model.save(path)
+    print(f"3. ✅ 模型已保存: {path}（{len(model.counts)} 个特征）")
+
+
+if __name__ == '__main__':
+    main()
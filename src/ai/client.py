@@ -1,11 +1,14 @@
 """AI客户端"""
-import time
-from typing import List, Dict, Optional
-from openai import OpenAI
+import asyncio
+from typing import AsyncIterator, List, Dict, Optional, Sequence
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError
 
 from src.utils.logger import get_logger
 from src.utils.config import get_config
 from src.ai.prompts import get_system_prompt
+from src.ai.streaming import SentenceChunker
 
 logger = get_logger("ai")
 
@@ -19,15 +22,18 @@ class AIClient:
         
         # 从配置文件读取参数
         self.max_retries: int = self.config.get("ai.max_retries", 3)
-        self.retry_delays: List[int] = self.config.get("ai.retry_delays", [1, 3, 5])
+        self.retry_delays: Sequence[int] = self.config.get("ai.retry_delays", [1, 3, 5])
         self.default_temperature: float = self.config.get("ai.temperature", 0.7)
         self.max_tokens: int = self.config.get("ai.max_tokens", 500)
+        self.timeout: float = self.config.get("ai.timeout", 60)
+        self.max_connections: int = self.config.get("ai.max_connections", 20)
+        self.stream_min_chars: int = self.config.get("ai.stream.min_chunk_chars", 8)
         
         # 初始化客户端
         self._init_client()
     
     def _init_client(self) -> None:
-        """初始化OpenAI客户端"""
+        """初始化OpenAI异步客户端（共享HTTP连接池）"""
         if self.provider == "deepseek":
             api_key = self.config.get_env("DEEPSEEK_API_KEY")
             base_url = self.config.get_env("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
@@ -42,10 +48,24 @@ class AIClient:
         if not api_key or api_key == "your_api_key_here":
             raise ValueError(f"请配置{self.provider.upper()}_API_KEY")
         
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        # 所有请求共享同一个连接池，避免每次对话重新握手
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            timeout=self.timeout
+        )
+        # 重试由 chat() 自己处理，关闭SDK内置重试避免重复等待
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0
+        )
         logger.info(f"AI客户端初始化完成: {self.provider}")
     
-    def chat(self, 
+    async def chat(self, 
              messages: List[Dict[str, str]], 
              temperature: Optional[float] = None, 
              search_context: Optional[str] = None, 
@@ -69,21 +89,12 @@ class AIClient:
         if temperature is None:
             temperature = self.default_temperature
         
-        # 添加系统提示词
-        system_prompt = get_system_prompt(chat_type, sender_qq)
-        
-        # 如果有搜索上下文，添加到系统提示词中
-        if search_context:
-            system_prompt += f"\n\n【实时信息】\n以下是联网搜索获取的实时信息，请基于这些信息回答，但保持你的人设和语气：\n{search_context}"
-        
-        full_messages = [
-            {"role": "system", "content": system_prompt}
-        ] + messages
+        full_messages = self._build_messages(messages, search_context, chat_type, sender_qq)
         
         # 重试机制
         for attempt in range(self.max_retries):
             try:
-                response = self.client.chat.completions.create(
+                response = await self.client.chat.completions.create(
                     model=self.model,
                     messages=full_messages,
                     temperature=temperature,
@@ -95,54 +106,38 @@ class AIClient:
                 
                 # 检查是否需要自动搜索
                 if enable_auto_search and not search_context and self._should_auto_search(reply, messages):
-                    logger.info("检测到AI无法回答，尝试联网搜索")
-                    # 获取用户的最后一条消息
-                    user_message = None
-                    for msg in reversed(messages):
-                        if msg.get("role") == "user":
-                            user_message = msg.get("content")
-                            break
-                    
-                    if user_message:
-                        # 导入 web_search（避免循环导入）
-                        from src.utils.web_search import get_web_search_client
-                        web_search_client = get_web_search_client()
-                        
-                        # 执行搜索
-                        search_result = web_search_client.search(user_message)
-                        if search_result:
-                            logger.info("搜索成功，使用搜索结果重新生成回复")
-                            # 递归调用，但禁用自动搜索避免无限循环
-                            return self.chat(
-                                messages=messages,
-                                temperature=temperature,
-                                search_context=search_result,
-                                chat_type=chat_type,
-                                sender_qq=sender_qq,
-                                enable_auto_search=False  # 禁用自动搜索
-                            )
-                        else:
-                            logger.warning("搜索失败，返回原始回复")
+                    search_result = await self._auto_search(messages)
+                    if search_result:
+                        logger.info("搜索成功，使用搜索结果重新生成回复")
+                        # 递归调用，但禁用自动搜索避免无限循环
+                        return await self.chat(
+                            messages=messages,
+                            temperature=temperature,
+                            search_context=search_result,
+                            chat_type=chat_type,
+                            sender_qq=sender_qq,
+                            enable_auto_search=False  # 禁用自动搜索
+                        )
                 
                 return reply
             
-            except ConnectionError as e:
-                logger.warning(f"AI连接失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
+            except (APITimeoutError, TimeoutError) as e:
+                logger.warning(f"AI请求超时 (尝试 {attempt + 1}/{self.max_retries}): {e}")
                 if attempt < self.max_retries - 1:
                     delay = self.retry_delays[attempt]
-                    logger.debug(f"等待 {delay} 秒后重试...")
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                 else:
-                    logger.error("AI连接持续失败，降级回复")
+                    logger.error("AI请求持续超时，降级回复")
                     return self._fallback_reply()
             
-            except TimeoutError as e:
-                logger.warning(f"AI请求超时 (尝试 {attempt + 1}/{self.max_retries}): {e}")
+            except (APIConnectionError, ConnectionError) as e:
+                logger.warning(f"AI连接失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
                 if attempt < self.max_retries - 1:
                     delay = self.retry_delays[attempt]
-                    time.sleep(delay)
+                    logger.debug(f"等待 {delay} 秒后重试...")
+                    await asyncio.sleep(delay)
                 else:
-                    logger.error("AI请求持续超时，降级回复")
+                    logger.error("AI连接持续失败，降级回复")
                     return self._fallback_reply()
             
             except ValueError as e:
@@ -157,13 +152,150 @@ class AIClient:
                 logger.error(f"AI调用未知错误 (尝试 {attempt + 1}/{self.max_retries}): {e}", exc_info=True)
                 if attempt < self.max_retries - 1:
                     delay = self.retry_delays[attempt]
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                 else:
                     logger.critical("AI调用连续失败，降级回复")
                     return self._fallback_reply()
         
         return None
     
+    async def chat_stream(self,
+                          messages: List[Dict[str, str]],
+                          temperature: Optional[float] = None,
+                          search_context: Optional[str] = None,
+                          chat_type: str = "group",
+                          sender_qq: Optional[str] = None,
+                          enable_auto_search: bool = True) -> AsyncIterator[str]:
+        """流式聊天请求，按句子逐段产出回复
+        
+        参数同 chat()。只在第一段发出前重试；第一句就表明AI答不上来时，
+        丢弃这次生成，联网搜索后重新生成。
+        
+        Yields:
+            完整的句子块
+        """
+        if temperature is None:
+            temperature = self.default_temperature
+        
+        full_messages = self._build_messages(messages, search_context, chat_type, sender_qq)
+        
+        for attempt in range(self.max_retries):
+            chunker = SentenceChunker(self.stream_min_chars)
+            emitted = False
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=full_messages,
+                    temperature=temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True
+                )
+                
+                async for event in stream:
+                    if not event.choices:
+                        continue
+                    delta = event.choices[0].delta.content
+                    if not delta:
+                        continue
+                    
+                    for chunk in chunker.feed(delta):
+                        if (not emitted and enable_auto_search and not search_context
+                                and self._should_auto_search(chunk, messages)):
+                            search_result = await self._auto_search(messages)
+                            if search_result:
+                                await stream.close()
+                                logger.info("搜索成功，使用搜索结果重新生成回复")
+                                async for retry_chunk in self.chat_stream(
+                                    messages=messages,
+                                    temperature=temperature,
+                                    search_context=search_result,
+                                    chat_type=chat_type,
+                                    sender_qq=sender_qq,
+                                    enable_auto_search=False
+                                ):
+                                    yield retry_chunk
+                                return
+                            # 搜索失败则继续使用原回复，后续句子不再检查
+                            enable_auto_search = False
+                        
+                        emitted = True
+                        yield chunk
+                
+                rest = chunker.flush()
+                if rest:
+                    if not emitted and enable_auto_search and not search_context and self._should_auto_search(rest, messages):
+                        search_result = await self._auto_search(messages)
+                        if search_result:
+                            async for retry_chunk in self.chat_stream(
+                                messages=messages,
+                                temperature=temperature,
+                                search_context=search_result,
+                                chat_type=chat_type,
+                                sender_qq=sender_qq,
+                                enable_auto_search=False
+                            ):
+                                yield retry_chunk
+                            return
+                    yield rest
+                return
+            
+            except Exception as e:
+                if emitted:
+                    # 已经发出的内容无法撤回，不再重试
+                    logger.error(f"AI流式回复中断: {e}")
+                    return
+                
+                logger.warning(f"AI流式请求失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
+                if isinstance(e, (ValueError, KeyError)) or attempt >= self.max_retries - 1:
+                    logger.error("AI流式请求持续失败，降级回复")
+                    yield self._fallback_reply()
+                    return
+                await asyncio.sleep(self.retry_delays[attempt])
+    
+    def _build_messages(self,
+                        messages: List[Dict[str, str]],
+                        search_context: Optional[str],
+                        chat_type: str,
+                        sender_qq: Optional[str]) -> List[Dict[str, str]]:
+        """拼接系统提示词和对话消息"""
+        # 添加系统提示词
+        system_prompt = get_system_prompt(chat_type, sender_qq)
+        
+        # 如果有搜索上下文，添加到系统提示词中
+        if search_context:
+            system_prompt += f"\n\n【实时信息】\n以下是联网搜索获取的实时信息，请基于这些信息回答，但保持你的人设和语气：\n{search_context}"
+        
+        return [
+            {"role": "system", "content": system_prompt}
+        ] + messages
+    
+    async def _auto_search(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        """AI无法回答时，用用户最后一条消息联网搜索
+        
+        Returns:
+            搜索结果，失败返回None
+        """
+        logger.info("检测到AI无法回答，尝试联网搜索")
+        # 获取用户的最后一条消息
+        user_message = None
+        for msg in reversed(messages):
+            if msg.get("role") == "user":
+                user_message = msg.get("content")
+                break
+        
+        if not user_message:
+            return None
+        
+        # 导入 web_search（避免循环导入）
+        from src.utils.web_search import get_web_search_client
+        web_search_client = get_web_search_client()
+        
+        # 执行搜索（带结果缓存，相同的并发搜索共用一次请求）
+        search_result = await web_search_client.search_async(user_message)
+        if not search_result:
+            logger.warning("搜索失败，返回原始回复")
+        return search_result
+    
     def _should_auto_search(self, reply: str, messages: List[Dict[str, str]]) -> bool:
         """判断AI回复是否表明需要联网搜索
         
@@ -210,7 +342,7 @@ class AIClient:
         import random
         return random.choice(fallback_messages)
     
-    def simple_chat(self, message: str) -> Optional[str]:
+    async def simple_chat(self, message: str) -> Optional[str]:
         """简单对话（无上下文）
         
         Args:
@@ -220,7 +352,12 @@ class AIClient:
             AI回复内容
         """
         messages = [{"role": "user", "content": message}]
-        return self.chat(messages)
+        return await self.chat(messages)
+    
+    async def close(self) -> None:
+        """关闭共享的HTTP连接池"""
+        await self.http_client.aclose()
+        logger.info("AI客户端连接池已关闭")
 
 
 # 全局AI客户端实例
@@ -237,3 +374,11 @@ def get_ai_client() -> AIClient:
     if _ai_client is None:
         _ai_client = AIClient()
     return _ai_client
+
+
+async def close_ai_client() -> None:
+    """关闭AI客户端（仅在已创建时）"""
+    global _ai_client
+    if _ai_client is not None:
+        await _ai_client.close()
+        _ai_client = None
@@ -0,0 +1,67 @@
+"""流式回复分句"""
+from typing import List
+
+# 句末标点（中英文），连续出现时视为同一个句尾
+SENTENCE_ENDINGS = "。！？!?~～…\n"
+# 句尾后紧跟的右引号、右括号归到上一句
+CLOSING_MARKS = "”’」』）)】》"
+
+
+class SentenceChunker:
+    """把流式返回的token按句子切分
+
+    每遇到完整的句尾（句末标点后出现了下一句的文字）就切出一段；
+    不足 min_chars 的短句会和下一句合并，避免刷屏式的一字一条。
+    """
+
+    def __init__(self, min_chars: int = 8):
+        self.min_chars = min_chars
+        self._buffer = ""
+        # 下次从缓冲区的哪个位置继续扫描
+        self._pos = 0
+
+    def feed(self, text: str) -> List[str]:
+        """追加一段token，返回已经完整的句子块
+
+        Args:
+            text: 新到达的文本
+
+        Returns:
+            可以发送的句子块列表（可能为空）
+        """
+        self._buffer += text
+        buffer = self._buffer
+        chunks: List[str] = []
+        cut = 0
+        i = self._pos
+
+        while i < len(buffer):
+            if buffer[i] not in SENTENCE_ENDINGS:
+                i += 1
+                continue
+
+            # 找到句尾标点串的结尾（包括省略号、波浪号和右引号）
+            j = i + 1
+            while j < len(buffer) and (buffer[j] in SENTENCE_ENDINGS or buffer[j] in CLOSING_MARKS):
+                j += 1
+            if j == len(buffer):
+                # 标点串可能还没结束，等下一段token
+                break
+
+            if len(buffer[cut:j].strip()) >= self.min_chars:
+                chunk = buffer[cut:j].strip()
+                if chunk:
+                    chunks.append(chunk)
+                cut = j
+            i = j
+
+        self._buffer = buffer[cut:]
+        self._pos = i - cut
+        return chunks
+
+    def flush(self) -> str:
+        """返回剩余的文本（流结束时调用）"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        self._pos = 0
+        return rest
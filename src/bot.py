@@ -16,7 +16,7 @@ from src.utils.config_validator import validate_config, ConfigValidationError
 
 try:
     config = get_config()
-    validate_config(config._config)  # 验证配置
+    validate_config(config.snapshot.data)  # 验证配置
 except ConfigValidationError as e:
     print(f"\n❌ 配置验证失败:\n{e}\n")
     print("请检查 config/config.yaml 和 config/.env 文件")
@@ -57,6 +57,23 @@ async def _():
     logger.info("OneBot V11 WebSocket 服务端已启动，监听端口: 3001")
     logger.info("等待 NapCat 连接到 ws://127.0.0.1:8080/onebot/v11/ws")
 
+# 关闭时释放共享资源
+@driver.on_shutdown
+async def _shutdown():
+    from src.ai.client import close_ai_client
+    from src.memory.embedding import close_embedding_service
+    from src.utils.bilibili_api import close_bilibili_api
+    from src.memory.write_behind import shutdown_write_behind
+    from src.memory.database import close_database
+    from src.memory.vector_store import close_vector_store
+    await close_ai_client()
+    await close_embedding_service()
+    await close_bilibili_api()
+    # 确保排队中的聊天记录和上下文全部落盘
+    shutdown_write_behind()
+    close_vector_store()
+    close_database()
+
 # 先加载触发器模块（在加载其他插件之前）
 nonebot.load_plugin("src.triggers.name")
 nonebot.load_plugin("src.triggers.keyword")
@@ -22,14 +22,14 @@ class ContextEnhancer:
     def enrich(self,
                base_context: List[Dict[str, str]],
                intent_result: Optional[IntentResult] = None,
-               chat_type: str = "group",
+               session_id: str = "default",
                topic_status: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
         """丰富上下文
         
         Args:
             base_context: 基础上下文（来自记忆系统）
             intent_result: 意图分析结果
-            chat_type: 聊天类型
+            session_id: 会话ID
             topic_status: 话题状态
             
         Returns:
@@ -38,7 +38,7 @@ class ContextEnhancer:
         enhanced_context = base_context.copy()
         
         # 获取状态机
-        state_machine = get_state_machine(chat_type)
+        state_machine = get_state_machine(session_id)
         
         # 更新状态
         current_state = state_machine.transition(topic_status)
@@ -57,7 +57,7 @@ class ContextEnhancer:
                     "role": "system",
                     "content": state_prompt
                 })
-                logger.debug(f"[{chat_type}] 添加状态提示: {current_state.value}")
+                logger.debug(f"[{session_id}] 添加状态提示: {current_state.value}")
         
         return enhanced_context
     
@@ -4,6 +4,7 @@ import time
 from typing import Optional, Dict, List, Any
 
 from src.dialogue.dialogue_state import IntentResult, Topic
+from src.utils.cache import LRUCache
 from src.utils.logger import get_logger
 from src.utils.config import get_config
 
@@ -29,7 +30,7 @@ class CounterQuestionDetector:
         ]
         self.compiled_patterns = [re.compile(p, re.IGNORECASE) for p in self.patterns]
         
-        logger.info("反问检测器初始化完成")
+        logger.debug("反问检测器初始化完成")
     
     def detect(self, message: str) -> Optional[Dict[str, Any]]:
         """检测是否为反问
@@ -166,19 +167,20 @@ class TopicTracker:
         self.switch_threshold: int = config.get("switch_threshold", 3)
         self.irrelevant_count: int = 0
         
-        logger.info("话题追踪器初始化完成")
+        logger.debug("话题追踪器初始化完成")
     
-    def update(self, message: str, sender_id: str) -> Dict[str, Any]:
+    def update(self, message: str, sender_id: str, tokens: Optional[List[str]] = None) -> Dict[str, Any]:
         """更新话题状态
         
         Args:
             message: 消息内容
             sender_id: 发送者ID
+            tokens: 已有的分词结果（为None时重新分词）
             
         Returns:
             话题状态
         """
-        keywords = self._extract_keywords(message)
+        keywords = self._extract_keywords(message, tokens)
         
         if self.current_topic is None:
             # 创建新话题
@@ -236,11 +238,12 @@ class TopicTracker:
             "old_topic": old_topic_name
         }
     
-    def _extract_keywords(self, message: str) -> List[str]:
+    def _extract_keywords(self, message: str, tokens: Optional[List[str]] = None) -> List[str]:
         """提取关键词（简化版，使用规则）
         
         Args:
             message: 消息内容
+            tokens: 已有的分词结果（为None时重新分词）
             
         Returns:
             关键词列表
@@ -253,7 +256,7 @@ class TopicTracker:
                     '这', '那', '有', '和', '就', '不', '都', '而', '及', '与',
                     '吗', '呢', '吧', '啊', '哦', '嗯', '哈'}
         
-        words = jieba.lcut(message)
+        words = tokens if tokens is not None else jieba.lcut(message)
         keywords = [w for w in words if len(w) > 1 and w not in stopwords]
         
         # 返回前3个关键词
@@ -288,42 +291,61 @@ class TopicTracker:
 
 
 class IntentAnalyzer:
-    """意图分析器（主类）"""
+    """意图分析器（主类）
+    
+    讽刺检测无状态，全局共用；反问检测和话题追踪依赖对话历史，每个会话各一个。
+    """
     
     def __init__(self):
         self.config = get_config()
         self.intent_config = self.config.get("dialogue_intelligence.intent", {})
         
         # 初始化各个检测器
-        self.counter_question_detector: Optional[CounterQuestionDetector] = None
         self.sarcasm_detector: Optional[SarcasmDetector] = None
-        self.topic_tracker: Optional[TopicTracker] = None
+        self.counter_question_enabled: bool = self.intent_config.get("counter_question", {}).get("enabled", True)
+        self.topic_tracking_enabled: bool = self.intent_config.get("topic_tracking", {}).get("enabled", True)
         
-        # 根据配置初始化
-        if self.intent_config.get("counter_question", {}).get("enabled", True):
-            self.counter_question_detector = CounterQuestionDetector(
-                self.intent_config.get("counter_question", {})
-            )
+        # 每个会话的检测器（只在内存中保留活跃的会话）
+        cache_size = self.config.get("dialogue_intelligence.session_cache_size", 256)
+        self._counter_question_detectors: LRUCache[CounterQuestionDetector] = LRUCache(cache_size)
+        self._topic_trackers: LRUCache[TopicTracker] = LRUCache(cache_size)
         
+        # 根据配置初始化
         if self.intent_config.get("sarcasm_detection", {}).get("enabled", True):
             self.sarcasm_detector = SarcasmDetector(
                 self.intent_config.get("sarcasm_detection", {})
             )
         
-        if self.intent_config.get("topic_tracking", {}).get("enabled", True):
-            self.topic_tracker = TopicTracker(
-                self.intent_config.get("topic_tracking", {})
-            )
-        
         logger.info("意图分析器初始化完成")
     
-    def analyze(self, message: str, sender_id: str = "", context: str = "") -> IntentResult:
+    def get_counter_question_detector(self, session_id: str) -> Optional[CounterQuestionDetector]:
+        """获取会话的反问检测器（未启用时返回None）"""
+        if not self.counter_question_enabled:
+            return None
+        return self._counter_question_detectors.get_or_create(
+            session_id,
+            lambda: CounterQuestionDetector(self.intent_config.get("counter_question", {}))
+        )
+    
+    def get_topic_tracker(self, session_id: str) -> Optional[TopicTracker]:
+        """获取会话的话题追踪器（未启用时返回None）"""
+        if not self.topic_tracking_enabled:
+            return None
+        return self._topic_trackers.get_or_create(
+            session_id,
+            lambda: TopicTracker(self.intent_config.get("topic_tracking", {}))
+        )
+    
+    def analyze(self, message: str, sender_id: str = "", context: str = "",
+                session_id: str = "default", tokens: Optional[List[str]] = None) -> IntentResult:
         """分析消息意图
         
         Args:
             message: 消息内容
             sender_id: 发送者ID
             context: 上下文
+            session_id: 会话ID
+            tokens: 已有的分词结果（为None时重新分词）
             
         Returns:
             意图分析结果
@@ -331,8 +353,9 @@ class IntentAnalyzer:
         result = IntentResult(type="normal")
         
         # 1. 反问检测
-        if self.counter_question_detector:
-            counter_result = self.counter_question_detector.detect(message)
+        counter_question_detector = self.get_counter_question_detector(session_id)
+        if counter_question_detector:
+            counter_result = counter_question_detector.detect(message)
             if counter_result:
                 result.is_counter_question = True
                 result.type = "counter_question"
@@ -349,8 +372,9 @@ class IntentAnalyzer:
                 logger.debug("意图: 讽刺")
         
         # 3. 话题追踪
-        if self.topic_tracker and sender_id:
-            topic_result = self.topic_tracker.update(message, sender_id)
+        topic_tracker = self.get_topic_tracker(session_id)
+        if topic_tracker and sender_id:
+            topic_result = topic_tracker.update(message, sender_id, tokens)
             if topic_result.get("topic"):
                 result.topic = topic_result["topic"]["name"]
         
@@ -360,24 +384,31 @@ class IntentAnalyzer:
         
         return result
     
-    def register_bot_question(self, question: str, context: Optional[List[str]] = None) -> None:
+    def register_bot_question(self, question: str, context: Optional[List[str]] = None,
+                              session_id: str = "default") -> None:
         """注册机器人发出的问题
         
         Args:
             question: 问题内容
             context: 上下文
+            session_id: 会话ID
         """
-        if self.counter_question_detector:
-            self.counter_question_detector.register_question(question, context)
+        counter_question_detector = self.get_counter_question_detector(session_id)
+        if counter_question_detector:
+            counter_question_detector.register_question(question, context)
     
-    def get_current_topic(self) -> Optional[str]:
+    def get_current_topic(self, session_id: str = "default") -> Optional[str]:
         """获取当前话题名称
         
+        Args:
+            session_id: 会话ID
+            
         Returns:
             话题名称或None
         """
-        if self.topic_tracker and self.topic_tracker.current_topic:
-            return self.topic_tracker.current_topic.name
+        topic_tracker = self.get_topic_tracker(session_id)
+        if topic_tracker and topic_tracker.current_topic:
+            return topic_tracker.current_topic.name
         return None
     
     def _is_question(self, message: str) -> bool:
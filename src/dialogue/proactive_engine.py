@@ -4,6 +4,7 @@ import random
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
+from src.utils.cache import LRUCache
 from src.utils.logger import get_logger
 from src.utils.config import get_config
 
@@ -26,7 +27,7 @@ class ColdDetector:
         }
         self.last_message_time: Dict[str, float] = {}
         
-        logger.info("冷场检测器初始化完成")
+        logger.debug("冷场检测器初始化完成")
     
     def check(self, group_id: str) -> Optional[Dict[str, Any]]:
         """检查群是否冷场
@@ -51,7 +52,7 @@ class ColdDetector:
         else:
             level = "severe"
         
-        logger.info(f"检测到冷场: {level} (持续 {duration:.0f}秒)")
+        logger.info(f"[群{group_id}] 检测到冷场: {level} (持续 {duration:.0f}秒)")
         
         return {
             "is_cold": True,
@@ -82,7 +83,7 @@ class InterjectionJudge:
         
         self.recent_actions: List[Dict[str, Any]] = []
         
-        logger.info("插话判断器初始化完成")
+        logger.debug("插话判断器初始化完成")
     
     def should_interject(self, context: Dict[str, Any]) -> float:
         """判断是否应该插话
@@ -183,7 +184,7 @@ class TopicGenerator:
         self.recent_exclusion_hours: int = config.get("recent_exclusion_hours", 24)
         self.preset_topics = self._load_preset_topics()
         
-        logger.info(f"话题生成器初始化完成，预设话题数: {len(self.preset_topics)}")
+        logger.debug(f"话题生成器初始化完成，预设话题数: {len(self.preset_topics)}")
     
     def generate(self, mood: str = "calm", active_users: Optional[List[str]] = None) -> Optional[str]:
         """生成合适的主动话题
@@ -300,7 +301,10 @@ class TopicGenerator:
 
 
 class ProactiveEngine:
-    """主动对话引擎（主类）"""
+    """主动对话引擎（主类）
+    
+    冷场检测按群记录时间；插话冷却和最近话题每个群各自独立，互不影响。
+    """
     
     def __init__(self):
         self.config = get_config()
@@ -308,8 +312,13 @@ class ProactiveEngine:
         
         # 初始化各个组件
         self.cold_detector: Optional[ColdDetector] = None
-        self.interjection_judge: Optional[InterjectionJudge] = None
-        self.topic_generator: Optional[TopicGenerator] = None
+        self.interject_enabled: bool = self.proactive_config.get("interject", {}).get("enabled", True)
+        self.topic_generation_enabled: bool = self.proactive_config.get("topic_generation", {}).get("enabled", True)
+        
+        # 每个群的插话判断器和话题生成器（只在内存中保留活跃的群）
+        cache_size = self.config.get("dialogue_intelligence.session_cache_size", 256)
+        self._interjection_judges: LRUCache[InterjectionJudge] = LRUCache(cache_size)
+        self._topic_generators: LRUCache[TopicGenerator] = LRUCache(cache_size)
         
         # 根据配置初始化
         if self.proactive_config.get("cold_detection", {}).get("enabled", True):
@@ -317,18 +326,26 @@ class ProactiveEngine:
                 self.proactive_config.get("cold_detection", {})
             )
         
-        if self.proactive_config.get("interject", {}).get("enabled", True):
-            self.interjection_judge = InterjectionJudge(
-                self.proactive_config.get("interject", {})
-            )
-        
-        if self.proactive_config.get("topic_generation", {}).get("enabled", True):
-            self.topic_generator = TopicGenerator(
-                self.proactive_config.get("topic_generation", {})
-            )
-        
         logger.info("主动对话引擎初始化完成")
     
+    def get_interjection_judge(self, group_id: str) -> Optional[InterjectionJudge]:
+        """获取群的插话判断器（未启用时返回None）"""
+        if not self.interject_enabled:
+            return None
+        return self._interjection_judges.get_or_create(
+            group_id,
+            lambda: InterjectionJudge(self.proactive_config.get("interject", {}))
+        )
+    
+    def get_topic_generator(self, group_id: str) -> Optional[TopicGenerator]:
+        """获取群的话题生成器（未启用时返回None）"""
+        if not self.topic_generation_enabled:
+            return None
+        return self._topic_generators.get_or_create(
+            group_id,
+            lambda: TopicGenerator(self.proactive_config.get("topic_generation", {}))
+        )
+    
     def check_and_generate(self, group_id: str, mood: str = "calm") -> Optional[str]:
         """检查是否需要主动发言并生成内容
         
@@ -339,7 +356,9 @@ class ProactiveEngine:
         Returns:
             主动消息内容或None
         """
-        if not self.cold_detector or not self.topic_generator or not self.interjection_judge:
+        interjection_judge = self.get_interjection_judge(group_id)
+        topic_generator = self.get_topic_generator(group_id)
+        if not self.cold_detector or not topic_generator or not interjection_judge:
             return None
         
         # 1. 检查冷场
@@ -357,19 +376,19 @@ class ProactiveEngine:
             "is_relevant": False
         }
         
-        probability = self.interjection_judge.should_interject(context)
+        probability = interjection_judge.should_interject(context)
         
         if probability == 0 or random.random() > probability:
             logger.debug(f"插话概率 {probability:.2f}，不发言")
             return None
         
         # 3. 生成话题
-        topic = self.topic_generator.generate(mood=mood)
+        topic = topic_generator.generate(mood=mood)
         
         if topic:
             # 记录行为
-            self.interjection_judge.record_action("proactive_message")
-            logger.info(f"生成主动消息: {topic}")
+            interjection_judge.record_action("proactive_message")
+            logger.info(f"[群{group_id}] 生成主动消息: {topic}")
         
         return topic
     
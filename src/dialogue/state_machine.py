@@ -3,6 +3,7 @@ import time
 from typing import Dict, Any, Optional
 
 from src.dialogue.dialogue_state import DialogueStateEnum, DialogueContext
+from src.utils.cache import LRUCache
 from src.utils.logger import get_logger
 from src.utils.config import get_config
 
@@ -23,7 +24,7 @@ class StateMachine:
         self.opening_messages_threshold: int = 2  # 开启状态需要几条消息进入维持
         self.closing_timeout: int = 300  # 5分钟无消息进入结束状态
         
-        logger.info("对话状态机初始化完成")
+        logger.debug("对话状态机初始化完成")
     
     def transition(self, intent_result: Optional[Dict[str, Any]] = None) -> DialogueStateEnum:
         """状态转换
@@ -110,20 +111,20 @@ class StateMachine:
         logger.info("状态机已重置")
 
 
-# 全局实例（每个聊天类型一个）
-_state_machines: Dict[str, StateMachine] = {}
+# 全局实例（每个会话一个，只在内存中保留活跃的会话）
+_state_machines: Optional[LRUCache[StateMachine]] = None
 
 
-def get_state_machine(chat_type: str = "group") -> StateMachine:
+def get_state_machine(session_id: str) -> StateMachine:
     """获取状态机实例
     
     Args:
-        chat_type: 聊天类型
+        session_id: 会话ID（如 group:123456）
         
     Returns:
         StateMachine实例
     """
     global _state_machines
-    if chat_type not in _state_machines:
-        _state_machines[chat_type] = StateMachine()
-    return _state_machines[chat_type]
+    if _state_machines is None:
+        _state_machines = LRUCache(get_config().get("dialogue_intelligence.session_cache_size", 256))
+    return _state_machines.get_or_create(session_id, StateMachine)
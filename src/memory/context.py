@@ -1,79 +1,214 @@
-"""对话上下文管理"""
-import json
+"""对话上下文管理
+
+每个会话的上下文是一个环形缓冲区（deque）：消息入队时就转换成发给AI的格式并估算token数，
+窗口按token预算裁剪（超出预算时丢弃最早的消息），条数上限只作为兜底。
+落盘时只追加新消息，不再每次重写整个会话。
+窗口超过摘要阈值时，最早的一段对话在后台压缩成摘要（见 src/memory/summarizer.py），以一条系统消息放在窗口前面。
+"""
+import re
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from collections import OrderedDict
+from typing import Deque, List, Dict, Optional, Tuple
 
 from src.memory.database import get_database
+from src.memory.summarizer import get_summarizer
+from src.memory.write_behind import get_write_behind
+from src.utils.cache import LRUCache
 from src.utils.logger import get_logger
 from src.utils.config import get_config
 
 logger = get_logger("context")
 
+# 中日韩文字和全角符号
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uac00-\ud7af\uff00-\uffef]")
+# 每条消息的格式开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+# 摘要消息的开头
+SUMMARY_HEADER = "【之前的对话摘要】\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数（按 DeepSeek 的经验值：中文约0.6个/字，其他字符约0.3个/字）"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+
+class ContextEntry:
+    """上下文中的一条消息（保存原始消息、AI格式和token数）"""
+    __slots__ = ("message", "ai_message", "tokens")
+
+    def __init__(self, message: Dict):
+        self.message = message
+        content = message["content"]
+        # 如果是群聊，添加发送者名称
+        if message.get("name") and message["role"] == "user":
+            content = f"[{message['name']}]: {content}"
+        self.ai_message = {"role": message["role"], "content": content}
+        self.tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+class SessionContext:
+    """单个会话的上下文（环形缓冲区，token数随入队出队增减）"""
+    __slots__ = ("entries", "tokens", "last_active", "summary", "summary_entry")
+
+    def __init__(self, max_messages: int):
+        self.entries: Deque[ContextEntry] = deque(maxlen=max_messages)
+        self.tokens = 0
+        self.last_active = ""
+        self.summary: Optional[str] = None
+        self.summary_entry: Optional[ContextEntry] = None
+
+    @property
+    def total_tokens(self) -> int:
+        """窗口（含摘要）的token数"""
+        return self.tokens + (self.summary_entry.tokens if self.summary_entry else 0)
+
+    def append(self, entry: ContextEntry, max_tokens: int) -> None:
+        """追加消息，超出token预算时丢弃最早的消息（至少保留最新一条）"""
+        if len(self.entries) == self.entries.maxlen:
+            self.tokens -= self.entries[0].tokens
+        self.entries.append(entry)
+        self.tokens += entry.tokens
+        while self.total_tokens > max_tokens and len(self.entries) > 1:
+            self.tokens -= self.entries.popleft().tokens
+
+    def set_summary(self, summary: Optional[str]) -> None:
+        """设置摘要"""
+        self.summary = summary
+        self.summary_entry = ContextEntry({"role": "system", "content": SUMMARY_HEADER + summary}) if summary else None
+
+    def compact(self, span: List[ContextEntry], summary: str) -> int:
+        """用摘要替换窗口开头的一段消息（摘要期间已被丢弃的消息跳过）
+
+        Returns:
+            移除的消息数
+        """
+        removed = 0
+        for entry in span:
+            if self.entries and self.entries[0] is entry:
+                self.tokens -= self.entries.popleft().tokens
+                removed += 1
+        self.set_summary(summary)
+        return removed
+
+    def is_expired(self, timeout_minutes: int) -> bool:
+        """是否已超时"""
+        last_active = datetime.fromisoformat(self.last_active)
+        return datetime.now() - last_active > timedelta(minutes=timeout_minutes)
+
+
 class ContextManager:
-    """对话上下文管理器（优化版：内存缓存）"""
-    
+    """对话上下文管理器（按会话隔离，活跃会话缓存在内存中）"""
+
     def __init__(self):
         self.db = get_database()
         self.config = get_config()
-        self.max_messages = self.config.get("conversation.max_messages", 30)  # 增加到30条
+        self.writer = get_write_behind()
+        self.max_messages = self.config.get("conversation.max_messages", 30)
+        self.max_tokens = self.config.get("conversation.max_context_tokens", 3000)
         self.timeout_minutes = self.config.get("conversation.timeout_minutes", 30)
-        
-        # 内存缓存（LRU）- 核心优化
-        self._cache: OrderedDict[str, Dict] = OrderedDict()
-        self._cache_size = 10  # 缓存最近10个会话
-    
-    def get_context(self, chat_type: str) -> List[Dict]:
-        """获取对话上下文（带缓存）"""
+        self.summarizer = get_summarizer()
+
+        # 活跃会话缓存（LRU，超出容量淘汰最久未活跃的会话）
+        self._cache: LRUCache[SessionContext] = LRUCache(self.config.get("conversation.cache_size", 64))
+
+    def _get_session(self, session_id: str) -> Optional[SessionContext]:
+        """获取会话上下文（带缓存，超时的会话会被清空）"""
         # 1. 先查缓存
-        if chat_type in self._cache:
-            cache_data = self._cache[chat_type]
-            
-            # 检查是否超时
-            last_active = datetime.fromisoformat(cache_data['last_active'])
-            if datetime.now() - last_active <= timedelta(minutes=self.timeout_minutes):
-                # 更新LRU顺序
-                self._cache.move_to_end(chat_type)
-                logger.debug(f"[{chat_type}] 缓存命中")
-                return cache_data['messages']
-            else:
-                # 超时，清除缓存
-                logger.info(f"[{chat_type}] 上下文已超时，清空")
-                del self._cache[chat_type]
-                self.clear_context(chat_type)
-                return []
-        
-        # 2. 缓存未命中，查数据库
-        logger.debug(f"[{chat_type}] 缓存未命中，查询数据库")
+        session = self._cache.get(session_id)
+        if session is not None:
+            logger.debug(f"[{session_id}] 缓存命中")
+        else:
+            # 2. 缓存未命中，从数据库和尚未落盘的消息中恢复
+            session = self._load(session_id)
+            if session is None:
+                return None
+
+        # 检查是否超时
+        if session.is_expired(self.timeout_minutes):
+            logger.info(f"[{session_id}] 上下文已超时，清空")
+            self.clear_context(session_id)
+            return None
+
+        # 3. 加入缓存
+        self._cache.put(session_id, session)
+        return session
+
+    def _load(self, session_id: str) -> Optional[SessionContext]:
+        """从数据库加载会话上下文（叠加尚未落盘的消息）"""
+        # 读库和获取未落盘变化在写入队列的同一把锁内完成，后台提交不会夹在两者之间
+        pending, (messages, last_active, summary) = self.writer.read_context(
+            session_id, lambda pending: self._load_stored(session_id, pending)
+        )
+
+        if pending is not None:
+            messages.extend(pending['messages'])
+            last_active = pending['last_active'] or last_active
+            summary = pending['summary'] or summary
+
+        if not messages or not last_active:
+            return None
+
+        session = SessionContext(self.max_messages)
+        session.set_summary(summary)
+        for message in messages:
+            session.append(ContextEntry(message), self.max_tokens)
+        session.last_active = last_active
+        return session
+
+    def _load_stored(self, session_id: str, pending: Optional[Dict]) -> Tuple[List[Dict], Optional[str], Optional[str]]:
+        """读取已落盘的消息、最后活跃时间和摘要（未落盘的变化里删除过会话时跳过）"""
+        messages: List[Dict] = []
+        last_active = None
+        summary = None
+        if pending is not None and pending['reset']:
+            return messages, last_active, summary
+
+        logger.debug(f"[{session_id}] 缓存未命中，查询数据库")
         with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT messages, last_active FROM conversation_context WHERE chat_type = ?",
-                (chat_type,)
-            )
-            row = cursor.fetchone()
-            
-            if not row:
-                return []
-            
-            # 检查是否超时
-            last_active = datetime.fromisoformat(row["last_active"])
-            if datetime.now() - last_active > timedelta(minutes=self.timeout_minutes):
-                logger.info(f"[{chat_type}] 上下文已超时，清空")
-                self.clear_context(chat_type)
-                return []
-            
-            messages = json.loads(row["messages"])
-            
-            # 3. 加入缓存
-            self._update_cache(chat_type, messages, row["last_active"])
-            
-            return messages
-    
-    def add_message(self, chat_type: str, role: str, content: str, name: Optional[str] = None):
+            row = conn.execute(
+                "SELECT last_active FROM conversation_context WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                return messages, last_active, summary
+            last_active = row["last_active"]
+            rows = conn.execute("""
+                SELECT role, content, name, created_at FROM context_message
+                WHERE session_id = ?
+                ORDER BY id DESC LIMIT ?
+            """, (session_id, self.max_messages)).fetchall()
+            for item in reversed(rows):
+                message = {"role": item["role"], "content": item["content"], "time": item["created_at"]}
+                if item["name"]:
+                    message["name"] = item["name"]
+                messages.append(message)
+            row = conn.execute(
+                "SELECT summary FROM conversation_summary WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            if row is not None:
+                summary = row["summary"]
+        return messages, last_active, summary
+
+    def get_context(self, session_id: str) -> List[Dict]:
+        """获取对话上下文
+
+        Args:
+            session_id: 会话ID（如 group:123456）
+        """
+        session = self._get_session(session_id)
+        if session is None:
+            return []
+        return [entry.message for entry in session.entries]
+
+    def add_message(self, session_id: str, role: str, content: str, name: Optional[str] = None):
         """添加消息到上下文"""
-        messages = self.get_context(chat_type)
-        
+        session = self._get_session(session_id)
+        if session is None:
+            session = SessionContext(self.max_messages)
+            self._cache.put(session_id, session)
+
         # 构建消息
         message = {
             "role": role,
@@ -82,90 +217,75 @@ class ContextManager:
         }
         if name:
             message["name"] = name
-        
-        messages.append(message)
-        
-        # 限制消息数量（保留最近的）
-        if len(messages) > self.max_messages:
-            messages = messages[-self.max_messages:]
-        
-        # 更新缓存和数据库
-        now = datetime.now().isoformat()
-        self._update_cache(chat_type, messages, now)
-        self._save_context(chat_type, messages)
-        
-        logger.info(f"[{chat_type}] 添加消息: {role} - {content[:50]}...")
-    
-    def _update_cache(self, chat_type: str, messages: List[Dict], last_active: str):
-        """更新缓存"""
-        self._cache[chat_type] = {
-            'messages': messages,
-            'last_active': last_active
-        }
-        self._cache.move_to_end(chat_type)
-        
-        # LRU淘汰：超过缓存大小时移除最旧的
-        if len(self._cache) > self._cache_size:
-            removed_key = next(iter(self._cache))
-            self._cache.popitem(last=False)
-            logger.debug(f"[{removed_key}] 从缓存中淘汰")
-    
-    def _save_context(self, chat_type: str, messages: List[Dict]):
-        """保存上下文到数据库"""
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO conversation_context 
-                (chat_type, messages, message_count, last_active, updated_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                chat_type,
-                json.dumps(messages, ensure_ascii=False),
-                len(messages),
-                datetime.now().isoformat(),
-                datetime.now().isoformat()
-            ))
-    
-    def clear_context(self, chat_type: str):
+
+        # 入队（超出条数上限或token预算时丢弃最早的消息）
+        session.append(ContextEntry(message), self.max_tokens)
+        session.last_active = datetime.now().isoformat()
+
+        # 只把新消息交给后台写入
+        self.writer.append_context(session_id, message, session.last_active, len(session.entries))
+
+        logger.info(f"[{session_id}] 添加消息: {role} - {content[:50]}...")
+
+        # 窗口过长时在后台把较早的消息压缩成摘要
+        if self.summarizer.should_summarize(session_id, session.total_tokens, len(session.entries)):
+            self.summarizer.run_in_background(session_id, self.summarize_session(session_id))
+
+    async def summarize_session(self, session_id: str) -> bool:
+        """把会话窗口中除最近几条以外的消息压缩进摘要
+
+        Returns:
+            是否生成了新摘要
+        """
+        session = self._get_session(session_id)
+        if session is None or len(session.entries) <= self.summarizer.keep_recent:
+            return False
+
+        span = list(session.entries)[:len(session.entries) - self.summarizer.keep_recent]
+        summary = await self.summarizer.summarize(session.summary, [entry.message for entry in span])
+        if not summary:
+            return False
+
+        # 摘要期间会话被清空或超时重建时丢弃结果
+        if self._cache.get(session_id) is not session:
+            logger.debug(f"[{session_id}] 会话已变化，丢弃摘要")
+            return False
+
+        removed = session.compact(span, summary)
+        self.writer.save_summary(session_id, summary, len(session.entries))
+        logger.info(f"[{session_id}] 已把 {removed} 条消息压缩成摘要，窗口约 {session.total_tokens} tokens")
+        return True
+
+    def clear_context(self, session_id: str):
         """清空上下文"""
         # 清除缓存
-        if chat_type in self._cache:
-            del self._cache[chat_type]
-            logger.debug(f"[{chat_type}] 从缓存中清除")
-        
-        # 清除数据库
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM conversation_context WHERE chat_type = ?", (chat_type,))
-        
-        logger.info(f"[{chat_type}] 上下文已清空")
-    
+        if self._cache.pop(session_id) is not None:
+            logger.debug(f"[{session_id}] 从缓存中清除")
+
+        # 清除数据库（覆盖尚未落盘的消息）
+        self.writer.delete_context(session_id)
+
+        logger.info(f"[{session_id}] 上下文已清空")
+
     def get_cache_stats(self) -> Dict:
         """获取缓存统计信息（用于调试）"""
         return {
-            'cached_chats': list(self._cache.keys()),
+            'cached_chats': self._cache.keys(),
             'cache_size': len(self._cache),
-            'cache_limit': self._cache_size
+            'cache_limit': self._cache.maxsize,
+            'evictions': self._cache.evictions,
+            'summary': self.summarizer.get_stats()
         }
-    
-    def format_for_ai(self, chat_type: str) -> List[Dict]:
-        """格式化上下文供AI使用"""
-        messages = self.get_context(chat_type)
-        
-        # 转换为AI API格式
-        formatted = []
-        for msg in messages:
-            ai_msg = {
-                "role": msg["role"],
-                "content": msg["content"]
-            }
-            # 如果是群聊，添加发送者名称
-            if "name" in msg and msg["role"] == "user":
-                ai_msg["content"] = f"[{msg['name']}]: {msg['content']}"
-            
-            formatted.append(ai_msg)
-        
-        return formatted
+
+    def format_for_ai(self, session_id: str) -> List[Dict]:
+        """格式化上下文供AI使用（消息入队时已转换好格式，这里只组成新列表，摘要放在最前面）"""
+        session = self._get_session(session_id)
+        if session is None:
+            return []
+        messages = [entry.ai_message for entry in session.entries]
+        if session.summary_entry is not None:
+            messages.insert(0, session.summary_entry.ai_message)
+        return messages
 
 
 # 全局上下文管理器实例
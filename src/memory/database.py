@@ -1,7 +1,11 @@
 """数据库操作"""
+import asyncio
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 from contextlib import contextmanager
 
 from src.utils.logger import get_logger
@@ -9,37 +13,127 @@ from src.utils.logger import get_logger
 logger = get_logger("database")
 
 class Database:
-    """SQLite数据库管理器"""
+    """SQLite数据库管理器
     
-    def __init__(self, db_path: str = "data/bot.db"):
+    每个线程复用一个长连接（WAL模式），避免每次操作都重新打开数据库；
+    异步代码通过 run_async 在专用数据库线程中执行，不阻塞事件循环。
+    """
+    
+    def __init__(self,
+                 db_path: str = "data/bot.db",
+                 busy_timeout_ms: int = 5000,
+                 cache_size_kb: int = 8192,
+                 mmap_size_mb: int = 64,
+                 cached_statements: int = 128):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.cached_statements = cached_statements
+        
+        # 线程本地连接
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        # 异步查询使用的专用数据库线程
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
         self._init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并设置PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        # WAL模式下读写互不阻塞，Web管理界面可以和机器人同时读取
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+    
+    def _thread_connection(self) -> sqlite3.Connection:
+        """获取当前线程的长连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+    
     @contextmanager
     def get_connection(self):
-        """获取数据库连接（上下文管理器）"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """获取数据库连接（上下文管理器）
+        
+        复用当前线程的连接；嵌套使用时只在最外层提交或回滚。
+        """
+        conn = self._thread_connection()
+        self._local.depth += 1
         try:
             yield conn
-            conn.commit()
+            if self._local.depth == 1:
+                conn.commit()
         except Exception as e:
-            conn.rollback()
-            logger.error(f"数据库操作失败: {e}")
+            if self._local.depth == 1:
+                conn.rollback()
+                logger.error(f"数据库操作失败: {e}")
             raise
         finally:
-            conn.close()
+            self._local.depth -= 1
+    
+    async def run_async(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """在专用数据库线程中执行同步函数
+        
+        Args:
+            func: 使用 get_connection 的同步函数
+            
+        Returns:
+            函数返回值
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+    
+    def close(self) -> None:
+        """关闭所有连接和数据库线程"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # 其他线程创建的连接只能在原线程关闭，进程退出时自动释放
+                pass
+        self._local = threading.local()
     
     def _init_database(self):
         """初始化数据库表"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            # 对话上下文表
+            # 旧版本按聊天类型保存上下文，升级为按会话保存
+            self._migrate_sessions(cursor)
+            
+            # 对话上下文表（每个会话一行）
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS conversation_context (
-                    chat_type TEXT PRIMARY KEY,
+                    session_id TEXT PRIMARY KEY,
+                    chat_type TEXT,
                     messages TEXT,
                     message_count INTEGER DEFAULT 0,
                     last_active DATETIME,
@@ -47,10 +141,37 @@ class Database:
                 )
             """)
             
+            # 对话上下文消息表（只追加新消息，超出窗口的旧消息在写入时删除）
+            # 升级前保存在 conversation_context.messages 中的快照不再读取（短期上下文30分钟即过期）
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS context_message (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    role TEXT,
+                    content TEXT,
+                    name TEXT,
+                    created_at DATETIME
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_context_message_session 
+                ON context_message(session_id, id)
+            """)
+            
+            # 会话摘要表（较早的对话压缩成的摘要，每个会话一行）
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_summary (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
             # 聊天记录表
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS chat_log (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT,
                     chat_type TEXT,
                     sender_id TEXT,
                     sender_name TEXT,
@@ -107,6 +228,10 @@ class Database:
                 CREATE INDEX IF NOT EXISTS idx_chat_log_created 
                 ON chat_log(created_at)
             """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chat_log_session 
+                ON chat_log(session_id, created_at)
+            """)
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_group_member_active 
                 ON group_member(is_active)
@@ -117,6 +242,40 @@ class Database:
             """)
             
             logger.info("数据库初始化完成")
+    
+    def _migrate_sessions(self, cursor: sqlite3.Cursor) -> None:
+        """旧表结构升级：chat_log 增加 session_id 列，conversation_context 改为按会话存储"""
+        chat_log_columns = {row[1] for row in cursor.execute("PRAGMA table_info(chat_log)")}
+        if chat_log_columns and "session_id" not in chat_log_columns:
+            cursor.execute("ALTER TABLE chat_log ADD COLUMN session_id TEXT")
+            logger.info("chat_log 已增加 session_id 列")
+        
+        context_columns = {row[1] for row in cursor.execute("PRAGMA table_info(conversation_context)")}
+        if context_columns and "session_id" not in context_columns:
+            # 短期上下文30分钟即过期，直接重建表
+            cursor.execute("DROP TABLE conversation_context")
+            logger.info("conversation_context 已重建为按会话存储")
+    
+    def assign_legacy_sessions(self, session_ids: Dict[str, str]) -> int:
+        """为升级前没有会话ID的聊天记录补上会话ID
+        
+        Args:
+            session_ids: {聊天类型: 会话ID}，旧版本只服务一个群和管理员私聊
+            
+        Returns:
+            更新的记录数
+        """
+        updated = 0
+        with self.get_connection() as conn:
+            for chat_type, session_id in session_ids.items():
+                cursor = conn.execute(
+                    "UPDATE chat_log SET session_id = ? WHERE session_id IS NULL AND chat_type = ?",
+                    (session_id, chat_type)
+                )
+                updated += cursor.rowcount
+        if updated:
+            logger.info(f"已为 {updated} 条旧聊天记录补充会话ID")
+        return updated
 
 
 # 全局数据库实例
@@ -128,5 +287,26 @@ def get_database() -> Database:
     if _database is None:
         from src.utils.config import get_config
         config = get_config()
-        _database = Database(config.database_path)
+        _database = Database(
+            config.database_path,
+            busy_timeout_ms=config.get("database.busy_timeout_ms", 5000),
+            cache_size_kb=config.get("database.cache_size_kb", 8192),
+            mmap_size_mb=config.get("database.mmap_size_mb", 64),
+            cached_statements=config.get("database.cached_statements", 128)
+        )
+        
+        # 旧数据属于唯一的目标群和管理员私聊
+        from src.utils.helpers import make_session_id
+        legacy = {}
+        if config.target_group:
+            legacy["group"] = make_session_id("group", config.target_group)
+        if config.admin_qq:
+            legacy["private"] = make_session_id("private", config.admin_qq)
+        _database.assign_legacy_sessions(legacy)
     return _database
+
+
+def close_database() -> None:
+    """关闭数据库连接（仅在已创建时）"""
+    if _database is not None:
+        _database.close()
@@ -0,0 +1,314 @@
+"""文本向量服务（阿里云Embedding，异步批量 + 持久化缓存）"""
+import asyncio
+import hashlib
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set
+
+import httpx
+
+from src.memory.database import get_database
+from src.utils.cache import LRUCache
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+logger = get_logger("embedding")
+
+EMBEDDING_URL = "https://dashscope.aliyuncs.com/api/v1/services/embeddings/text-embedding/text-embedding"
+
+
+def text_hash(text: str) -> str:
+    """计算文本内容哈希（缓存键）"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """向量缓存（内存LRU + SQLite持久化，按 哈希 + 模型 索引）"""
+
+    def __init__(self, model: str, memory_size: int = 2048):
+        self.db = get_database()
+        self.model = model
+        # 事件循环和数据库线程池都会读写，使用线程安全的LRU
+        self._memory: LRUCache[List[float]] = LRUCache(memory_size)
+        self._init_table()
+
+    def _init_table(self) -> None:
+        """创建缓存表"""
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    text_hash TEXT,
+                    model TEXT,
+                    dim INTEGER,
+                    vector BLOB,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (text_hash, model)
+                )
+            """)
+
+    def get_memory(self, key: str) -> Optional[List[float]]:
+        """只查内存缓存"""
+        return self._memory.get(key)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """从SQLite批量读取向量（命中的同时放入内存缓存）"""
+        if not keys:
+            return {}
+
+        found: Dict[str, List[float]] = {}
+        placeholders = ",".join("?" * len(keys))
+        with self.db.get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})",
+                (self.model, *keys)
+            ).fetchall()
+
+        for row in rows:
+            vector = array("f")
+            vector.frombytes(row["vector"])
+            found[row["text_hash"]] = vector.tolist()
+            self._memory.put(row["text_hash"], found[row["text_hash"]])
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """批量写入向量（float32存储）"""
+        if not vectors:
+            return
+
+        now = datetime.now().isoformat()
+        with self.db.get_connection() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO embedding_cache (text_hash, model, dim, vector, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (key, self.model, len(vector), array("f", vector).tobytes(), now)
+                for key, vector in vectors.items()
+            ])
+
+        for key, vector in vectors.items():
+            self._memory.put(key, vector)
+
+
+class EmbeddingService:
+    """异步向量服务
+
+    - 同一时间窗口内的请求合并为一次API调用（最多 batch_size 条）
+    - 相同文本按内容哈希去重，共享同一个请求（包括已经发出、尚未返回的请求）
+    - 结果写入持久化缓存，重复查询和重启后都不再重新计算
+    """
+
+    def __init__(self) -> None:
+        self.config = get_config()
+        self.api_key = self.config.get_env("DASHSCOPE_API_KEY")
+        self.model: str = self.config.get("memory.embedding.model", "text-embedding-v1")
+        # DashScope 单次最多25条文本
+        self.batch_size: int = min(self.config.get("memory.embedding.batch_size", 25), 25)
+        self.batch_window: float = self.config.get("memory.embedding.batch_window_ms", 20) / 1000
+        self.timeout: float = self.config.get("memory.embedding.timeout", 10)
+
+        self.cache = EmbeddingCache(self.model, self.config.get("memory.embedding.cache_size", 2048))
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+        # 等待批量发送的请求 {哈希: (文本, Future)}
+        self._pending: Dict[str, tuple] = {}
+        # 已发出、尚未返回的请求 {哈希: Future}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'deduplicated': 0,
+            'api_calls': 0,
+            'api_texts': 0,
+            'failures': 0
+        }
+
+        logger.info(f"向量服务初始化完成: {self.model}")
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """获取单条文本的向量
+
+        Args:
+            text: 文本
+
+        Returns:
+            向量，失败返回None
+        """
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """批量获取文本向量（结果顺序与输入一致）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            向量列表，失败的位置为None
+        """
+        keys = [text_hash(text) for text in texts]
+        results: Dict[str, Optional[List[float]]] = {}
+
+        # 1. 内存缓存
+        missing = []
+        for key in dict.fromkeys(keys):
+            vector = self.cache.get_memory(key)
+            if vector is not None:
+                results[key] = vector
+                self._stats['memory_hits'] += 1
+            else:
+                missing.append(key)
+
+        # 2. 磁盘缓存
+        if missing:
+            found = await self.cache.db.run_async(self.cache.get_many, missing)
+            self._stats['disk_hits'] += len(found)
+            results.update(found)
+            missing = [key for key in missing if key not in found]
+
+        # 3. 加入批量队列
+        if missing:
+            texts_by_key = dict(zip(keys, texts))
+            futures = [self._enqueue(key, texts_by_key[key]) for key in missing]
+            for key, vector in zip(missing, await asyncio.gather(*futures)):
+                results[key] = vector
+
+        return [results.get(key) for key in keys]
+
+    def _enqueue(self, key: str, text: str) -> asyncio.Future:
+        """加入待发送队列（相同文本共享一个Future）"""
+        if key in self._pending:
+            self._stats['deduplicated'] += 1
+            return self._pending[key][1]
+        if key in self._inflight:
+            self._stats['deduplicated'] += 1
+            return self._inflight[key]
+
+        self._stats['misses'] += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = (text, future)
+
+        if len(self._pending) >= self.batch_size:
+            self._flush_now()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush_now)
+        return future
+
+    def _flush_now(self) -> None:
+        """立即发送当前队列中的请求"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, {}
+        if batch:
+            for key, (_, future) in batch.items():
+                self._inflight[key] = future
+            task = asyncio.get_running_loop().create_task(self._send_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, batch: Dict[str, tuple]) -> None:
+        """发送一批文本到Embedding API并写入缓存"""
+        keys = list(batch.keys())
+        try:
+            try:
+                vectors = await self._request([batch[key][0] for key in keys])
+            except Exception as e:
+                logger.error(f"调用阿里云Embedding API失败: {e}")
+                vectors = None
+
+            if vectors is None:
+                self._stats['failures'] += len(keys)
+                return
+
+            fresh = dict(zip(keys, vectors))
+            try:
+                await self.cache.db.run_async(self.cache.put_many, fresh)
+            except Exception as e:
+                logger.error(f"写入向量缓存失败: {e}")
+
+            for key in keys:
+                future = batch[key][1]
+                if not future.done():
+                    future.set_result(fresh[key])
+        finally:
+            # 失败或被取消时返回None；之后的相同文本重新排队
+            for key in keys:
+                future = batch[key][1]
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+                if not future.done():
+                    future.set_result(None)
+
+    async def _request(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """调用阿里云API获取一批文本的向量"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=self.timeout)
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": self.model,
+            "input": {
+                "texts": texts
+            }
+        }
+
+        self._stats['api_calls'] += 1
+        self._stats['api_texts'] += len(texts)
+        response = await self._http_client.post(EMBEDDING_URL, headers=headers, json=data)
+
+        if response.status_code != 200:
+            logger.error(f"获取向量失败: {response.status_code} - {response.text}")
+            return None
+
+        embeddings = response.json()['output']['embeddings']
+        # 按 text_index 还原顺序
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for item in embeddings:
+            vectors[item.get('text_index', 0)] = item['embedding']
+        if any(vector is None for vector in vectors):
+            logger.error("Embedding API返回结果数量不匹配")
+            return None
+
+        logger.debug(f"批量获取向量: {len(texts)} 条")
+        return vectors
+
+    def get_stats(self) -> Dict:
+        """获取缓存命中统计"""
+        hits = self._stats['memory_hits'] + self._stats['disk_hits']
+        total = hits + self._stats['misses'] + self._stats['deduplicated']
+        return {
+            **self._stats,
+            'hit_ratio': round(hits / total, 4) if total else 0.0
+        }
+
+    async def close(self) -> None:
+        """关闭HTTP连接"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+# 全局实例
+_embedding_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """获取向量服务实例"""
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+async def close_embedding_service() -> None:
+    """关闭向量服务（仅在已创建时）"""
+    if _embedding_service is not None:
+        await _embedding_service.close()
@@ -1,22 +1,212 @@
-"""群友信息数据库操作"""
+"""群友信息数据库操作
+
+群友信息在内存中缓存（__slots__ 记录），读取时不查库：
+- 发言带来的 last_active、message_count、群名片变化只改内存，由后台写入线程定期批量落盘；
+- 昵称、生日、备注、退群等修改直接写库，并让缓存失效；
+- 缓存有过期时间，网页后台等其他进程对数据库的修改过期后生效。
+"""
+import threading
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict
 from src.memory.database import get_database
+from src.memory.write_behind import get_write_behind
+from src.utils.cache import LRUCache
+from src.utils.config import get_config
 from src.utils.logger import get_logger
 
 logger = get_logger("member_db")
 
+
+class MemberRecord:
+    """group_member 表的一行"""
+    __slots__ = (
+        "qq_id", "qq_name", "group_card", "nickname", "nickname_confirmed",
+        "birthday", "remark", "avatar_url", "is_active", "first_seen",
+        "last_active", "leave_time", "message_count", "created_at", "updated_at",
+    )
+    
+    @classmethod
+    def from_row(cls, row) -> "MemberRecord":
+        """从查询结果创建"""
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, row[name])
+        return record
+    
+    def to_dict(self) -> Dict:
+        """转换为字典（与 SELECT * 的结果相同）"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _Activity:
+    """尚未落盘的发言记录"""
+    __slots__ = ("count", "last_active", "qq_name", "group_card", "avatar_url")
+    
+    def __init__(self):
+        self.count = 0
+        self.last_active = None
+        self.qq_name = None
+        self.group_card = None
+        self.avatar_url = None
+    
+    def record(self, now: str, qq_name: Optional[str], group_card: Optional[str], avatar_url: Optional[str]) -> None:
+        """累计一次发言（名称为空时保留之前的值）"""
+        self.count += 1
+        self.last_active = now
+        self.qq_name = qq_name or self.qq_name
+        self.group_card = group_card or self.group_card
+        self.avatar_url = avatar_url or self.avatar_url
+    
+    def apply(self, record: MemberRecord) -> None:
+        """把未落盘的发言叠加到从数据库读出的记录上"""
+        record.message_count = (record.message_count or 0) + self.count
+        record.last_active = self.last_active
+        record.qq_name = self.qq_name or record.qq_name
+        record.group_card = self.group_card or record.group_card
+        record.avatar_url = self.avatar_url or record.avatar_url
+
+
 class MemberDatabase:
     """群友信息数据库管理"""
     
     def __init__(self):
         self.db = get_database()
+        self.config = get_config()
+        # {QQ号: 群友记录}（不存在的群友不缓存）
+        self._members: LRUCache[MemberRecord] = LRUCache(
+            self.config.get("member_management.cache.max_size", 4096),
+            ttl=self.config.get("member_management.cache.ttl", 300)
+        )
+        # {QQ号: 尚未落盘的发言}
+        self._pending: Dict[str, _Activity] = {}
+        # 缓存和待落盘数据的读写、落盘都在锁内进行，避免读到落盘前后不一致的计数
+        self._lock = threading.RLock()
+        self._stats = {
+            'activity_recorded': 0,
+            'members_flushed': 0,
+            'flushes': 0,
+        }
+        # 昵称、备注等会影响提示词的信息变化时的回调（参数为QQ号）
+        self._listeners: List[Callable[[str], None]] = []
+        
+        # 由后台写入线程定期批量落盘；后台写入关闭时每条发言直接写库
+        self.writer = get_write_behind()
+        self.writer.add_flusher(self.flush)
+    
+    def add_listener(self, callback: Callable[[str], None]) -> None:
+        """注册群友信息变化的回调"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+    
+    def _notify(self, qq_id: str) -> None:
+        """通知群友信息已变化"""
+        for callback in self._listeners:
+            try:
+                callback(str(qq_id))
+            except Exception as e:
+                logger.error(f"群友信息变化回调失败: {e}")
+    
+    def _get_record(self, qq_id: str) -> Optional[MemberRecord]:
+        """读取群友记录（缓存未命中时查库，并叠加未落盘的发言）"""
+        with self._lock:
+            record = self._members.get(qq_id)
+            if record is not None:
+                return record
+            
+            with self.db.get_connection() as conn:
+                row = conn.execute("SELECT * FROM group_member WHERE qq_id = ?", (qq_id,)).fetchone()
+            if row is None:
+                return None
+            
+            record = MemberRecord.from_row(row)
+            activity = self._pending.get(qq_id)
+            if activity is not None:
+                activity.apply(record)
+            self._members.put(qq_id, record)
+            return record
+    
+    def _invalidate(self, qq_id: str) -> None:
+        """直接写库后让缓存失效（下次读取时重新查库）"""
+        with self._lock:
+            self._members.pop(qq_id)
+    
+    def touch(self, qq_id: str, qq_name: str = None, group_card: str = None,
+              avatar_url: str = None) -> bool:
+        """记录一次发言（只更新内存，定期批量落盘）
+        
+        Returns:
+            群友已在缓存中时为True；否则什么都不做，调用方应使用 add_or_update_member
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            record = self._members.get(qq_id)
+            if record is None:
+                return False
+            
+            activity = self._pending.get(qq_id)
+            if activity is None:
+                activity = self._pending[qq_id] = _Activity()
+            activity.record(now, qq_name, group_card, avatar_url)
+            
+            record.message_count = (record.message_count or 0) + 1
+            record.last_active = now
+            record.qq_name = qq_name or record.qq_name
+            record.group_card = group_card or record.group_card
+            record.avatar_url = avatar_url or record.avatar_url
+            self._stats['activity_recorded'] += 1
+        
+        if not self.writer.enabled:
+            self.flush()
+        return True
+    
+    def flush(self) -> int:
+        """把累计的发言批量写入数据库
+        
+        Returns:
+            写入的群友数
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            
+            rows = [
+                (activity.last_active, activity.count, activity.qq_name,
+                 activity.group_card, activity.avatar_url, qq_id)
+                for qq_id, activity in self._pending.items()
+            ]
+            with self.db.get_connection() as conn:
+                conn.executemany("""
+                    UPDATE group_member
+                    SET last_active = ?, message_count = message_count + ?,
+                        qq_name = COALESCE(?, qq_name), group_card = COALESCE(?, group_card),
+                        avatar_url = COALESCE(?, avatar_url)
+                    WHERE qq_id = ?
+                """, rows)
+            self._pending = {}
+            self._stats['members_flushed'] += len(rows)
+            self._stats['flushes'] += 1
+        
+        logger.debug(f"批量更新群友发言: {len(rows)} 人")
+        return len(rows)
+    
+    def get_stats(self) -> Dict:
+        """获取缓存和落盘统计"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            **self._stats,
+            'pending': pending,
+            'cache': self._members.get_stats(),
+        }
     
     def add_or_update_member(self, qq_id: str, qq_name: str = None, 
                             group_card: str = None, nickname: str = None,
                             avatar_url: str = None) -> bool:
-        """添加或更新群友信息"""
+        """添加或更新群友信息（已有群友的普通发言只更新内存）"""
         try:
+            if not nickname and self._get_record(qq_id) is not None:
+                return self.touch(qq_id, qq_name, group_card, avatar_url)
+            
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
                 
@@ -58,8 +248,14 @@ class MemberDatabase:
                         VALUES (?, ?, ?, ?, ?, ?, ?, 1)
                     """, (qq_id, qq_name, group_card, nickname, avatar_url, now, now))
                     logger.info(f"新增群友: {qq_id}")
-                
-                return True
+            
+            # 重新读入缓存，之后的发言走内存
+            self._invalidate(qq_id)
+            self._get_record(qq_id)
+            # 群名片变化不通知（每条消息都会带上），由提示词缓存的过期时间兜底
+            if nickname or not exists:
+                self._notify(qq_id)
+            return True
         except Exception as e:
             logger.error(f"添加/更新群友失败: {e}")
             return False
@@ -67,14 +263,8 @@ class MemberDatabase:
     def get_member(self, qq_id: str) -> Optional[Dict]:
         """获取群友信息"""
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM group_member WHERE qq_id = ?", (qq_id,))
-                row = cursor.fetchone()
-                
-                if row:
-                    return dict(row)
-                return None
+            record = self._get_record(qq_id)
+            return record.to_dict() if record is not None else None
         except Exception as e:
             logger.error(f"获取群友信息失败: {e}")
             return None
@@ -91,7 +281,9 @@ class MemberDatabase:
                     WHERE qq_id = ?
                 """, (nickname, 1 if confirmed else 0, now, qq_id))
                 logger.info(f"设置昵称: {qq_id} -> {nickname}")
-                return True
+            self._invalidate(qq_id)
+            self._notify(qq_id)
+            return True
         except Exception as e:
             logger.error(f"设置昵称失败: {e}")
             return False
@@ -108,7 +300,8 @@ class MemberDatabase:
                     WHERE qq_id = ?
                 """, (birthday, now, qq_id))
                 logger.info(f"设置生日: {qq_id} -> {birthday}")
-                return True
+            self._invalidate(qq_id)
+            return True
         except Exception as e:
             logger.error(f"设置生日失败: {e}")
             return False
@@ -125,7 +318,9 @@ class MemberDatabase:
                     WHERE qq_id = ?
                 """, (remark, now, qq_id))
                 logger.info(f"设置备注: {qq_id}")
-                return True
+            self._invalidate(qq_id)
+            self._notify(qq_id)
+            return True
         except Exception as e:
             logger.error(f"设置备注失败: {e}")
             return False
@@ -142,7 +337,8 @@ class MemberDatabase:
                     WHERE qq_id = ?
                 """, (now, now, qq_id))
                 logger.info(f"标记退群: {qq_id}")
-                return True
+            self._invalidate(qq_id)
+            return True
         except Exception as e:
             logger.error(f"标记退群失败: {e}")
             return False
@@ -166,6 +362,8 @@ class MemberDatabase:
     def get_all_active_members(self) -> List[Dict]:
         """获取所有在群成员"""
         try:
+            # 先落盘累计的发言，保证按发言数排序准确
+            self.flush()
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
@@ -1,11 +1,14 @@
 """统一记忆管理器"""
+import asyncio
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 import hashlib
 
 from src.memory.context import get_context_manager
 from src.memory.database import get_database
 from src.memory.vector_store import get_vector_store
+from src.memory.write_behind import get_write_behind
+from src.utils.helpers import session_chat_type
 from src.utils.logger import get_logger
 from src.utils.config import get_config
 
@@ -19,6 +22,7 @@ class MemoryManager:
         self.config = get_config()
         self.context_manager = get_context_manager()
         self.db = get_database()
+        self.writer = get_write_behind()
         
         # 向量库（可选）
         self.vector_enabled: bool = self.config.get("memory.vector_db.enabled", True)
@@ -31,9 +35,12 @@ class MemoryManager:
                 self.vector_enabled = False
         else:
             logger.info("向量数据库未启用")
+        
+        # 后台写入向量库的任务（保留引用，避免被垃圾回收）
+        self._background_tasks: Set[asyncio.Task] = set()
     
     def add_message(self,
-                    chat_type: str,
+                    session_id: str,
                     role: str,
                     content: str,
                     sender_id: str = "",
@@ -41,7 +48,7 @@ class MemoryManager:
         """添加消息（三层存储）
         
         Args:
-            chat_type: 聊天类型（group/private）
+            session_id: 会话ID（如 group:123456、private:10001）
             role: 角色（user/assistant）
             content: 消息内容
             sender_id: 发送者ID
@@ -50,26 +57,40 @@ class MemoryManager:
         timestamp = datetime.now()
         
         # 1. 短期记忆（内存缓存）
-        self.context_manager.add_message(chat_type, role, content, sender_name)
+        self.context_manager.add_message(session_id, role, content, sender_name)
         
         # 2. 长期记忆（SQLite）
-        self._save_to_database(chat_type, sender_id, sender_name, content, role, timestamp)
+        self._save_to_database(session_id, sender_id, sender_name, content, role, timestamp)
         
-        # 3. 语义记忆（向量库）- 只存储用户消息
+        # 3. 语义记忆（向量库）- 只存储用户消息，后台执行不阻塞回复
         if self.vector_enabled and role == "user" and content.strip():
-            self._save_to_vector(chat_type, sender_id, sender_name, content, timestamp)
+            self._run_in_background(
+                self._save_to_vector(session_id, sender_id, sender_name, content, timestamp)
+            )
+    
+    def _run_in_background(self, coro) -> None:
+        """在事件循环中后台执行协程（没有运行中的事件循环时同步执行）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(coro)
+            return
+        
+        task = loop.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
     
     def _save_to_database(self, 
-                         chat_type: str, 
+                         session_id: str, 
                          sender_id: str, 
                          sender_name: str, 
                          content: str, 
                          role: str, 
                          timestamp: datetime) -> None:
-        """保存到SQLite
+        """保存到SQLite（交给后台批量写入）
         
         Args:
-            chat_type: 聊天类型
+            session_id: 会话ID
             sender_id: 发送者ID
             sender_name: 发送者名称
             content: 消息内容
@@ -77,34 +98,29 @@ class MemoryManager:
             timestamp: 时间戳
         """
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO chat_log 
-                    (chat_type, sender_id, sender_name, message_type, message_content, is_bot, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    chat_type,
-                    sender_id,
-                    sender_name,
-                    "text",
-                    content,
-                    1 if role == "assistant" else 0,
-                    timestamp.isoformat()
-                ))
+            self.writer.add_chat_log((
+                session_id,
+                session_chat_type(session_id),
+                sender_id,
+                sender_name,
+                "text",
+                content,
+                1 if role == "assistant" else 0,
+                timestamp.isoformat()
+            ))
         except Exception as e:
             logger.error(f"保存到数据库失败: {e}")
     
-    def _save_to_vector(self, 
-                       chat_type: str, 
-                       sender_id: str, 
-                       sender_name: str, 
-                       content: str, 
-                       timestamp: datetime) -> None:
+    async def _save_to_vector(self, 
+                              session_id: str, 
+                              sender_id: str, 
+                              sender_name: str, 
+                              content: str, 
+                              timestamp: datetime) -> None:
         """保存到向量库
         
         Args:
-            chat_type: 聊天类型
+            session_id: 会话ID
             sender_id: 发送者ID
             sender_name: 发送者名称
             content: 消息内容
@@ -113,29 +129,29 @@ class MemoryManager:
         try:
             # 生成唯一ID
             chat_id = hashlib.md5(
-                f"{chat_type}_{sender_id}_{timestamp.isoformat()}_{content[:20]}".encode()
+                f"{session_id}_{sender_id}_{timestamp.isoformat()}_{content[:20]}".encode()
             ).hexdigest()
             
-            self.vector_store.add_memory(
+            await self.vector_store.add_memory(
                 chat_id=chat_id,
                 content=content,
                 sender_id=sender_id,
                 sender_name=sender_name,
-                chat_type=chat_type,
+                session_id=session_id,
                 timestamp=timestamp.isoformat()
             )
         except Exception as e:
             logger.error(f"保存到向量库失败: {e}")
     
-    def search_related_memories(self, 
-                                query: str, 
-                                chat_type: str,
-                                n_results: Optional[int] = None) -> str:
-        """搜索相关记忆并格式化
+    async def search_related_memories(self, 
+                                      query: str, 
+                                      session_id: str,
+                                      n_results: Optional[int] = None) -> str:
+        """搜索相关记忆并格式化（只搜索同一会话的记忆）
         
         Args:
             query: 查询文本
-            chat_type: 聊天类型
+            session_id: 会话ID
             n_results: 返回结果数量
             
         Returns:
@@ -152,7 +168,7 @@ class MemoryManager:
         similarity_threshold: float = self.config.get("memory.vector_db.similarity_threshold", 0.5)
         
         try:
-            memories = self.vector_store.search_memory(query, n_results, chat_type)
+            memories = await self.vector_store.search_memory(query, n_results, session_id)
             
             if not memories:
                 return ""
@@ -174,65 +190,85 @@ class MemoryManager:
             logger.error(f"搜索记忆失败: {e}")
             return ""
     
-    def get_context_for_ai(self, chat_type: str, current_query: str = "") -> List[Dict[str, str]]:
+    async def get_context_for_ai(self,
+                                 session_id: str,
+                                 current_query: str = "",
+                                 related_memories: Optional[str] = None) -> List[Dict[str, str]]:
         """获取AI所需的完整上下文
         
         Args:
-            chat_type: 聊天类型
+            session_id: 会话ID
             current_query: 当前查询
+            related_memories: 已经检索好的相关记忆（传入时不再重复检索）
             
         Returns:
             消息列表
         """
         # 1. 获取短期记忆
-        messages = self.context_manager.format_for_ai(chat_type)
+        messages = self.context_manager.format_for_ai(session_id)
         
         # 2. 如果有查询且启用向量库，搜索相关长期记忆
-        if current_query and self.vector_enabled:
-            related_memories = self.search_related_memories(current_query, chat_type)
-            if related_memories:
-                # 在消息开头插入相关记忆
-                messages.insert(0, {
-                    "role": "system",
-                    "content": related_memories
-                })
-                logger.debug(f"[{chat_type}] 注入相关记忆")
+        if related_memories is None and current_query and self.vector_enabled:
+            related_memories = await self.search_related_memories(current_query, session_id)
+        if related_memories:
+            # 在消息开头插入相关记忆
+            messages.insert(0, {
+                "role": "system",
+                "content": related_memories
+            })
+            logger.debug(f"[{session_id}] 注入相关记忆")
         
         return messages
     
-    def get_recent_messages(self, chat_type: str, limit: int = 10) -> List[Dict[str, str]]:
-        """获取最近的消息记录（用于上下文判断）
+    async def get_recent_messages(self, session_id: str, limit: int = 10) -> List[Dict[str, str]]:
+        """获取最近的消息记录（用于上下文判断，包含后台尚未写入数据库的消息）
         
         Args:
-            chat_type: 聊天类型
+            session_id: 会话ID
             limit: 返回消息数量
             
         Returns:
             消息列表，每条消息包含 role, content, sender_name
         """
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT sender_name, message_content, is_bot
-                    FROM chat_log
-                    WHERE chat_type = ?
-                    ORDER BY created_at DESC
-                    LIMIT ?
-                """, (chat_type, limit))
-                
-                rows = cursor.fetchall()
-                messages = []
-                for row in reversed(rows):  # 反转顺序，从旧到新
-                    messages.append({
-                        'sender_name': row[0],
-                        'content': row[1],
-                        'role': 'assistant' if row[2] == 1 else 'user'
-                    })
-                return messages
+            rows = await self.db.run_async(self._load_recent_messages, session_id, limit)
         except Exception as e:
             logger.error(f"获取最近消息失败: {e}")
             return []
+        
+        return [
+            {
+                'sender_name': sender_name,
+                'content': content,
+                'role': 'assistant' if is_bot == 1 else 'user'
+            }
+            for sender_name, content, is_bot, _ in rows
+        ]
+    
+    def _load_recent_messages(self, session_id: str, limit: int) -> List[tuple]:
+        """合并数据库和写入队列中的最近消息（从旧到新）
+        
+        Returns:
+            [(sender_name, content, is_bot, created_at)]
+        """
+        # 先取队列再查数据库：期间落盘的记录会同时出现在两边，按内容去重
+        pending = [
+            (row[3], row[5], row[6], row[7])
+            for row in self.writer.get_pending_chat_logs(session_id)
+        ]
+        with self.db.get_connection() as conn:
+            stored = conn.execute("""
+                SELECT sender_name, message_content, is_bot, created_at
+                FROM chat_log
+                WHERE session_id = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (session_id, limit)).fetchall()
+        
+        stored = [tuple(row) for row in reversed(stored)]
+        written = set(stored)
+        rows = stored + [row for row in pending if row not in written]
+        return rows[-limit:]
     
     def get_stats(self) -> Dict[str, any]:
         """获取记忆统计
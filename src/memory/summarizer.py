@@ -0,0 +1,145 @@
+"""对话滚动摘要
+
+会话窗口的token数超过阈值时，在后台把最早的一段对话连同之前的摘要压缩成一条新摘要，
+不占用回复路径。摘要按会话保存在 SQLite（conversation_summary）中，之后每次请求都复用，
+对话越聊越长时发给AI的上下文长度和响应延迟保持平稳。
+"""
+import asyncio
+import time
+from typing import Any, Coroutine, Dict, List, Optional, Set
+
+from src.utils.config import get_config
+from src.utils.logger import get_logger
+
+logger = get_logger("summarizer")
+
+SUMMARY_PROMPT = """请把下面这段聊天记录压缩成一段摘要，供之后继续聊天时参考。
+
+要求：
+- 保留：谁说了什么关键信息、提到的事实和约定、没有结束的话题、大家的情绪和态度
+- 省略：寒暄、表情、重复的内容
+- 用第三人称客观叙述，"我"指机器人自己，群友用名字称呼
+- 不超过{max_chars}字，只输出摘要本身
+{previous}
+【聊天记录】
+{messages}"""
+
+
+class ConversationSummarizer:
+    """对话摘要生成器（每个会话同一时间只有一个摘要任务）"""
+
+    def __init__(self) -> None:
+        self.config = get_config()
+        self.enabled: bool = self.config.get("conversation.summary.enabled", True)
+        self.trigger_tokens: int = self.config.get("conversation.summary.trigger_tokens", 2000)
+        self.keep_recent: int = self.config.get("conversation.summary.keep_recent", 10)
+        self.max_chars: int = self.config.get("conversation.summary.max_chars", 300)
+
+        # 正在摘要的会话
+        self._running: Set[str] = set()
+        # 后台任务（保留引用，避免被垃圾回收）
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._stats = {
+            'summaries': 0,
+            'failures': 0,
+            'messages_compacted': 0,
+            'seconds': 0.0,
+        }
+
+    def should_summarize(self, session_id: str, tokens: int, message_count: int) -> bool:
+        """窗口是否需要摘要（超过阈值、有可摘要的旧消息、且没有正在进行的摘要）"""
+        return (
+            self.enabled
+            and tokens >= self.trigger_tokens
+            and message_count > self.keep_recent
+            and session_id not in self._running
+        )
+
+    def run_in_background(self, session_id: str, coro: Coroutine[Any, Any, Any]) -> bool:
+        """在事件循环中后台执行摘要任务（没有运行中的事件循环时不执行）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            coro.close()
+            return False
+
+        self._running.add(session_id)
+        task = loop.create_task(coro)
+        self._background_tasks.add(task)
+
+        def done(finished: asyncio.Task) -> None:
+            self._background_tasks.discard(finished)
+            self._running.discard(session_id)
+
+        task.add_done_callback(done)
+        return True
+
+    async def summarize(self, previous: Optional[str], messages: List[Dict]) -> Optional[str]:
+        """把之前的摘要和一段消息压缩成新摘要
+
+        Args:
+            previous: 之前的摘要（没有时为None）
+            messages: 要压缩的消息 {role, content, name}
+
+        Returns:
+            新摘要，失败返回None
+        """
+        lines = []
+        for message in messages:
+            speaker = "我" if message["role"] == "assistant" else message.get("name") or "对方"
+            lines.append(f"{speaker}: {message['content']}")
+        prompt = SUMMARY_PROMPT.format(
+            max_chars=self.max_chars,
+            previous=f"\n【之前的摘要】\n{previous}\n" if previous else "",
+            messages="\n".join(lines)
+        )
+
+        # 导入 AI 客户端（避免循环导入）
+        from src.ai.client import get_ai_client
+        ai_client = get_ai_client()
+
+        start = time.perf_counter()
+        try:
+            # 不带人设提示词，失败时不使用降级回复
+            response = await ai_client.client.chat.completions.create(
+                model=ai_client.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=self.max_chars * 2
+            )
+            summary = (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            self._stats['failures'] += 1
+            logger.error(f"生成对话摘要失败: {e}")
+            return None
+        finally:
+            self._stats['seconds'] += time.perf_counter() - start
+
+        if not summary:
+            self._stats['failures'] += 1
+            return None
+
+        self._stats['summaries'] += 1
+        self._stats['messages_compacted'] += len(messages)
+        return summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取摘要统计"""
+        calls = self._stats['summaries'] + self._stats['failures']
+        return {
+            **self._stats,
+            'running': len(self._running),
+            'avg_seconds': round(self._stats['seconds'] / calls, 3) if calls else 0.0,
+        }
+
+
+# 全局实例
+_summarizer: Optional[ConversationSummarizer] = None
+
+
+def get_summarizer() -> ConversationSummarizer:
+    """获取对话摘要生成器"""
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = ConversationSummarizer()
+    return _summarizer
@@ -0,0 +1,580 @@
+"""本地向量索引（NumPy + SQLite）
+
+Chroma 的替代后端，启动快、内存占用小：
+- 向量：float32 矩阵，追加写入 vectors.f32（每行 dim 个 float32），启动时整体读入内存；
+- 元数据：SQLite（meta.db），行号即矩阵中的行；会话、聊天类型、发送者、时间在内存中另存一份数组用于过滤；
+- 检索：默认精确暴力检索（平方L2距离，与 Chroma 默认一致）；数据量大时可用 IVF
+  （k-means 粗聚类，只在最近的 nprobe 个簇中检索），新向量追加时直接分配到最近的簇，
+  数据量翻倍后重新训练（簇数随之增加）；
+- 删除只做标记，compact() 重写向量文件并重新编号；
+- 量化（可选）：内存中只保留 float16 或 int8（每行一个缩放系数）的矩阵，先用量化向量粗排出
+  n_results × rerank_factor 个候选，再从磁盘上的 float32 向量（内存映射）精确计算距离重排。
+  向量文件始终保存全精度，切换量化方式不需要迁移数据。
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.utils.logger import get_logger
+
+logger = get_logger("vector_index")
+
+# 在内存中编码成整数、用于过滤的元数据字段
+FILTER_FIELDS = ("session_id", "chat_type", "sender_id")
+# 内存矩阵的存储类型
+QUANTIZATION_DTYPES = {"none": np.float32, "float16": np.float16, "int8": np.int8}
+# 量化矩阵分块还原成 float32 计算，限制临时内存
+CHUNK_ROWS = 2048
+# 训练IVF后数据量增长到训练时的多少倍时重新训练（簇数按 sqrt(条数) 随之增加）
+IVF_RETRAIN_GROWTH = 2
+
+
+def _parse_time(value: Optional[str]) -> float:
+    """ISO时间转时间戳（无法解析时为0）"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class LocalVectorIndex:
+    """本地向量索引"""
+
+    def __init__(self,
+                 path: str = "data/vectors",
+                 index: str = "flat",
+                 ivf_min_size: int = 50000,
+                 ivf_nprobe: int = 8,
+                 quantization: str = "none",
+                 rerank_factor: int = 4):
+        if quantization not in QUANTIZATION_DTYPES:
+            raise ValueError(f"不支持的量化方式: {quantization}")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.index = index
+        self.ivf_min_size = ivf_min_size
+        self.ivf_nprobe = ivf_nprobe
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+        # 全精度向量的内存映射（只在量化时用于重排）
+        self._mmap: Optional[np.ndarray] = None
+
+        self._vectors_path = self.path / "vectors.f32"
+        self._centroids_path = self.path / "ivf_centroids.npy"
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(str(self.path / "meta.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS memory (
+                row INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                document TEXT,
+                sender_id TEXT,
+                sender_name TEXT,
+                chat_type TEXT,
+                session_id TEXT,
+                timestamp TEXT,
+                list INTEGER DEFAULT -1,
+                deleted INTEGER DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+        self._load()
+
+    # ==================== 加载 ====================
+
+    def _reset_arrays(self, capacity: int) -> None:
+        """创建空的内存数组"""
+        dim = self.dim or 0
+        self._size = 0
+        self._matrix = np.empty((capacity, dim), dtype=QUANTIZATION_DTYPES[self.quantization])
+        # int8 量化时每行的缩放系数
+        self._scales = np.ones(capacity, dtype=np.float32) if self.quantization == "int8" else None
+        self._norms = np.empty(capacity, dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._lists = np.full(capacity, -1, dtype=np.int32)
+        self._fields = {field: np.zeros(capacity, dtype=np.int32) for field in FILTER_FIELDS}
+        # {字段: {取值: 编码}}
+        self._codes: Dict[str, Dict[str, int]] = {field: {} for field in FILTER_FIELDS}
+
+    def _load(self) -> None:
+        """从磁盘加载向量和元数据（丢弃没有元数据的残留向量）"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self._centroids: Optional[np.ndarray] = None
+        # 上次训练IVF时的条数
+        self._ivf_trained_size = 0
+
+        if self.dim is None:
+            self._reset_arrays(0)
+            return
+
+        file_size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        file_rows = file_size // (self.dim * 4)
+        rows = self._conn.execute("""
+            SELECT row, session_id, chat_type, sender_id, timestamp, list, deleted
+            FROM memory ORDER BY row
+        """).fetchall()
+
+        # 追加向量成功但元数据未提交（或相反）时，以两者都有的部分为准
+        count = min(file_rows, len(rows))
+        if count and rows[count - 1][0] != count - 1:
+            raise RuntimeError(f"向量索引行号不连续: {self.path}")
+        if len(rows) > count:
+            self._conn.execute("DELETE FROM memory WHERE row >= ?", (count,))
+            self._conn.commit()
+        if file_size > count * self.dim * 4:
+            os.truncate(self._vectors_path, count * self.dim * 4)
+            logger.warning(f"向量文件有 {file_rows - count} 行残留数据，已截断")
+
+        self._reset_arrays(count)
+        if self.quantization == "none":
+            # 直接使用读入的数组，不再复制一份
+            self._matrix = np.fromfile(self._vectors_path, dtype=np.float32, count=count * self.dim).reshape(count, self.dim)
+            self._norms[:count] = np.einsum("ij,ij->i", self._matrix, self._matrix)
+        else:
+            # 分块读入并量化，不在内存中保留全精度矩阵
+            exact = self._exact(count)
+            for start in range(0, count, CHUNK_ROWS):
+                chunk = np.asarray(exact[start:start + CHUNK_ROWS])
+                self._store(start, chunk)
+        for position, (_, session_id, chat_type, sender_id, timestamp, ivf_list, deleted) in enumerate(rows[:count]):
+            self._alive[position] = not deleted
+            self._times[position] = _parse_time(timestamp)
+            self._lists[position] = ivf_list
+            for field, value in zip(FILTER_FIELDS, (session_id, chat_type, sender_id)):
+                self._fields[field][position] = self._code(field, value)
+        self._size = count
+
+        if self.index == "ivf" and self._centroids_path.exists():
+            self._centroids = np.load(self._centroids_path)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'ivf_trained_size'").fetchone()
+            # 没有记录时按 簇数 = sqrt(条数) 推算
+            self._ivf_trained_size = int(row[0]) if row else len(self._centroids) ** 2
+            # 训练前（或使用暴力检索时）添加的向量还没有分配簇
+            missing = np.flatnonzero(self._lists[:count] < 0)
+            if len(missing):
+                self._lists[missing] = self._assign(self._exact()[missing])
+                self._conn.executemany(
+                    "UPDATE memory SET list = ? WHERE row = ?",
+                    [(int(self._lists[row]), int(row)) for row in missing]
+                )
+                self._conn.commit()
+        logger.info(f"本地向量索引加载完成: {self.count()} 条 (维度 {self.dim}, 索引 {self.index}, 量化 {self.quantization})")
+
+    def _code(self, field: str, value: Optional[str]) -> int:
+        """元数据取值的整数编码"""
+        codes = self._codes[field]
+        code = codes.get(value or "")
+        if code is None:
+            code = codes[value or ""] = len(codes)
+        return code
+
+    def _exact(self, count: Optional[int] = None) -> np.ndarray:
+        """全精度向量（未量化时就是内存矩阵，否则是向量文件的只读内存映射）"""
+        count = self._size if count is None else count
+        if self.quantization == "none":
+            return self._matrix[:count]
+        if count == 0:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        if self._mmap is None or len(self._mmap) != count:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        return self._mmap
+
+    def _release_mmap(self) -> None:
+        """释放内存映射（改写、截断向量文件前调用，Windows 下文件被映射时无法改写）"""
+        self._mmap = None
+
+    def _store(self, start: int, vectors: np.ndarray) -> None:
+        """把全精度向量写入内存矩阵（按配置量化），并记录精确的平方范数"""
+        end = start + len(vectors)
+        self._norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            self._scales[start:end] = scales
+            self._matrix[start:end] = np.rint(vectors / scales[:, None]).astype(np.int8)
+        else:
+            self._matrix[start:end] = vectors
+
+    # ==================== 写入 ====================
+
+    def _grow(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        """把数组扩容到 capacity 行（保留已有的数据）"""
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:self._size] = array[:self._size]
+        return grown
+
+    def _ensure_capacity(self, needed: int) -> None:
+        """容量不足时扩容（每次增加约1/4，避免大矩阵翻倍占用过多内存）"""
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity + capacity // 4 + 1024)
+        self._matrix = self._grow(self._matrix, capacity)
+        self._norms = self._grow(self._norms, capacity)
+        if self._scales is not None:
+            self._scales = self._grow(self._scales, capacity)
+        self._alive = self._grow(self._alive, capacity)
+        self._times = self._grow(self._times, capacity)
+        self._lists = self._grow(self._lists, capacity)
+        for field in FILTER_FIELDS:
+            self._fields[field] = self._grow(self._fields[field], capacity)
+
+    def add(self, id: str, embedding: Sequence[float], document: str, metadata: Dict[str, Any]) -> bool:
+        """添加一条向量（ID已存在时忽略）
+
+        Returns:
+            是否添加成功
+        """
+        return self.add_many([(id, embedding, document, metadata)]) == 1
+
+    def add_many(self, items: Iterable[Tuple[str, Sequence[float], str, Dict[str, Any]]]) -> int:
+        """批量添加向量（ID已存在的跳过）
+
+        Args:
+            items: (ID, 向量, 原文, 元数据{sender_id, sender_name, chat_type, session_id, timestamp})
+
+        Returns:
+            实际添加的条数
+        """
+        items = list(items)
+        if not items:
+            return 0
+
+        with self._lock:
+            vectors = np.asarray([item[1] for item in items], dtype=np.float32)
+            new_dim = self.dim is None
+            if new_dim:
+                self.dim = vectors.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+                self._reset_arrays(0)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: {vectors.shape[1]} != {self.dim}")
+
+            lists = self._assign(vectors) if self._centroids is not None else np.full(len(items), -1, np.int32)
+
+            # 元数据和向量都写入成功才提交，失败时截断向量文件
+            start = self._size
+            added: List[int] = []
+            try:
+                for position, (item_id, _, document, metadata) in enumerate(items):
+                    cursor = self._conn.execute("""
+                        INSERT OR IGNORE INTO memory
+                        (row, id, document, sender_id, sender_name, chat_type, session_id, timestamp, list)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        start + len(added), item_id, document,
+                        metadata.get("sender_id"), metadata.get("sender_name"),
+                        metadata.get("chat_type"), metadata.get("session_id"),
+                        metadata.get("timestamp"), int(lists[position])
+                    ))
+                    if cursor.rowcount:
+                        added.append(position)
+
+                if added:
+                    self._release_mmap()
+                    with open(self._vectors_path, "ab") as f:
+                        vectors[added].tofile(f)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                if self._vectors_path.exists():
+                    os.truncate(self._vectors_path, start * self.dim * 4)
+                if new_dim:
+                    # 维度随第一批一起回滚，下一批重新确定
+                    self.dim = None
+                    self._reset_arrays(0)
+                raise
+
+            if not added:
+                return 0
+
+            end = start + len(added)
+            self._ensure_capacity(end)
+            self._store(start, vectors[added])
+            self._alive[start:end] = True
+            self._lists[start:end] = lists[added]
+            for offset, position in enumerate(added):
+                metadata = items[position][3]
+                self._times[start + offset] = _parse_time(metadata.get("timestamp"))
+                for field in FILTER_FIELDS:
+                    self._fields[field][start + offset] = self._code(field, metadata.get(field))
+            self._size = end
+
+            if self._ivf_due():
+                self.build_ivf()
+            return len(added)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """标记删除（compact 后才真正释放空间）"""
+        ids = list(ids)
+        with self._lock:
+            rows = []
+            for chunk_start in range(0, len(ids), 500):
+                chunk = ids[chunk_start:chunk_start + 500]
+                rows += [row[0] for row in self._conn.execute(
+                    f"SELECT row FROM memory WHERE deleted = 0 AND id IN ({','.join('?' * len(chunk))})", chunk
+                )]
+            self._conn.executemany("UPDATE memory SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+            self._conn.commit()
+            self._alive[rows] = False
+            return len(rows)
+
+    def compact(self) -> int:
+        """去掉已删除的向量，重写向量文件并重新编号（IVF索引会重新训练）
+
+        Returns:
+            释放的行数
+        """
+        with self._lock:
+            if self.dim is None:
+                return 0
+            keep = np.flatnonzero(self._alive[:self._size])
+            removed = self._size - len(keep)
+            if removed == 0:
+                return 0
+
+            temp_path = self._vectors_path.with_suffix(".tmp")
+            exact = self._exact()
+            with open(temp_path, "wb") as f:
+                for start in range(0, len(keep), CHUNK_ROWS):
+                    np.asarray(exact[keep[start:start + CHUNK_ROWS]]).tofile(f)
+            self._release_mmap()
+            del exact
+            try:
+                self._conn.execute("DELETE FROM memory WHERE deleted = 1")
+                # 按旧行号从小到大改写，新行号不会和未处理的行冲突
+                self._conn.executemany(
+                    "UPDATE memory SET row = ? WHERE row = ?",
+                    [(new, int(old)) for new, old in enumerate(keep) if new != old]
+                )
+                os.replace(temp_path, self._vectors_path)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                temp_path.unlink(missing_ok=True)
+                raise
+
+            count = len(keep)
+            self._matrix[:count] = self._matrix[keep]
+            arrays = [self._norms, self._alive, self._times, self._lists, *self._fields.values()]
+            if self._scales is not None:
+                arrays.append(self._scales)
+            for array in arrays:
+                array[:count] = array[keep]
+            self._alive[count:] = False
+            self._size = count
+
+            if self.index == "ivf" and self._size >= self.ivf_min_size:
+                self.build_ivf()
+            logger.info(f"向量索引压缩完成: 释放 {removed} 行，剩余 {count} 行")
+            return removed
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._conn.execute("DELETE FROM memory")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.commit()
+            self._release_mmap()
+            self._vectors_path.unlink(missing_ok=True)
+            self._centroids_path.unlink(missing_ok=True)
+            self.dim = None
+            self._centroids = None
+            self._ivf_trained_size = 0
+            self._reset_arrays(0)
+
+    # ==================== IVF ====================
+
+    def _ivf_due(self) -> bool:
+        """是否需要（重新）训练IVF：首次达到 ivf_min_size，或数据量已增长到上次训练时的 IVF_RETRAIN_GROWTH 倍"""
+        if self.index != "ivf" or self._size < self.ivf_min_size:
+            return False
+        return self._centroids is None or self._size >= self._ivf_trained_size * IVF_RETRAIN_GROWTH
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """训练IVF粗聚类（在样本上做k-means），并为所有向量分配簇"""
+        with self._lock:
+            count = self._size
+            if count == 0:
+                return
+            n_lists = n_lists or max(1, int(np.sqrt(count)))
+            rng = np.random.default_rng(seed)
+            exact = self._exact()
+            sample = np.asarray(exact[np.sort(rng.choice(count, size=min(count, n_lists * 32), replace=False))])
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+            for _ in range(iterations):
+                labels = self._nearest(sample, centroids)
+                for label in range(n_lists):
+                    members = sample[labels == label]
+                    if len(members):
+                        centroids[label] = members.mean(axis=0)
+
+            self._centroids = centroids
+            self._lists[:count] = self._assign(exact)
+            self._ivf_trained_size = count
+            np.save(self._centroids_path, centroids)
+            self._conn.executemany(
+                "UPDATE memory SET list = ? WHERE row = ?",
+                [(int(label), row) for row, label in enumerate(self._lists[:count])]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('ivf_trained_size', ?)", (str(count),)
+            )
+            self._conn.commit()
+            logger.info(f"IVF索引训练完成: {n_lists} 个簇, {count} 条向量")
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """每个向量最近的中心（平方L2）"""
+        distances = (centroids * centroids).sum(axis=1) - 2 * vectors @ centroids.T
+        return distances.argmin(axis=1).astype(np.int32)
+
+    def _assign(self, vectors: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        """分批为向量分配最近的簇"""
+        return np.concatenate([
+            self._nearest(vectors[start:start + chunk], self._centroids)
+            for start in range(0, len(vectors), chunk)
+        ]) if len(vectors) else np.empty(0, np.int32)
+
+    # ==================== 检索 ====================
+
+    def query(self,
+              embedding: Sequence[float],
+              n_results: int = 5,
+              session_id: Optional[str] = None,
+              chat_type: Optional[str] = None,
+              sender_id: Optional[str] = None,
+              since: Optional[str] = None,
+              until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """检索最相近的向量
+
+        Args:
+            embedding: 查询向量
+            n_results: 返回条数
+            session_id / chat_type / sender_id: 只检索元数据相等的记录
+            since / until: 只检索时间在此范围内的记录（ISO时间，包含端点）
+
+        Returns:
+            [{id, content, sender_name, timestamp, distance}]，按距离从小到大
+        """
+        with self._lock:
+            count = self._size
+            if count == 0 or self.dim is None:
+                return []
+            query = np.asarray(embedding, dtype=np.float32)
+
+            mask = self._alive[:count].copy()
+            for field, value in zip(FILTER_FIELDS, (session_id, chat_type, sender_id)):
+                if value is None:
+                    continue
+                code = self._codes[field].get(value)
+                if code is None:
+                    return []
+                mask &= self._fields[field][:count] == code
+            if since:
+                mask &= self._times[:count] >= _parse_time(since)
+            if until:
+                mask &= self._times[:count] <= _parse_time(until)
+            if self._centroids is not None:
+                # 只检索最近的 nprobe 个簇
+                centroid_distances = (self._centroids * self._centroids).sum(axis=1) - 2 * (self._centroids @ query)
+                probes = np.zeros(len(self._centroids) + 1, dtype=bool)
+                probes[np.argsort(centroid_distances)[:self.ivf_nprobe]] = True
+                # 尚未分配簇的行（-1）落在最后一格，不会被选中
+                mask &= probes[self._lists[:count]]
+
+            candidates = np.flatnonzero(mask)
+            if len(candidates) == 0:
+                return []
+            distances = self._distances(query, None if len(candidates) == count else candidates)
+
+            if self.quantization != "none":
+                # 量化距离粗排出候选，再用全精度向量重排
+                k = min(n_results * self.rerank_factor, len(candidates))
+                top = np.argpartition(distances, k - 1)[:k]
+                candidates = np.sort(candidates[top])
+                distances = ((np.asarray(self._exact()[candidates]) - query) ** 2).sum(axis=1)
+
+            k = min(n_results, len(candidates))
+            top = np.argpartition(distances, k - 1)[:k]
+            top = top[np.argsort(distances[top])]
+            rows = [int(candidates[i]) for i in top]
+            results = {
+                row[0]: row for row in self._conn.execute(
+                    f"SELECT row, id, document, sender_name, timestamp FROM memory WHERE row IN ({','.join('?' * len(rows))})",
+                    rows
+                )
+            }
+
+        return [
+            {
+                'id': results[row][1],
+                'content': results[row][2],
+                'sender_name': results[row][3],
+                'timestamp': results[row][4],
+                'distance': max(float(distances[i]), 0.0),
+            }
+            for row, i in zip(rows, top)
+        ]
+
+    def _distances(self, query: np.ndarray, candidates: Optional[np.ndarray]) -> np.ndarray:
+        """查询向量到候选行（None 表示全部）的平方L2距离（量化时为近似值）"""
+        if self.quantization == "none":
+            if candidates is None:
+                distances = self._norms[:self._size] - 2 * (self._matrix[:self._size] @ query)
+            else:
+                distances = self._norms[candidates] - 2 * (self._matrix[candidates] @ query)
+            return distances + float(query @ query)
+
+        total = self._size if candidates is None else len(candidates)
+        dots = np.empty(total, dtype=np.float32)
+        for start in range(0, total, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, total)
+            block = self._matrix[start:end] if candidates is None else self._matrix[candidates[start:end]]
+            dots[start:end] = block.astype(np.float32) @ query
+        rows = slice(0, total) if candidates is None else candidates
+        if self._scales is not None:
+            dots *= self._scales[rows]
+        return self._norms[rows] - 2 * dots + float(query @ query)
+
+    # ==================== 统计 ====================
+
+    def count(self) -> int:
+        """有效记录数"""
+        return int(self._alive[:self._size].sum())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计"""
+        with self._lock:
+            return {
+                'total_memories': self.count(),
+                'rows': self._size,
+                'deleted': self._size - self.count(),
+                'dim': self.dim,
+                'index': self.index,
+                'quantization': self.quantization,
+                'ivf_lists': 0 if self._centroids is None else len(self._centroids),
+                'ivf_trained_size': self._ivf_trained_size,
+                'matrix_mb': round(self._matrix.nbytes / 1024 / 1024, 1),
+            }
+
+    def close(self) -> None:
+        """关闭元数据库连接"""
+        with self._lock:
+            self._release_mmap()
+            self._conn.close()
@@ -1,26 +1,29 @@
-"""向量数据库管理（使用阿里云Embedding）"""
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Optional
+"""向量数据库管理（使用阿里云Embedding）
+
+存储后端可选（memory.vector_db.backend）：
+- chroma：Chroma 持久化客户端（默认）
+- local：本地 NumPy 向量索引 + SQLite 元数据（见 src/memory/vector_index.py），启动快、内存占用小
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
 from pathlib import Path
-import hashlib
-import requests
 
+from src.memory.embedding import get_embedding_service
+from src.utils.helpers import session_chat_type
 from src.utils.logger import get_logger
 from src.utils.config import get_config
 
 logger = get_logger("vector_store")
 
-class VectorStore:
-    """Chroma向量数据库管理器（阿里云Embedding）"""
+
+class ChromaBackend:
+    """Chroma 存储后端"""
     
-    def __init__(self, persist_dir: str = "data/chroma"):
-        """初始化向量数据库"""
-        self.config = get_config()
-        
-        # 阿里云API配置
-        self.api_key = self.config.get_env("DASHSCOPE_API_KEY")
-        self.embedding_url = "https://dashscope.aliyuncs.com/api/v1/services/embeddings/text-embedding/text-embedding"
+    def __init__(self, persist_dir: str):
+        # 延迟导入，使用本地后端时不加载 chromadb
+        import chromadb
+        from chromadb.config import Settings
         
         # 创建持久化目录
         Path(persist_dir).mkdir(parents=True, exist_ok=True)
@@ -39,69 +42,136 @@ class VectorStore:
             name="chat_memory",
             metadata={"description": "聊天记忆向量库"}
         )
+    
+    def add(self, id: str, embedding: Sequence[float], document: str, metadata: Dict[str, Any]) -> bool:
+        """添加一条记忆"""
+        # 额外保存数字时间戳，用于按时间范围过滤
+        metadata = {**metadata, "ts": datetime.fromisoformat(metadata["timestamp"]).timestamp()}
+        self.collection.add(ids=[id], embeddings=[[float(v) for v in embedding]], documents=[document], metadatas=[metadata])
+        return True
+    
+    def query(self,
+              embedding: Sequence[float],
+              n_results: int = 5,
+              session_id: Optional[str] = None,
+              chat_type: Optional[str] = None,
+              sender_id: Optional[str] = None,
+              since: Optional[str] = None,
+              until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """检索相关记忆（按时间范围过滤时，不含旧版本写入的没有数字时间戳的记录）"""
+        conditions: List[Dict[str, Any]] = [
+            {key: value} for key, value in
+            (("session_id", session_id), ("chat_type", chat_type), ("sender_id", sender_id))
+            if value is not None
+        ]
+        if since:
+            conditions.append({"ts": {"$gte": datetime.fromisoformat(since).timestamp()}})
+        if until:
+            conditions.append({"ts": {"$lte": datetime.fromisoformat(until).timestamp()}})
+        where = conditions[0] if len(conditions) == 1 else ({"$and": conditions} if conditions else None)
+        
+        results = self.collection.query(query_embeddings=[[float(v) for v in embedding]], n_results=n_results, where=where)
         
-        logger.info(f"向量数据库初始化完成，当前记录数: {self.collection.count()}")
+        memories = []
+        if results['documents'] and results['documents'][0]:
+            for i in range(len(results['documents'][0])):
+                memories.append({
+                    'id': results['ids'][0][i],
+                    'content': results['documents'][0][i],
+                    'sender_name': results['metadatas'][0][i]['sender_name'],
+                    'timestamp': results['metadatas'][0][i]['timestamp'],
+                    'distance': results['distances'][0][i]
+                })
+        return memories
     
-    def _get_embedding(self, text: str) -> Optional[List[float]]:
-        """调用阿里云API获取文本向量"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": "text-embedding-v1",
-                "input": {
-                    "texts": [text]
-                }
-            }
-            
-            response = requests.post(
-                self.embedding_url,
-                headers=headers,
-                json=data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                embedding = result['output']['embeddings'][0]['embedding']
-                return embedding
-            else:
-                logger.error(f"获取向量失败: {response.status_code} - {response.text}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"调用阿里云Embedding API失败: {e}")
-            return None
+    def count(self) -> int:
+        """记录数"""
+        return self.collection.count()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            'total_memories': self.collection.count(),
+            'collection_name': self.collection.name,
+        }
     
-    def add_memory(self, 
-                   chat_id: str,
-                   content: str, 
-                   sender_id: str,
-                   sender_name: str,
-                   chat_type: str,
-                   timestamp: str):
+    def close(self) -> None:
+        """释放 Chroma 客户端持有的资源"""
+        self.client.clear_system_cache()
+    
+    def clear(self) -> None:
+        """清空所有记忆"""
+        self.client.delete_collection("chat_memory")
+        self.collection = self.client.get_or_create_collection(
+            name="chat_memory",
+            metadata={"description": "聊天记忆向量库"}
+        )
+
+
+def create_vector_backend(backend: str, config) -> Any:
+    """按配置创建存储后端"""
+    if backend == "local":
+        from src.memory.vector_index import LocalVectorIndex
+        return LocalVectorIndex(
+            config.get("memory.vector_db.local.path", "data/vectors"),
+            index=config.get("memory.vector_db.local.index", "flat"),
+            ivf_min_size=config.get("memory.vector_db.local.ivf_min_size", 50000),
+            ivf_nprobe=config.get("memory.vector_db.local.ivf_nprobe", 8),
+            quantization=config.get("memory.vector_db.local.quantization", "none"),
+            rerank_factor=config.get("memory.vector_db.local.rerank_factor", 4)
+        )
+    if backend == "chroma":
+        return ChromaBackend(config.get("memory.vector_db.persist_dir", "data/chroma"))
+    raise ValueError(f"不支持的向量库后端: {backend}")
+
+
+class VectorStore:
+    """向量数据库管理器（阿里云Embedding）"""
+    
+    def __init__(self):
+        """初始化向量数据库"""
+        self.config = get_config()
+        
+        # 向量服务（批量请求 + 持久化缓存）
+        self.embedding_service = get_embedding_service()
+        
+        self.backend_name: str = self.config.get("memory.vector_db.backend", "chroma")
+        self.backend = create_vector_backend(self.backend_name, self.config)
+        
+        logger.info(f"向量数据库初始化完成 ({self.backend_name})，当前记录数: {self.backend.count()}")
+    
+    async def _get_embedding(self, text: str) -> Optional[List[float]]:
+        """获取文本向量（经过向量服务的缓存和批量合并）"""
+        return await self.embedding_service.embed(text)
+    
+    async def add_memory(self, 
+                         chat_id: str,
+                         content: str, 
+                         sender_id: str,
+                         sender_name: str,
+                         session_id: str,
+                         timestamp: str):
         """添加聊天记忆"""
         try:
             # 获取向量
-            embedding = self._get_embedding(content)
+            embedding = await self._get_embedding(content)
             if not embedding:
                 logger.warning(f"跳过记忆（向量生成失败）: {content[:30]}...")
                 return
             
-            # 存储到向量库
-            self.collection.add(
-                ids=[chat_id],
-                embeddings=[embedding],
-                documents=[content],
-                metadatas=[{
+            # 存储到向量库（同步接口，放到线程中执行）
+            await asyncio.to_thread(
+                self.backend.add,
+                chat_id,
+                embedding,
+                content,
+                {
                     "sender_id": sender_id,
                     "sender_name": sender_name,
-                    "chat_type": chat_type,
+                    "chat_type": session_chat_type(session_id),
+                    "session_id": session_id,
                     "timestamp": timestamp
-                }]
+                }
             )
             
             logger.debug(f"添加记忆: {content[:30]}...")
@@ -109,39 +179,35 @@ class VectorStore:
         except Exception as e:
             logger.error(f"添加记忆失败: {e}")
     
-    def search_memory(self, 
-                      query: str, 
-                      n_results: int = 5,
-                      chat_type: Optional[str] = None) -> List[Dict]:
-        """搜索相关记忆"""
+    async def search_memory(self, 
+                            query: str, 
+                            n_results: int = 5,
+                            session_id: Optional[str] = None,
+                            **filters: Optional[str]) -> List[Dict]:
+        """搜索相关记忆（指定会话时只搜索该会话）
+        
+        Args:
+            query: 查询文本
+            n_results: 返回条数
+            session_id: 只搜索该会话
+            **filters: chat_type、sender_id、since、until（ISO时间）
+        """
         try:
             # 获取查询向量
-            query_embedding = self._get_embedding(query)
+            query_embedding = await self._get_embedding(query)
             if not query_embedding:
                 logger.warning("搜索失败：无法生成查询向量")
                 return []
             
-            # 构建过滤条件
-            where = {"chat_type": chat_type} if chat_type else None
-            
             # 搜索
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where
+            memories = await asyncio.to_thread(
+                self.backend.query,
+                query_embedding,
+                n_results,
+                session_id=session_id,
+                **filters
             )
             
-            # 格式化结果
-            memories = []
-            if results['documents'] and results['documents'][0]:
-                for i in range(len(results['documents'][0])):
-                    memories.append({
-                        'content': results['documents'][0][i],
-                        'sender_name': results['metadatas'][0][i]['sender_name'],
-                        'timestamp': results['metadatas'][0][i]['timestamp'],
-                        'distance': results['distances'][0][i]
-                    })
-            
             logger.info(f"搜索记忆: {query[:30]}... → 找到 {len(memories)} 条")
             return memories
             
@@ -152,18 +218,20 @@ class VectorStore:
     def get_stats(self) -> Dict:
         """获取统计信息"""
         return {
-            'total_memories': self.collection.count(),
-            'collection_name': self.collection.name
+            **self.backend.get_stats(),
+            'backend': self.backend_name,
+            'embedding': self.embedding_service.get_stats()
         }
     
     def clear_all(self):
         """清空所有记忆（慎用）"""
-        self.client.delete_collection("chat_memory")
-        self.collection = self.client.get_or_create_collection(
-            name="chat_memory",
-            metadata={"description": "聊天记忆向量库"}
-        )
+        self.backend.clear()
         logger.warning("向量数据库已清空")
+    
+    def close(self) -> None:
+        """关闭存储后端（关闭时调用）"""
+        self.backend.close()
+        logger.info("向量数据库已关闭")
 
 
 # 全局实例
@@ -175,3 +243,11 @@ def get_vector_store() -> VectorStore:
     if _vector_store is None:
         _vector_store = VectorStore()
     return _vector_store
+
+
+def close_vector_store() -> None:
+    """关闭向量存储（仅在已创建时）"""
+    global _vector_store
+    if _vector_store is not None:
+        _vector_store.close()
+        _vector_store = None
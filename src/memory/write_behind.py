@@ -0,0 +1,383 @@
+"""后台批量写入（write-behind）
+
+回复路径只把待写入的数据放进内存队列，由后台线程定期批量落盘：
+- chat_log：按行排队，每 N 毫秒或攒够 M 行后在一个事务中批量插入
+- 会话上下文：只追加新消息（context_message），同一会话排队中的消息合并为一次写入
+- 其他模块通过 add_flusher 注册的批量写入（如群友发言计数）在同一线程中一起执行
+"""
+import queue
+import atexit
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.memory.database import get_database
+from src.utils.helpers import session_chat_type
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+logger = get_logger("write_behind")
+
+
+def _pending_context(reset: bool = False) -> Dict:
+    """排队中的会话上下文变化
+
+    reset 表示先删除已落盘的上下文和摘要；message_count 为上下文窗口中的消息数，
+    写入后数据库只保留这么多条最近的消息（为None时按 conversation.max_messages）
+    """
+    return {'reset': reset, 'messages': [], 'last_active': None, 'message_count': None, 'summary': None}
+
+
+def _merge_pending(older: Dict, newer: Dict) -> Dict:
+    """合并同一会话先后两次排队的变化（返回新字典；较新的是删除时直接覆盖）"""
+    if newer['reset']:
+        return newer
+    return {
+        'reset': older['reset'],
+        'messages': older['messages'] + newer['messages'],
+        'last_active': newer['last_active'] or older['last_active'],
+        'message_count': older['message_count'] if newer['message_count'] is None else newer['message_count'],
+        'summary': older['summary'] if newer['summary'] is None else newer['summary'],
+    }
+
+
+class WriteBehindQueue:
+    """后台批量写入队列"""
+
+    def __init__(self) -> None:
+        self.config = get_config()
+        self.db = get_database()
+        self.enabled: bool = self.config.get("memory.write_behind.enabled", True)
+        self.flush_interval: float = self.config.get("memory.write_behind.flush_interval_ms", 200) / 1000
+        self.batch_size: int = self.config.get("memory.write_behind.batch_size", 50)
+        self.max_pending: int = self.config.get("memory.write_behind.max_pending", 5000)
+        # 每个会话在数据库中保留的上下文消息数
+        self.context_keep: int = self.config.get("conversation.max_messages", 30)
+
+        # chat_log 待插入行（有界队列）
+        self._rows: "queue.Queue[Tuple]" = queue.Queue(maxsize=self.max_pending)
+        # 写入失败、等待重试的聊天记录（下次落盘时排在队列中的记录前面）
+        self._retry_rows: List[Tuple] = []
+        # 正在写入的一批聊天记录（提交前仍算作未落盘）
+        self._writing_rows: List[Tuple] = []
+        # 会话上下文的待写入变化 {session_id: _pending_context()}
+        self._contexts: Dict[str, Dict] = {}
+        # 正在写入的一批上下文变化（提交前仍算作未落盘）
+        self._writing_contexts: Dict[str, Dict] = {}
+        self._contexts_lock = threading.Lock()
+        # 保证同一时间只有一个线程在落盘
+        self._flush_lock = threading.Lock()
+        # 每次落盘时一起调用的写入函数
+        self._flushers: List[Callable[[], object]] = []
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._stats = {
+            'rows_written': 0,
+            'contexts_written': 0,
+            'contexts_coalesced': 0,
+            'flushes': 0,
+            'rows_retried': 0,
+            'dropped': 0
+        }
+
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            logger.info(f"后台写入已启用 (间隔 {self.flush_interval * 1000:.0f}ms, 批量 {self.batch_size} 行)")
+
+    # ==================== 入队 ====================
+
+    def add_chat_log(self, row: Tuple) -> None:
+        """排队插入一条聊天记录
+
+        Args:
+            row: (session_id, chat_type, sender_id, sender_name, message_type, message_content, is_bot, created_at)
+        """
+        if not self.enabled:
+            self._write_chat_logs([row])
+            return
+
+        try:
+            self._rows.put_nowait(row)
+        except queue.Full:
+            # 队列已满说明磁盘严重跟不上，丢弃而不是阻塞回复
+            self._stats['dropped'] += 1
+            logger.error(f"后台写入队列已满，丢弃聊天记录 (累计 {self._stats['dropped']} 条)")
+            self._wakeup.set()
+            return
+
+        if self._rows.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _queue_context(self, session_id: str, update: Callable[[Dict], None]) -> None:
+        """修改会话排队中的变化（后台写入关闭时立即写入）"""
+        if not self.enabled:
+            pending = _pending_context()
+            update(pending)
+            self._write_contexts({session_id: pending})
+            return
+
+        with self._contexts_lock:
+            pending = self._contexts.get(session_id)
+            if pending is None:
+                pending = self._contexts[session_id] = _pending_context()
+            else:
+                self._stats['contexts_coalesced'] += 1
+            update(pending)
+
+    def append_context(self, session_id: str, message: Dict, last_active: str, message_count: int) -> None:
+        """排队追加一条会话上下文消息（只写入新增的消息）
+
+        Args:
+            session_id: 会话ID
+            message: 消息 {role, content, time, name}
+            last_active: 会话最后活跃时间
+            message_count: 追加后上下文窗口中的消息数
+        """
+        def update(pending: Dict) -> None:
+            pending['messages'].append(message)
+            pending['last_active'], pending['message_count'] = last_active, message_count
+
+        self._queue_context(session_id, update)
+
+    def save_summary(self, session_id: str, summary: str, message_count: int) -> None:
+        """排队保存会话摘要（被摘要的消息随之从数据库中删除）
+
+        Args:
+            session_id: 会话ID
+            summary: 摘要内容
+            message_count: 摘要后上下文窗口中剩余的消息数
+        """
+        def update(pending: Dict) -> None:
+            pending['summary'], pending['message_count'] = summary, message_count
+
+        self._queue_context(session_id, update)
+
+    def delete_context(self, session_id: str) -> None:
+        """排队删除会话上下文和摘要（覆盖尚未写入的变化）"""
+        if not self.enabled:
+            self._write_contexts({session_id: _pending_context(reset=True)})
+            return
+
+        with self._contexts_lock:
+            self._contexts[session_id] = _pending_context(reset=True)
+
+    def get_pending_context(self, session_id: str) -> Optional[Dict]:
+        """获取尚未落盘的会话上下文变化
+
+        Returns:
+            {reset, messages, last_active, message_count, summary} 的副本；没有待写入变化时返回None
+        """
+        with self._contexts_lock:
+            return self._pending_context_locked(session_id)
+
+    def read_context(self, session_id: str, load: Callable[[Optional[Dict]], Any]) -> Tuple[Optional[Dict], Any]:
+        """获取尚未落盘的会话上下文变化，并在同一把锁内调用 load(pending) 读取数据库
+
+        后台线程提交上下文时也持有这把锁，两者看到的是同一时刻的状态：
+        不会出现变化已经提交、却仍被当作未落盘再叠加一次（或者反过来两边都没有）的情况。
+        """
+        with self._contexts_lock:
+            pending = self._pending_context_locked(session_id)
+            return pending, load(pending)
+
+    def _pending_context_locked(self, session_id: str) -> Optional[Dict]:
+        """合并正在写入和排队中的变化（调用方持有 _contexts_lock）"""
+        writing = self._writing_contexts.get(session_id)
+        pending = self._contexts.get(session_id)
+        if writing is not None:
+            pending = writing if pending is None else _merge_pending(writing, pending)
+        if pending is None:
+            return None
+        return {**pending, 'messages': list(pending['messages'])}
+
+    def get_pending_chat_logs(self, session_id: str) -> List[Tuple]:
+        """获取会话尚未落盘的聊天记录（按入队顺序；刚提交的一批可能同时已在数据库中）"""
+        with self._rows.mutex:
+            queued = list(self._rows.queue)
+        return [row for row in (*self._retry_rows, *self._writing_rows, *queued) if row[0] == session_id]
+
+    def add_flusher(self, flusher: Callable[[], object]) -> None:
+        """注册每次落盘时一起调用的写入函数（由调用方自己累计待写入的数据）"""
+        if flusher not in self._flushers:
+            self._flushers.append(flusher)
+
+    # ==================== 落盘 ====================
+
+    def _run(self) -> None:
+        """后台线程：定期或攒够批量后落盘"""
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"后台写入失败: {e}", exc_info=True)
+
+    def flush(self) -> None:
+        """立即写入所有待落盘数据"""
+        with self._flush_lock:
+            rows, self._retry_rows = self._retry_rows, []
+            while True:
+                try:
+                    rows.append(self._rows.get_nowait())
+                except queue.Empty:
+                    break
+
+            with self._contexts_lock:
+                contexts, self._contexts = self._contexts, {}
+                self._writing_contexts = contexts
+
+            for flusher in self._flushers:
+                try:
+                    flusher()
+                except Exception as e:
+                    logger.error(f"后台写入失败: {e}", exc_info=True)
+
+            if not rows and not contexts:
+                return
+
+            self._writing_rows = rows
+            try:
+                if rows:
+                    self._write_chat_logs(rows)
+                    rows = []
+                if contexts:
+                    self._write_contexts(contexts)
+            except Exception:
+                if rows:
+                    self._keep_for_retry(rows)
+                # 写入失败时把上下文变化放回去，排在之后新增的消息前面（之后又删除过的会话不用放回）
+                with self._contexts_lock:
+                    self._writing_contexts = {}
+                    for session_id, pending in contexts.items():
+                        newer = self._contexts.get(session_id)
+                        self._contexts[session_id] = pending if newer is None else _merge_pending(pending, newer)
+                raise
+            finally:
+                self._writing_rows = []
+
+            self._stats['flushes'] += 1
+
+    def _keep_for_retry(self, rows: List[Tuple]) -> None:
+        """保留写入失败的聊天记录，下次落盘时重试（超出队列上限的部分丢弃）"""
+        overflow = len(rows) - self.max_pending
+        if overflow > 0:
+            rows = rows[:self.max_pending]
+            self._stats['dropped'] += overflow
+            logger.error(f"待重试的聊天记录过多，丢弃 {overflow} 条 (累计 {self._stats['dropped']} 条)")
+        self._retry_rows = rows
+        self._stats['rows_retried'] += len(rows)
+        logger.warning(f"聊天记录写入失败，{len(rows)} 条将在下次落盘时重试")
+
+    def _write_chat_logs(self, rows: List[Tuple]) -> None:
+        """在一个事务中批量插入聊天记录"""
+        with self.db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO chat_log
+                (session_id, chat_type, sender_id, sender_name, message_type, message_content, is_bot, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        self._stats['rows_written'] += len(rows)
+        logger.debug(f"批量写入聊天记录: {len(rows)} 条")
+
+    def _write_contexts(self, contexts: Dict[str, Dict]) -> None:
+        """在一个事务中写入会话上下文变化"""
+        now = datetime.now().isoformat()
+        with self.db.get_connection() as conn:
+            for session_id, pending in contexts.items():
+                if pending['reset']:
+                    conn.execute("DELETE FROM context_message WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM conversation_context WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM conversation_summary WHERE session_id = ?", (session_id,))
+
+                if pending['messages']:
+                    conn.executemany("""
+                        INSERT INTO context_message (session_id, role, content, name, created_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, [
+                        (session_id, message['role'], message['content'], message.get('name'), message.get('time'))
+                        for message in pending['messages']
+                    ])
+                    conn.execute("""
+                        INSERT OR REPLACE INTO conversation_context
+                        (session_id, chat_type, messages, message_count, last_active, updated_at)
+                        VALUES (?, ?, NULL, ?, ?, ?)
+                    """, (
+                        session_id,
+                        session_chat_type(session_id),
+                        pending['message_count'],
+                        pending['last_active'],
+                        now
+                    ))
+
+                if pending['summary'] is not None:
+                    conn.execute("""
+                        INSERT OR REPLACE INTO conversation_summary (session_id, summary, updated_at)
+                        VALUES (?, ?, ?)
+                    """, (session_id, pending['summary'], now))
+
+                if pending['messages'] or pending['summary'] is not None:
+                    # 只保留窗口中的消息（超出预算或已被摘要的旧消息删除）
+                    keep = pending['message_count']
+                    keep = self.context_keep if keep is None else min(keep, self.context_keep)
+                    conn.execute("""
+                        DELETE FROM context_message
+                        WHERE session_id = ? AND id <= (
+                            SELECT id FROM context_message WHERE session_id = ?
+                            ORDER BY id DESC LIMIT 1 OFFSET ?
+                        )
+                    """, (session_id, session_id, keep))
+
+            # 提交和移出"正在写入"在同一把锁内完成（见 read_context）
+            with self._contexts_lock:
+                conn.commit()
+                if contexts is self._writing_contexts:
+                    self._writing_contexts = {}
+        self._stats['contexts_written'] += len(contexts)
+
+    def stop(self) -> None:
+        """停止后台线程并写入剩余数据（关闭时调用）"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"关闭时写入剩余数据失败: {e}", exc_info=True)
+        logger.info("后台写入已停止")
+
+    def get_stats(self) -> Dict:
+        """获取写入统计"""
+        with self._contexts_lock:
+            pending_contexts = len(self._contexts)
+        return {
+            **self._stats,
+            'pending_rows': self._rows.qsize() + len(self._retry_rows),
+            'pending_contexts': pending_contexts
+        }
+
+
+# 全局实例
+_write_behind: Optional[WriteBehindQueue] = None
+
+
+def get_write_behind() -> WriteBehindQueue:
+    """获取后台写入队列实例"""
+    global _write_behind
+    if _write_behind is None:
+        _write_behind = WriteBehindQueue()
+    return _write_behind
+
+
+def shutdown_write_behind() -> None:
+    """关闭后台写入（仅在已创建时），确保数据全部落盘"""
+    if _write_behind is not None:
+        _write_behind.stop()
@@ -0,0 +1,12 @@
+"""消息处理流水线"""
+from src.pipeline.message_pipeline import (
+    MessageContext,
+    MessagePipeline,
+    get_message_pipeline
+)
+
+__all__ = [
+    'MessageContext',
+    'MessagePipeline',
+    'get_message_pipeline'
+]
@@ -0,0 +1,467 @@
+"""统一消息处理流水线
+
+每条消息只解析一次：规范化 → 触发分类 → 内容过滤 → 上下文丰富 → 生成回复 → 持久化。
+各触发器（@、名字、关键词、智能）只保留自己的触发策略，共用这里的阶段实现。
+过滤、联网搜索和相关记忆检索互不依赖，可以并行执行（见 filter_and_prefetch）。
+"""
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from nonebot.adapters.onebot.v11 import GroupMessageEvent, PrivateMessageEvent
+
+from src.utils.config import get_config
+from src.utils.logger import get_logger
+from src.utils.helpers import make_session_id
+from src.utils.message_parser import ParsedMessage, get_parsed_message
+from src.utils.bilibili_links import BiliLinks, scan_bilibili_links
+from src.ai.client import get_ai_client
+from src.memory.memory_manager import get_memory_manager
+from src.utils.web_search import get_web_search_client
+from src.utils.content_filter import get_content_filter
+
+logger = get_logger("pipeline")
+
+# 触发类型
+TRIGGER_MENTION = "mention"
+TRIGGER_NAME = "name"
+TRIGGER_KEYWORD = "keyword"
+TRIGGER_SMART = "smart"
+
+
+@dataclass
+class MessageContext:
+    """单条消息在流水线中的处理结果（每个事件只构建一次）"""
+    event: Any
+    parsed: ParsedMessage
+    chat_type: str
+    session_id: str
+    raw_message: str
+    message_text: str
+    sender_qq: str
+    sender_name: str
+    group_id: Optional[str] = None
+    is_target: bool = False
+    is_at_bot: bool = False
+    mentions_name: bool = False
+    has_keyword: bool = False
+    has_bilibili_link: bool = False
+    bili_links: Optional[BiliLinks] = None
+    trigger: Optional[str] = None
+    # 已经放弃处理这条消息的触发器（见 MessagePipeline.decline）
+    declined: Set[str] = field(default_factory=set)
+
+    # 各阶段的缓存结果
+    filter_result: Optional[Tuple[bool, str]] = None
+    search_done: bool = False
+    search_context: Optional[str] = None
+    memories_done: bool = False
+    related_memories: Optional[str] = None
+    user_persisted: bool = False
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class MessagePipeline:
+    """消息处理流水线"""
+
+    def __init__(self) -> None:
+        self.config = get_config()
+        self.ai_client = get_ai_client()
+        self.memory_manager = get_memory_manager()
+        self.web_search_client = get_web_search_client()
+        self.content_filter = get_content_filter()
+
+        # 每个事件的处理结果缓存（同一事件会依次经过多个触发器）
+        self._contexts: OrderedDict[int, MessageContext] = OrderedDict()
+        self._context_cache_size = 64
+
+        # 阶段耗时统计 {stage: [次数, 总耗时(秒)]}
+        self._stage_stats: Dict[str, List[float]] = {}
+
+    # ==================== 规范化 + 分类 ====================
+
+    def prepare(self, event: Any) -> MessageContext:
+        """获取事件的处理上下文（同一事件只解析一次）
+
+        Args:
+            event: 消息事件
+
+        Returns:
+            MessageContext实例
+        """
+        key = id(event)
+        ctx = self._contexts.get(key)
+        if ctx is not None and ctx.event is event:
+            self._contexts.move_to_end(key)
+            return ctx
+
+        # 配置文件被修改（如网页端保存）时整体替换配置快照
+        self.config.maybe_reload()
+        ctx = self._normalize(event)
+        with self._stage(ctx, "classify"):
+            ctx.trigger = self._classify(ctx)
+
+        self._contexts[key] = ctx
+        if len(self._contexts) > self._context_cache_size:
+            self._contexts.popitem(last=False)
+
+        if ctx.trigger:
+            logger.debug(f"[{ctx.chat_type}] 触发类型: {ctx.trigger}")
+        return ctx
+
+    def _normalize(self, event: Any) -> MessageContext:
+        """规范化消息：提取文本、发送者和各类标记"""
+        start = time.perf_counter()
+        parsed = get_parsed_message(event)
+        raw_message = parsed.raw
+        # 整条消息使用同一版本的配置
+        snapshot = self.config.snapshot
+
+        if isinstance(event, GroupMessageEvent):
+            group_id = str(event.group_id)
+            ctx = MessageContext(
+                event=event,
+                parsed=parsed,
+                chat_type="group",
+                session_id=make_session_id("group", group_id),
+                raw_message=raw_message,
+                message_text=parsed.text,
+                sender_qq=str(event.user_id),
+                sender_name=event.sender.card or event.sender.nickname,
+                group_id=group_id,
+                is_target=group_id in snapshot.target_group_set
+            )
+            # 非目标群不需要继续解析
+            if ctx.is_target:
+                ctx.is_at_bot = parsed.mentions(snapshot.bot_qq)
+                ctx.mentions_name = any(name in ctx.message_text for name in snapshot.names)
+                ctx.has_keyword = parsed.matches(snapshot.keyword_pattern)
+                # 扫描一次，B站解析插件直接使用扫描结果
+                ctx.bili_links = scan_bilibili_links(raw_message)
+                ctx.has_bilibili_link = bool(ctx.bili_links)
+        else:
+            ctx = MessageContext(
+                event=event,
+                parsed=parsed,
+                chat_type="private",
+                session_id=make_session_id("private", str(event.user_id)),
+                raw_message=raw_message,
+                message_text=raw_message,
+                sender_qq=str(event.user_id),
+                sender_name=event.sender.nickname,
+                # 私聊只处理管理员
+                is_target=isinstance(event, PrivateMessageEvent) and str(event.user_id) == snapshot.admin_qq
+            )
+
+        ctx.timings["normalize"] = time.perf_counter() - start
+        self._record_stage("normalize", ctx.timings["normalize"])
+        return ctx
+
+    def _classify(self, ctx: MessageContext) -> Optional[str]:
+        """判断消息由哪个触发器处理
+
+        优先级：@ > 名字 > 关键词 > 智能判断（跳过已经放弃处理的触发器）
+        """
+        if not ctx.is_target or not ctx.message_text:
+            return None
+
+        if (ctx.chat_type == "private" or ctx.is_at_bot) and TRIGGER_MENTION not in ctx.declined:
+            return TRIGGER_MENTION
+
+        # B站链接由解析插件处理，名字和智能触发都跳过
+        if (ctx.mentions_name and not ctx.has_bilibili_link and TRIGGER_NAME not in ctx.declined
+                and self.config.get("features.name_reply", True)):
+            return TRIGGER_NAME
+
+        if (ctx.has_keyword and TRIGGER_KEYWORD not in ctx.declined
+                and self.config.get("features.keyword_reply", True)):
+            return TRIGGER_KEYWORD
+
+        if (not ctx.mentions_name and not ctx.has_keyword and not ctx.has_bilibili_link
+                and self.config.get("features.smart_reply", True)):
+            return TRIGGER_SMART
+
+        return None
+
+    def decline(self, ctx: MessageContext) -> Optional[str]:
+        """当前触发器没有回复时放弃处理，交给优先级更低的触发器
+
+        例如名字触发没有生成回复时，同时包含关键词的消息仍由关键词触发器处理；
+        过滤结果、预取结果和已保存的用户消息都会复用。
+
+        Returns:
+            新的触发类型
+        """
+        if ctx.trigger:
+            ctx.declined.add(ctx.trigger)
+        ctx.trigger = self._classify(ctx)
+        if ctx.trigger:
+            logger.debug(f"[{ctx.chat_type}] 转交触发类型: {ctx.trigger}")
+        return ctx.trigger
+
+    # ==================== 过滤 ====================
+
+    async def check_filter(self, ctx: MessageContext) -> Tuple[bool, str]:
+        """内容过滤（结果缓存在上下文中）
+
+        Returns:
+            (是否忽略, 原因)
+        """
+        if ctx.filter_result is None:
+            if not self.config.get("content_filter.enabled", True):
+                ctx.filter_result = (False, "")
+            else:
+                with self._stage(ctx, "filter"):
+                    ctx.filter_result = await self.content_filter.should_ignore_message(ctx.message_text)
+                if ctx.filter_result[0]:
+                    logger.warning(f"[{ctx.chat_type}] 消息被过滤: {ctx.filter_result[1]}")
+        return ctx.filter_result
+
+    async def filter_and_prefetch(self, ctx: MessageContext) -> Tuple[bool, str]:
+        """内容过滤与丰富阶段并行执行
+        
+        过滤（可能调用AI审核）、联网搜索、相关记忆检索互不依赖，同时开始；
+        过滤拒绝时取消其余任务并丢弃结果，总耗时约等于最慢的一个阶段。
+        
+        Returns:
+            (是否忽略, 原因)
+        """
+        if ctx.filter_result is not None:
+            return ctx.filter_result
+        
+        filter_task = asyncio.create_task(self.check_filter(ctx))
+        prefetch_tasks = [
+            asyncio.create_task(self.search(ctx)),
+            asyncio.create_task(self.retrieve_memories(ctx)),
+        ]
+        
+        try:
+            should_ignore, reason = await filter_task
+        except BaseException:
+            for task in prefetch_tasks:
+                task.cancel()
+            raise
+        
+        if should_ignore:
+            for task in prefetch_tasks:
+                task.cancel()
+            await asyncio.gather(*prefetch_tasks, return_exceptions=True)
+            # 丢弃已经完成的结果
+            ctx.search_context = None
+            ctx.related_memories = None
+            return should_ignore, reason
+        
+        results = await asyncio.gather(*prefetch_tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"[{ctx.chat_type}] 预取失败: {result}")
+        return should_ignore, reason
+    
+    # ==================== 丰富 ====================
+
+    async def search(self, ctx: MessageContext) -> Optional[str]:
+        """联网搜索（每个事件最多执行一次）"""
+        if not ctx.search_done:
+            with self._stage(ctx, "search"):
+                if await asyncio.to_thread(self.web_search_client.should_search, ctx.message_text):
+                    logger.info(f"[{ctx.chat_type}] 触发联网搜索")
+                    ctx.search_context = await self.web_search_client.search_async(ctx.message_text)
+                    if ctx.search_context:
+                        logger.debug(f"[{ctx.chat_type}] 搜索结果: {ctx.search_context[:100]}...")
+            ctx.search_done = True
+        return ctx.search_context
+
+    async def retrieve_memories(self, ctx: MessageContext) -> Optional[str]:
+        """检索相关长期记忆（每个事件最多执行一次）"""
+        if not ctx.memories_done:
+            with self._stage(ctx, "memories"):
+                if self.memory_manager.vector_enabled:
+                    ctx.related_memories = await self.memory_manager.search_related_memories(
+                        ctx.message_text, ctx.session_id
+                    )
+            ctx.memories_done = True
+        return ctx.related_memories
+    
+    def persist_user_message(self, ctx: MessageContext) -> None:
+        """保存用户消息到记忆系统（每个事件最多保存一次）"""
+        if ctx.user_persisted:
+            return
+        with self._stage(ctx, "persist"):
+            self.memory_manager.add_message(
+                session_id=ctx.session_id,
+                role="user",
+                content=ctx.message_text,
+                sender_id=ctx.sender_qq,
+                sender_name=ctx.sender_name
+            )
+        ctx.user_persisted = True
+
+    async def enrich(self, ctx: MessageContext) -> List[Dict[str, str]]:
+        """丰富阶段：联网搜索 + 相关记忆 + 保存用户消息 + 获取上下文
+        
+        已经由 filter_and_prefetch() 预取过的阶段直接使用缓存结果。
+        """
+        if not ctx.search_done or not ctx.memories_done:
+            await asyncio.gather(self.search(ctx), self.retrieve_memories(ctx))
+        self.persist_user_message(ctx)
+        with self._stage(ctx, "context"):
+            return await self.memory_manager.get_context_for_ai(
+                ctx.session_id,
+                ctx.message_text,
+                related_memories=ctx.related_memories or ""
+            )
+
+    # ==================== 生成 + 持久化 ====================
+
+    async def generate(self, ctx: MessageContext, context: List[Dict[str, str]]) -> Optional[str]:
+        """调用AI生成回复"""
+        with self._stage(ctx, "generate"):
+            return await self.ai_client.chat(
+                context,
+                search_context=ctx.search_context,
+                chat_type=ctx.chat_type,
+                sender_qq=ctx.sender_qq
+            )
+
+    async def generate_and_send(self,
+                                ctx: MessageContext,
+                                context: List[Dict[str, str]],
+                                send: Callable[[str], Awaitable[Any]]) -> Optional[str]:
+        """生成回复并发送
+        
+        开启 ai.stream.enabled 时按句子流式生成，每句单独发一条消息，
+        相邻两条之间按句子长度留出"打字"间隔（生成耗时计入间隔）；
+        否则生成完整回复后一次发送。
+        
+        Returns:
+            完整回复文本，失败返回None
+        """
+        if not self.config.get("ai.stream.enabled", False):
+            reply = await self.generate(ctx, context)
+            if reply:
+                await send(reply)
+            return reply
+        
+        pacing = self.config.get("ai.stream.pacing_ms", 600) / 1000
+        per_char = self.config.get("ai.stream.pacing_per_char_ms", 60) / 1000
+        max_pacing = self.config.get("ai.stream.max_pacing_ms", 3000) / 1000
+        
+        chunks: List[str] = []
+        last_sent: Optional[float] = None
+        start = time.perf_counter()
+        stream = self.ai_client.chat_stream(
+            context,
+            search_context=ctx.search_context,
+            chat_type=ctx.chat_type,
+            sender_qq=ctx.sender_qq
+        )
+        async for chunk in stream:
+            if last_sent is None:
+                ctx.timings["first_chunk"] = time.perf_counter() - start
+                self._record_stage("first_chunk", ctx.timings["first_chunk"])
+            else:
+                # 只等待间隔中还没被生成耗时占掉的部分
+                budget = min(pacing + per_char * len(chunk), max_pacing)
+                remaining = budget - (time.perf_counter() - last_sent)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+            await send(chunk)
+            last_sent = time.perf_counter()
+            chunks.append(chunk)
+        
+        ctx.timings["generate"] = time.perf_counter() - start
+        self._record_stage("generate", ctx.timings["generate"])
+        return "".join(chunks) or None
+    
+    def persist_reply(self, ctx: MessageContext, reply: str) -> None:
+        """保存机器人回复到记忆系统"""
+        with self._stage(ctx, "persist"):
+            self.memory_manager.add_message(
+                session_id=ctx.session_id,
+                role="assistant",
+                content=reply
+            )
+
+    async def process(self,
+                      ctx: MessageContext,
+                      context_hook: Optional[Callable[[List[Dict[str, str]]], List[Dict[str, str]]]] = None,
+                      send: Optional[Callable[[str], Awaitable[Any]]] = None
+                      ) -> Optional[str]:
+        """执行 丰富 → 生成 → 持久化 阶段
+
+        Args:
+            ctx: 消息上下文
+            context_hook: 可选的上下文加工函数（如意图提示、状态增强）
+            send: 可选的发送函数；传入时由流水线负责发送回复（支持流式分句发送）
+
+        Returns:
+            AI回复，失败返回None
+        """
+        context = await self.enrich(ctx)
+        if context_hook:
+            context = context_hook(context)
+
+        if send is not None:
+            reply = await self.generate_and_send(ctx, context, send)
+        else:
+            reply = await self.generate(ctx, context)
+        if reply:
+            self.persist_reply(ctx, reply)
+
+        logger.debug(f"[{ctx.chat_type}] 阶段耗时: " + ", ".join(
+            f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in ctx.timings.items()
+        ))
+        return reply
+
+    # ==================== 计时 ====================
+
+    @contextmanager
+    def _stage(self, ctx: MessageContext, stage: str):
+        """记录阶段耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            ctx.timings[stage] = ctx.timings.get(stage, 0.0) + elapsed
+            self._record_stage(stage, elapsed)
+
+    def _record_stage(self, stage: str, elapsed: float) -> None:
+        """累计阶段耗时统计"""
+        stats = self._stage_stats.setdefault(stage, [0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+
+    def get_stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """获取各阶段耗时统计
+
+        Returns:
+            {阶段: {count, total_ms, avg_ms}}
+        """
+        return {
+            stage: {
+                'count': int(count),
+                'total_ms': round(total * 1000, 2),
+                'avg_ms': round(total * 1000 / count, 2) if count else 0.0
+            }
+            for stage, (count, total) in self._stage_stats.items()
+        }
+
+
+# 全局实例
+_message_pipeline: Optional[MessagePipeline] = None
+
+
+def get_message_pipeline() -> MessagePipeline:
+    """获取消息流水线实例
+
+    Returns:
+        MessagePipeline实例
+    """
+    global _message_pipeline
+    if _message_pipeline is None:
+        _message_pipeline = MessagePipeline()
+    return _message_pipeline
@@ -1,26 +1,22 @@
 """聊天消息处理插件"""
-from typing import Optional
-from nonebot import on_message, on_command
+from typing import Optional, List, Dict
+from nonebot import on_message
 from nonebot.adapters.onebot.v11 import Bot, GroupMessageEvent, PrivateMessageEvent, Message
-from nonebot.rule import to_me
 
 from src.utils.config import get_config
 from src.utils.logger import get_logger
-from src.utils.helpers import is_at_bot, remove_at, contains_keyword
-from src.ai.client import get_ai_client
 from src.memory.memory_manager import get_memory_manager
-from src.utils.web_search import get_web_search_client
 from src.utils.content_filter import get_content_filter
+from src.pipeline.message_pipeline import get_message_pipeline, TRIGGER_MENTION
 from src.dialogue.intent_analyzer import get_intent_analyzer
 from src.dialogue.context_enhancer import get_context_enhancer
 from src.dialogue.proactive_engine import get_proactive_engine
 
 logger = get_logger("chat_handler")
 config = get_config()
-ai_client = get_ai_client()
 memory_manager = get_memory_manager()
-web_search_client = get_web_search_client()
 content_filter = get_content_filter()
+pipeline = get_message_pipeline()
 
 # 初始化意图分析器（如果启用）
 intent_analyzer = None
@@ -62,60 +58,31 @@ async def handle_mention(bot: Bot, event: GroupMessageEvent | PrivateMessageEven
         bot: Bot实例
         event: 消息事件（群消息或私聊消息）
     """
-    # 获取原始消息 - 使用 raw_message
-    raw_message = event.raw_message.strip()
+    ctx = pipeline.prepare(event)
     
-    # 判断消息类型
-    if isinstance(event, GroupMessageEvent):
-        # 检查是否是目标群
-        if str(event.group_id) != config.target_group:
-            return
-        
-        # 只处理@消息，不处理昵称提及
-        if not is_at_bot(raw_message, config.bot_qq):
-            return
-        
-        chat_type = "group"
-        sender_name: str = event.sender.card or event.sender.nickname
-        sender_qq: str = str(event.user_id)
-        
-        # 更新主动对话引擎的消息时间
-        if proactive_engine:
-            proactive_engine.update_message_time(str(event.group_id))
-    else:
-        # 私聊消息
-        # 检查是否是管理员
-        if str(event.user_id) != config.admin_qq:
-            logger.debug(f"忽略非管理员私聊: {event.user_id}")
-            return
-        
-        chat_type = "private"
-        sender_name: str = event.sender.nickname
-        sender_qq: str = str(event.user_id)
-    
-    # 获取消息内容（私聊不需要移除@）
-    if isinstance(event, PrivateMessageEvent):
-        message_text = raw_message
-    else:
-        message_text = remove_at(raw_message)
+    # 只处理@消息和管理员私聊，不处理昵称提及
+    if ctx.trigger != TRIGGER_MENTION:
+        if ctx.chat_type == "private" and not ctx.is_target:
+            logger.debug(f"忽略非管理员私聊: {ctx.sender_qq}")
+        return
     
-    logger.info(f"[{chat_type}] 原始消息: '{raw_message}'")
-    logger.info(f"[{chat_type}] 处理后消息: '{message_text}'")
+    # 更新主动对话引擎的消息时间
+    if proactive_engine and ctx.chat_type == "group":
+        proactive_engine.update_message_time(ctx.group_id)
     
-    if not message_text:
-        logger.warning(f"[{chat_type}] 消息内容为空，忽略")
-        return
+    chat_type = ctx.chat_type
+    session_id = ctx.session_id
+    sender_qq = ctx.sender_qq
+    message_text = ctx.message_text
     
-    logger.info(f"[{chat_type}] 收到@消息: {sender_name}: {message_text}")
+    logger.info(f"[{chat_type}] 收到@消息: {ctx.sender_name}: {message_text}")
     
-    # 内容过滤检查
-    if config.get("content_filter.enabled", True):
-        should_ignore, reason = content_filter.should_ignore_message(message_text)
-        if should_ignore:
-            warning_msg = content_filter.get_warning_message(reason)
-            await mention_matcher.send(Message(warning_msg))
-            logger.debug(f"[{chat_type}] 消息被过滤: {reason}")
-            return
+    # 内容过滤检查（同时预取联网搜索和相关记忆）
+    should_ignore, reason = await pipeline.filter_and_prefetch(ctx)
+    if should_ignore:
+        warning_msg = content_filter.get_warning_message(reason)
+        await mention_matcher.send(Message(warning_msg))
+        return
     
     # 意图分析（如果启用）
     intent_result = None
@@ -123,13 +90,15 @@ async def handle_mention(bot: Bot, event: GroupMessageEvent | PrivateMessageEven
     if intent_analyzer:
         try:
             # 获取最近上下文
-            recent_context = memory_manager.get_context_for_ai(chat_type)
+            recent_context = await memory_manager.get_context_for_ai(session_id)
             context_str = "\n".join([f"{m['role']}: {m['content']}" for m in recent_context[-3:]])
             
             intent_result = intent_analyzer.analyze(
                 message=message_text,
                 sender_id=sender_qq,
-                context=context_str
+                context=context_str,
+                session_id=session_id,
+                tokens=ctx.parsed.tokens
             )
             
             logger.debug(f"[{chat_type}] 意图分析: {intent_result.type}, 话题: {intent_result.topic}")
@@ -143,85 +112,61 @@ async def handle_mention(bot: Bot, event: GroupMessageEvent | PrivateMessageEven
                 logger.info(f"[{chat_type}] 检测到反问")
             
             # 获取话题状态（用于状态机）
-            if intent_analyzer.topic_tracker:
+            topic_tracker = intent_analyzer.get_topic_tracker(session_id)
+            if topic_tracker:
                 topic_status = {
                     "status": "maintaining",
-                    "topic": intent_analyzer.topic_tracker.current_topic.to_dict() if intent_analyzer.topic_tracker.current_topic else None
+                    "topic": topic_tracker.current_topic.to_dict() if topic_tracker.current_topic else None
                 }
                 
         except Exception as e:
             logger.error(f"[{chat_type}] 意图分析失败: {e}")
     
-    # 检查是否需要联网搜索
-    search_context: Optional[str] = None
-    if web_search_client.should_search(message_text):
-        logger.info(f"[{chat_type}] 触发联网搜索")
-        search_context = web_search_client.search(message_text)
-        if search_context:
-            logger.debug(f"[{chat_type}] 搜索结果: {search_context[:100]}...")
-    
-    # 添加用户消息到记忆系统（三层存储）
-    memory_manager.add_message(
-        chat_type=chat_type,
-        role="user",
-        content=message_text,
-        sender_id=sender_qq,
-        sender_name=sender_name
-    )
-    
-    # 获取上下文（包含相关记忆）
-    context = memory_manager.get_context_for_ai(chat_type, message_text)
-    
-    # 使用上下文增强器（如果启用）
-    if context_enhancer:
-        try:
-            context = context_enhancer.enrich(
-                base_context=context,
-                intent_result=intent_result,
-                chat_type=chat_type,
-                topic_status=topic_status
-            )
-            logger.debug(f"[{chat_type}] 上下文已增强")
-        except Exception as e:
-            logger.error(f"[{chat_type}] 上下文增强失败: {e}")
-    
-    # 如果有意图分析结果但没有上下文增强器，添加意图提示
-    elif intent_result:
-        intent_hint = _build_intent_hint(intent_result)
-        if intent_hint:
-            # 在上下文开头添加意图提示
-            context.insert(0, {
-                "role": "system",
-                "content": intent_hint
-            })
+    def enhance_context(context: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """使用意图分析结果加工上下文"""
+        # 使用上下文增强器（如果启用）
+        if context_enhancer:
+            try:
+                context = context_enhancer.enrich(
+                    base_context=context,
+                    intent_result=intent_result,
+                    session_id=session_id,
+                    topic_status=topic_status
+                )
+                logger.debug(f"[{chat_type}] 上下文已增强")
+            except Exception as e:
+                logger.error(f"[{chat_type}] 上下文增强失败: {e}")
+        
+        # 如果有意图分析结果但没有上下文增强器，添加意图提示
+        elif intent_result:
+            intent_hint = _build_intent_hint(intent_result)
+            if intent_hint:
+                # 在上下文开头添加意图提示
+                context.insert(0, {
+                    "role": "system",
+                    "content": intent_hint
+                })
+        
+        return context
     
-    reply: Optional[str] = ai_client.chat(
-        context, 
-        search_context=search_context, 
-        chat_type=chat_type, 
-        sender_qq=sender_qq
+    # 回复由流水线发送（开启流式时按句子分条发送）
+    reply: Optional[str] = await pipeline.process(
+        ctx,
+        context_hook=enhance_context,
+        send=lambda text: mention_matcher.send(Message(text))
     )
     
     if reply:
-        # 发送回复
-        await mention_matcher.send(Message(reply))
-        
-        # 添加机器人回复到记忆系统
-        memory_manager.add_message(
-            chat_type=chat_type,
-            role="assistant",
-            content=reply
-        )
-        
         logger.info(f"[{chat_type}] AI回复: {reply}")
         
         # 如果回复包含问句，注册到反问检测器
         if intent_analyzer and _is_question(reply):
             try:
-                current_topic = intent_analyzer.get_current_topic()
+                current_topic = intent_analyzer.get_current_topic(session_id)
                 intent_analyzer.register_bot_question(
                     question=reply,
-                    context=[current_topic] if current_topic else []
+                    context=[current_topic] if current_topic else [],
+                    session_id=session_id
                 )
                 logger.debug(f"[{chat_type}] 注册问题: {reply[:30]}...")
             except Exception as e:
@@ -30,7 +30,7 @@ async def collect_member_info(bot: Bot, event: GroupMessageEvent):
         return
     
     # 检查是否是目标群
-    if str(event.group_id) != config.target_group:
+    if not config.is_target_group(event.group_id):
         return
     
     qq_id = str(event.user_id)
@@ -40,13 +40,20 @@ async def collect_member_info(bot: Bot, event: GroupMessageEvent):
     # 获取头像URL
     avatar_url = f"https://q1.qlogo.cn/g?b=qq&nk={qq_id}&s=640"
     
-    # 检查是否已存在
-    member = member_db.get_member(qq_id)
+    # 缓存中的群友只在内存中累计发言，不访问数据库
+    if member_db.touch(qq_id, qq_name, group_card, avatar_url):
+        return
     
-    if member:
-        # 更新信息
-        member_db.add_or_update_member(qq_id, qq_name, group_card, avatar_url=avatar_url)
-    else:
+    def save_member():
+        """在数据库线程中执行（复用同一连接，不阻塞事件循环）"""
+        # 检查是否已存在
+        member = member_db.get_member(qq_id)
+        
+        if member:
+            # 更新信息
+            member_db.add_or_update_member(qq_id, qq_name, group_card, avatar_url=avatar_url)
+            return None, False
+        
         # 新群友，推测昵称
         nickname, need_confirm = nickname_analyzer.analyze(qq_name, group_card)
         
@@ -56,10 +63,13 @@ async def collect_member_info(bot: Bot, event: GroupMessageEvent):
         # 设置昵称确认状态
         if nickname:
             member_db.set_nickname(qq_id, nickname, confirmed=not need_confirm)
-            
-            # 如果需要确认，私聊管理员
-            if need_confirm:
-                await notify_admin_confirm_nickname(bot, qq_id, group_card or qq_name, nickname)
+        return nickname, need_confirm
+    
+    nickname, need_confirm = await member_db.db.run_async(save_member)
+    
+    # 如果需要确认，私聊管理员
+    if nickname and need_confirm:
+        await notify_admin_confirm_nickname(bot, qq_id, group_card or qq_name, nickname)
 
 
 async def notify_admin_confirm_nickname(bot: Bot, qq_id: str, name: str, nickname: str):
@@ -101,8 +111,8 @@ async def handle_member_leave(bot: Bot, event: NoticeEvent):
         return
     
     # 检查是否是目标群
-    if str(event.group_id) != config.target_group:
-        logger.info(f"非目标群，跳过: {event.group_id} (目标群: {config.target_group})")
+    if not config.is_target_group(event.group_id):
+        logger.info(f"非目标群，跳过: {event.group_id} (目标群: {', '.join(config.target_groups)})")
         return
     
     qq_id = str(event.user_id)
@@ -33,25 +33,21 @@ async def check_proactive():
         # 获取bot实例
         bot = get_bot()
         
-        # 获取目标群
-        target_group = config.target_group
-        
-        if not target_group:
-            return
-        
-        # 检查并生成主动消息
-        message = proactive_engine.check_and_generate(
-            group_id=target_group,
-            mood="calm"  # 可以后续接入氛围分析
-        )
-        
-        if message:
-            # 发送消息
-            await bot.send_group_msg(
-                group_id=int(target_group),
-                message=Message(message)
+        # 每个目标群独立判断
+        for target_group in config.target_groups:
+            # 检查并生成主动消息
+            message = proactive_engine.check_and_generate(
+                group_id=target_group,
+                mood="calm"  # 可以后续接入氛围分析
             )
-            logger.info(f"发送主动消息: {message}")
+            
+            if message:
+                # 发送消息
+                await bot.send_group_msg(
+                    group_id=int(target_group),
+                    message=Message(message)
+                )
+                logger.info(f"[群{target_group}] 发送主动消息: {message}")
             
     except Exception as e:
         logger.error(f"主动对话检查失败: {e}")
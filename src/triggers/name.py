@@ -1,49 +1,19 @@
 """名字触发器 - 当有人提到舟舟/沉舟时主动回复"""
-import re
+import time
 from nonebot import on_message
 from nonebot.adapters.onebot.v11 import Bot, GroupMessageEvent, Message
 from nonebot.exception import IgnoredException
 
-from src.utils.config import get_config
 from src.utils.logger import get_logger
-from src.utils.helpers import is_at_bot, remove_at
-from src.ai.client import get_ai_client
-from src.memory.memory_manager import get_memory_manager
-from src.utils.web_search import get_web_search_client
 from src.utils.content_filter import get_content_filter
+from src.pipeline.message_pipeline import get_message_pipeline, TRIGGER_NAME
 
 logger = get_logger("name")
-config = get_config()
-ai_client = get_ai_client()
-memory_manager = get_memory_manager()
-web_search_client = get_web_search_client()
 content_filter = get_content_filter()
+pipeline = get_message_pipeline()
 
 # 记录最近被名字触发的用户（用于连续对话检测）
-recent_name_triggers = {}  # {user_id: timestamp}
-
-# B站链接检测正则（与bilibili.py保持一致）
-REG_BV = re.compile(r'BV[0-9A-Za-z]{10}')
-REG_AV = re.compile(r'av(\d+)', re.IGNORECASE)
-REG_B23 = re.compile(r'(b23\.tv|bili2233\.cn)')
-REG_SS = re.compile(r'ss(\d+)', re.IGNORECASE)
-REG_EP = re.compile(r'ep(\d+)', re.IGNORECASE)
-REG_MD = re.compile(r'md(\d+)', re.IGNORECASE)
-
-def has_bilibili_link(message: str) -> bool:
-    """检测消息中是否包含B站链接（快速预检查+正则匹配）"""
-    # 快速预检查：只有包含B站关键词时才进行正则匹配
-    if not any(keyword in message for keyword in ['bilibili', 'b23.tv', 'BV', 'av', 'ss', 'ep', 'md', '哔哩哔哩']):
-        return False
-    
-    return bool(
-        REG_BV.search(message) or 
-        REG_AV.search(message) or 
-        REG_B23.search(message) or 
-        REG_SS.search(message) or 
-        REG_EP.search(message) or 
-        REG_MD.search(message)
-    )
+recent_name_triggers = {}  # {(group_id, user_id): timestamp}
 
 # 名字触发器（优先级高于关键词，低于@触发）
 # block=False 允许其他触发器继续处理
@@ -52,112 +22,36 @@ name_matcher = on_message(priority=8, block=False)
 @name_matcher.handle()
 async def handle_name_mention(bot: Bot, event):
     """处理名字提及"""
-    logger.info(f"[群] 名字触发器被调用")
-    
     # 只处理群消息
-    from nonebot.adapters.onebot.v11 import GroupMessageEvent
     if not isinstance(event, GroupMessageEvent):
-        logger.info(f"[群] 不是群消息，跳过")
-        return
-    
-    logger.info(f"[群] 是群消息，继续处理")
-    
-    # 检查功能是否开启
-    if not config.get("features.name_reply", True):
-        logger.info(f"[群] 名字回复功能未开启")
         return
     
-    logger.info(f"[群] 功能已开启")
-    
-    # 检查是否是目标群
-    if str(event.group_id) != config.target_group:
-        logger.info(f"[群] 非目标群: {event.group_id}, 目标群: {config.target_group}")
+    # 名字提及、目标群、功能开关、B站链接等判断已在流水线分类阶段完成
+    ctx = pipeline.prepare(event)
+    if ctx.trigger != TRIGGER_NAME:
         return
     
-    logger.info(f"[群] 是目标群")
-    
-    # 获取消息内容 - 使用 raw_message 而不是 get_message()
-    message_text = event.raw_message.strip()
-    logger.info(f"[群] 原始消息: '{message_text}'")
-    
-    # 如果是@消息，跳过（已被mention_matcher处理）
-    if is_at_bot(message_text, config.bot_qq):
-        logger.debug(f"[群] 检测到@消息，跳过名字触发")
-        return
-    
-    message_text = remove_at(message_text)
-    logger.debug(f"[群] 处理后消息: '{message_text}'")
-    
-    if not message_text:
-        logger.debug(f"[群] 消息为空")
-        return
+    logger.info(f"[群] 名字触发: {ctx.message_text}")
     
-    # 获取配置的名字和昵称
-    personality = config.get("personality", {})
-    name = personality.get("name", "沉舟")
-    nickname = personality.get("nickname", "舟舟")
-    
-    logger.debug(f"[群] 检查名字: {name}, 昵称: {nickname}")
-    
-    # 检查是否提到了名字或昵称
-    if name not in message_text and nickname not in message_text:
-        logger.debug(f"[群] 消息中未提到名字或昵称")
-        return
-    
-    # 找到匹配，阻止后续触发器
-    logger.info(f"[群] 检测到名字提及，开始处理: '{message_text}'")
-    
-    # 如果消息中包含B站链接，跳过（已被B站解析插件处理）
-    if has_bilibili_link(message_text):
-        logger.info(f"[群] 检测到B站链接，跳过名字触发")
-        return
-    
-    logger.info(f"[群] 名字触发: {message_text}")
-    
-    # 内容过滤检查
-    if config.get("content_filter.enabled", True):
-        should_ignore, reason = content_filter.should_ignore_message(message_text)
-        if should_ignore:
-            warning_msg = content_filter.get_warning_message()
-            await name_matcher.send(Message(warning_msg))
-            logger.warning(f"[群] 消息被过滤: {reason}")
-            # 阻止后续触发器
-            raise IgnoredException("消息被内容过滤器拦截")
-    
-    # 检查是否需要联网搜索
-    search_context = None
-    if web_search_client.should_search(message_text):
-        logger.info(f"[群] 触发联网搜索")
-        search_context = web_search_client.search(message_text)
-        if search_context:
-            logger.info(f"[群] 搜索结果: {search_context[:100]}...")
-    
-    # 获取发送者信息
-    sender_name = event.sender.card or event.sender.nickname
-    sender_qq = str(event.user_id)
-    
-    # 添加用户消息到记忆系统
-    memory_manager.add_message(
-        chat_type="group",
-        role="user",
-        content=message_text,
-        sender_id=sender_qq,
-        sender_name=sender_name
-    )
+    # 内容过滤检查（同时预取联网搜索和相关记忆）
+    should_ignore, reason = await pipeline.filter_and_prefetch(ctx)
+    if should_ignore:
+        warning_msg = content_filter.get_warning_message()
+        await name_matcher.send(Message(warning_msg))
+        # 阻止后续触发器
+        raise IgnoredException("消息被内容过滤器拦截")
     
-    # 获取上下文（包含相关记忆）
-    context = memory_manager.get_context_for_ai("group", message_text)
-    reply = ai_client.chat(context, search_context=search_context, chat_type="group", sender_qq=sender_qq)
+    reply = await pipeline.process(ctx, send=lambda text: name_matcher.send(Message(text)))
     
     if reply:
-        await name_matcher.send(Message(reply))
-        memory_manager.add_message("group", "assistant", reply)
         logger.info(f"[群] 名字回复: {reply}")
         
         # 记录触发时间（用于连续对话检测）
-        import time
-        recent_name_triggers[sender_qq] = time.time()
-        logger.debug(f"[群] 记录名字触发: {sender_qq}")
+        recent_name_triggers[(ctx.group_id, ctx.sender_qq)] = time.time()
+        logger.debug(f"[群] 记录名字触发: {ctx.sender_qq}")
         
         # 阻止后续触发器
         raise IgnoredException("名字触发器已处理")
+    
+    # 没有生成回复时交给后续触发器（如同时包含关键词）
+    pipeline.decline(ctx)
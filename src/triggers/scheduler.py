@@ -16,14 +16,14 @@ config = get_config()
 member_db = get_member_db()
 
 async def send_group_message(message: str):
-    """发送群消息"""
-    try:
-        bot = get_bot()
-        target_group = config.target_group
-        await bot.send_group_msg(group_id=int(target_group), message=message)
-        logger.info(f"[定时任务] 发送消息: {message}")
-    except Exception as e:
-        logger.error(f"[定时任务] 发送失败: {e}")
+    """发送群消息（发送到所有目标群）"""
+    for target_group in config.target_groups:
+        try:
+            bot = get_bot()
+            await bot.send_group_msg(group_id=int(target_group), message=message)
+            logger.info(f"[定时任务] [群{target_group}] 发送消息: {message}")
+        except Exception as e:
+            logger.error(f"[定时任务] [群{target_group}] 发送失败: {e}")
 
 # 早安任务
 @scheduler.scheduled_job("cron", hour=9, minute=0, id="morning_greeting")
@@ -7,25 +7,21 @@ from nonebot.adapters.onebot.v11 import Bot, GroupMessageEvent, Message
 
 from src.utils.config import get_config
 from src.utils.logger import get_logger
-from src.utils.helpers import is_at_bot, remove_at, contains_keyword, has_bilibili_link
 from src.ai.client import get_ai_client
-from src.ai.prompts import get_smart_reply_prompt
 from src.memory.memory_manager import get_memory_manager
-from src.utils.web_search import get_web_search_client
-from src.utils.content_filter import get_content_filter
+from src.pipeline.message_pipeline import get_message_pipeline, TRIGGER_SMART
 
 logger = get_logger("smart")
 config = get_config()
 ai_client = get_ai_client()
 memory_manager = get_memory_manager()
-web_search_client = get_web_search_client()
-content_filter = get_content_filter()
+pipeline = get_message_pipeline()
 
-# 记录上次触发时间
-last_trigger_time: float = 0.0
+# 记录每个群上次触发时间
+last_trigger_times = {}  # {group_id: timestamp}
 
 # 记录最近回复的用户（用于连续对话检测）
-recent_replies = {}  # {user_id: timestamp}
+recent_replies = {}  # {(group_id, user_id): timestamp}
 
 # 智能判断触发器（优先级最低）
 smart_matcher = on_message(priority=15, block=False)
@@ -39,45 +35,16 @@ async def handle_smart_reply(bot: Bot, event: GroupMessageEvent) -> None:
         bot: Bot实例
         event: 群消息事件
     """
-    global last_trigger_time
-    
-    # 检查功能是否开启
-    if not config.get("features.smart_reply", True):
-        return
-    
-    # 检查是否是目标群
-    if str(event.group_id) != config.target_group:
-        return
-    
-    # 获取消息内容 - 使用 raw_message
-    message_text = event.raw_message.strip()
-    
-    # 如果是@消息或包含关键词，跳过
-    if is_at_bot(message_text, config.bot_qq):
-        return
-    
-    if contains_keyword(message_text, config.keywords):
-        return
-    
-    # 检查是否提到了名字（避免和名字触发器重复）
-    personality = config.get("personality", {})
-    name: str = personality.get("name", "沉舟")
-    nickname: str = personality.get("nickname", "舟舟")
-    if name in message_text or nickname in message_text:
+    # @、关键词、名字、B站链接、目标群、功能开关等判断已在流水线分类阶段完成
+    ctx = pipeline.prepare(event)
+    if ctx.trigger != TRIGGER_SMART:
         return
     
-    # 如果消息中包含B站链接，跳过（已被B站解析插件处理）
-    if has_bilibili_link(message_text):
-        logger.debug("[群] 检测到B站链接，跳过智能触发")
-        return
+    message_text = ctx.message_text
     
-    message_text = remove_at(message_text)
-    
-    if not message_text:
-        return
-    
-    # 获取发送者QQ
-    sender_qq: str = str(event.user_id)
+    # 获取发送者QQ（连续对话按 群 + 用户 区分）
+    sender_qq: str = ctx.sender_qq
+    reply_key = (ctx.group_id, sender_qq)
     current_time: float = time.time()
     
     # 检查是否是连续对话
@@ -111,15 +78,15 @@ async def handle_smart_reply(bot: Bot, event: GroupMessageEvent) -> None:
     if is_talking_to_bot:
         # 检查是否刚被名字触发过
         from src.triggers.name import recent_name_triggers
-        if sender_qq in recent_name_triggers:
-            time_since_name_trigger = current_time - recent_name_triggers[sender_qq]
+        if reply_key in recent_name_triggers:
+            time_since_name_trigger = current_time - recent_name_triggers[reply_key]
             if time_since_name_trigger < continuous_window:
                 is_continuous = True
                 logger.info(f"[群] 检测到连续对话（名字触发后 {time_since_name_trigger:.1f}秒）")
         
         # 检查是否刚被智能触发回复过
-        if not is_continuous and sender_qq in recent_replies:
-            time_since_reply = current_time - recent_replies[sender_qq]
+        if not is_continuous and reply_key in recent_replies:
+            time_since_reply = current_time - recent_replies[reply_key]
             if time_since_reply < continuous_window:
                 is_continuous = True
                 logger.info(f"[群] 检测到连续对话（上次回复后 {time_since_reply:.1f}秒）")
@@ -132,26 +99,23 @@ async def handle_smart_reply(bot: Bot, event: GroupMessageEvent) -> None:
         
         # 检查最小间隔
         min_interval: int = config.get("smart_reply.min_interval", 30)
-        if current_time - last_trigger_time < min_interval:
+        if current_time - last_trigger_times.get(ctx.group_id, 0.0) < min_interval:
             logger.debug(f"[群] 距离上次触发不足{min_interval}秒，跳过")
             return
     
     logger.debug(f"[群] 智能判断: {message_text}")
     
-    # 内容过滤检查
-    if config.get("content_filter.enabled", True):
-        should_ignore, reason = content_filter.should_ignore_message(message_text)
-        if should_ignore:
-            # 智能触发检测到敏感词，直接忽略不回复
-            logger.debug(f"[群] 消息被过滤: {reason}")
-            return
+    # 内容过滤检查（智能触发检测到敏感词，直接忽略不回复）
+    should_ignore, reason = await pipeline.check_filter(ctx)
+    if should_ignore:
+        return
     
     # 如果是连续对话，跳过AI判断直接回复
     if is_continuous:
         logger.info("[群] 连续对话，直接回复")
     else:
         # 获取最近的对话历史作为上下文
-        recent_messages = memory_manager.get_recent_messages("group", limit=5)
+        recent_messages = await memory_manager.get_recent_messages(ctx.session_id, limit=5)
         context_text = ""
         if recent_messages:
             context_text = "\n最近的对话:\n"
@@ -183,7 +147,7 @@ async def handle_smart_reply(bot: Bot, event: GroupMessageEvent) -> None:
 只回复 "YES" 或 "NO"，不要有其他内容。
 """
         
-        decision: Optional[str] = ai_client.simple_chat(prompt)
+        decision: Optional[str] = await ai_client.simple_chat(prompt)
         
         if not decision or "YES" not in decision.upper():
             logger.debug("[群] AI判断不需要回复")
@@ -192,42 +156,15 @@ async def handle_smart_reply(bot: Bot, event: GroupMessageEvent) -> None:
         logger.info("[群] AI判断需要回复")
     
     # 更新触发时间
-    last_trigger_time = current_time
-    
-    # 检查是否需要联网搜索
-    search_context: Optional[str] = None
-    if web_search_client.should_search(message_text):
-        logger.info("[群] 触发联网搜索")
-        search_context = web_search_client.search(message_text)
-        if search_context:
-            logger.debug(f"[群] 搜索结果: {search_context[:100]}...")
-    
-    # 获取发送者信息
-    sender_name: str = event.sender.card or event.sender.nickname
-    
-    # 添加用户消息到记忆系统
-    memory_manager.add_message(
-        chat_type="group",
-        role="user",
-        content=message_text,
-        sender_id=sender_qq,
-        sender_name=sender_name
-    )
+    last_trigger_times[ctx.group_id] = current_time
     
-    # 获取上下文（包含相关记忆）
-    context = memory_manager.get_context_for_ai("group", message_text)
-    reply: Optional[str] = ai_client.chat(
-        context, 
-        search_context=search_context, 
-        chat_type="group", 
-        sender_qq=sender_qq
+    reply: Optional[str] = await pipeline.process(
+        ctx, send=lambda text: smart_matcher.send(Message(text))
     )
     
     if reply:
-        await smart_matcher.send(Message(reply))
-        memory_manager.add_message("group", "assistant", reply)
         logger.info(f"[群] 智能回复: {reply}")
         
         # 记录回复时间（用于连续对话检测）
-        recent_replies[sender_qq] = time.time()
+        recent_replies[reply_key] = time.time()
         logger.debug(f"[群] 记录智能回复: {sender_qq}")
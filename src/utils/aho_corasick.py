@@ -0,0 +1,109 @@
+"""Aho-Corasick 多模式匹配（敏感词检测）"""
+from collections import deque
+from typing import Dict, Generic, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def is_skippable(char: str) -> bool:
+    """是否是匹配时忽略的字符（空白和标点符号，与正则 [\\s\\W] 一致）"""
+    return not (char.isalnum() or char == "_")
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：去掉空白和符号并转小写
+
+    "政 治"、"政-治"、"政…治" 规范化后都是 "政治"，
+    这样一次扫描就能容忍在词中间插入符号的规避写法。
+    """
+    return "".join(char for char in text.casefold() if not is_skippable(char))
+
+
+class AhoCorasick(Generic[T]):
+    """Aho-Corasick 自动机
+
+    所有模式词构建成一棵带失败指针的字典树，匹配时文本只扫描一遍，
+    耗时与文本长度和命中数有关，与词表大小无关。
+    """
+
+    def __init__(self) -> None:
+        # 状态转移表：每个状态一个 {字符: 下一状态}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态自身结束的模式 (长度, 值)
+        self._terminal: List[List[Tuple[int, T]]] = [[]]
+        # build() 后：每个状态命中的全部模式（包括通过失败指针继承的）
+        self._output: List[List[Tuple[int, T]]] = [[]]
+        self._built = False
+        self.size = 0
+
+    def add(self, word: str, value: T) -> None:
+        """添加模式词
+
+        Args:
+            word: 模式词（调用方负责先规范化）
+            value: 命中时返回的值
+        """
+        if not word:
+            return
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append([])
+            state = next_state
+        self._terminal[state].append((len(word), value))
+        self.size += 1
+        self._built = False
+
+    def build(self) -> None:
+        """广度优先计算失败指针"""
+        self._output = [list(terminal) for terminal in self._terminal]
+        # 第一层的失败指针都指向根
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._built = True
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, T]]:
+        """扫描文本，逐个产出命中
+
+        Yields:
+            (起始位置, 结束位置(不含), 值)
+        """
+        if not self._built:
+            self.build()
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in output[state]:
+                yield index + 1 - length, index + 1, value
+
+    def find_all(self, text: str) -> List[T]:
+        """返回文本中命中的所有值（去重，按首次命中顺序）"""
+        found: List[T] = []
+        for _, _, value in self.iter(text):
+            if value not in found:
+                found.append(value)
+        return found
+
+    def __len__(self) -> int:
+        return self.size
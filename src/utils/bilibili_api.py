@@ -0,0 +1,180 @@
+"""B站接口客户端（异步、共享连接池、结果缓存）
+
+视频和番剧信息按 bvid / epid / ssid 缓存一段时间，同一个链接被反复转发时直接用缓存生成卡片；
+短链接跳转目标和 md→ss 这类编号映射不会变化，不设过期时间。
+"""
+import asyncio
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.utils.cache import LRUCache
+from src.utils.config import get_config
+from src.utils.logger import get_logger
+
+logger = get_logger("bilibili_api")
+
+API_BASE = "https://api.bilibili.com"
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Referer': 'https://www.bilibili.com/'
+}
+
+
+class BilibiliAPI:
+    """B站接口客户端"""
+
+    def __init__(self):
+        self.config = get_config()
+        self.timeout = self.config.get("bilibili.http.timeout", 10)
+        self.max_connections = self.config.get("bilibili.http.max_connections", 10)
+        self.per_host_limit = self.config.get("bilibili.http.per_host_limit", 4)
+
+        # 视频、番剧信息 {(类型, 编号): 接口返回的数据}
+        self._info: LRUCache[Dict[str, Any]] = LRUCache(
+            self.config.get("bilibili.cache.max_size", 512),
+            ttl=self.config.get("bilibili.cache.ttl", 600)
+        )
+        # 短链接跳转目标、编号映射（不会变化，不过期）
+        self._links: LRUCache[str] = LRUCache(self.config.get("bilibili.cache.link_max_size", 4096))
+
+        self._http_client: Optional[httpx.AsyncClient] = None
+        # 每个域名的并发请求数限制
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+        }
+
+    def _client(self) -> httpx.AsyncClient:
+        """共享的HTTP连接池（第一次请求时创建）"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                headers=HEADERS,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=self.timeout
+            )
+        return self._http_client
+
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        """发送GET请求（按域名限制并发）"""
+        host = urlsplit(url).hostname or ""
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        async with limit:
+            self._stats['requests'] += 1
+            return await self._client().get(url, **kwargs)
+
+    async def _get_api(self, url: str, params: Dict[str, Any], result_key: str) -> Optional[Dict[str, Any]]:
+        """调用B站API，成功时返回 result_key 对应的数据"""
+        try:
+            response = await self._get(url, params=params)
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            self._stats['errors'] += 1
+            logger.error(f"[B站解析] 网络请求失败: {e}")
+            return None
+
+        if data.get('code') != 0:
+            logger.error(f"[B站解析] API错误 (code={data.get('code')}): {data.get('message', '未知错误')}")
+            return None
+        return data.get(result_key)
+
+    async def get_video(self, bvid: str) -> Optional[Dict[str, Any]]:
+        """获取视频信息"""
+        key = ("bv", bvid)
+        info = self._info.get(key)
+        if info is None:
+            info = await self._get_api(f"{API_BASE}/x/web-interface/view", {"bvid": bvid}, "data")
+            if info:
+                self._info.put(key, info)
+        return info
+
+    async def get_bangumi(self, epid: Optional[str] = None, ssid: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """获取番剧信息（按EP号或SS号）"""
+        if epid:
+            key, params = ("ep", epid), {"ep_id": epid}
+        elif ssid:
+            key, params = ("ss", ssid), {"season_id": ssid}
+        else:
+            return None
+
+        info = self._info.get(key)
+        if info is None:
+            info = await self._get_api(f"{API_BASE}/pgc/view/web/season", params, "result")
+            if info:
+                self._info.put(key, info)
+        return info
+
+    async def md_to_ss(self, mdid: str) -> Optional[str]:
+        """MD号转SS号"""
+        key = ("md", mdid)
+        ssid = self._links.get(key)
+        if ssid is None:
+            result = await self._get_api(f"{API_BASE}/pgc/review/user", {"media_id": mdid}, "result")
+            try:
+                ssid = str(result['media']['season_id']) if result else None
+            except (KeyError, TypeError):
+                logger.error(f"[B站解析] MD转SS失败: md{mdid}")
+                ssid = None
+            if ssid:
+                self._links.put(key, ssid)
+        return ssid
+
+    async def resolve_short_link(self, host: str, code: str) -> Optional[str]:
+        """获取短链接的跳转目标（只读取跳转地址，不下载目标页面）"""
+        key = ("b23", code)
+        real_url = self._links.get(key)
+        if real_url is not None:
+            return real_url
+
+        try:
+            response = await self._get(f"https://{host}/{code}", follow_redirects=False)
+        except httpx.HTTPError as e:
+            self._stats['errors'] += 1
+            logger.error(f"[B站解析] 短链接请求失败: {e}")
+            return None
+
+        real_url = response.headers.get("location") if response.is_redirect else None
+        if not real_url:
+            logger.warning(f"[B站解析] 短链接没有跳转: {host}/{code} ({response.status_code})")
+            return None
+        self._links.put(key, real_url)
+        return real_url
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取请求和缓存统计"""
+        return {
+            **self._stats,
+            'info_cache': self._info.get_stats(),
+            'link_cache': self._links.get_stats(),
+        }
+
+    async def close(self) -> None:
+        """关闭HTTP连接池"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+# 全局实例
+_bilibili_api: Optional[BilibiliAPI] = None
+
+
+def get_bilibili_api() -> BilibiliAPI:
+    """获取B站接口客户端"""
+    global _bilibili_api
+    if _bilibili_api is None:
+        _bilibili_api = BilibiliAPI()
+    return _bilibili_api
+
+
+async def close_bilibili_api() -> None:
+    """关闭B站接口客户端（仅在已创建时）"""
+    if _bilibili_api is not None:
+        await _bilibili_api.close()
@@ -0,0 +1,58 @@
+"""B站链接识别
+
+一个带命名分组的正则，一次扫描提取消息中所有的 BV号、AV号、短链接、SS/EP/MD号。
+av/ss/ep/md 前面不能紧跟字母，避免把 "pass123"、"step2" 这类英文误认为番剧编号。
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+LINK_PATTERN = re.compile(
+    # 先用首字母快速跳过不可能是链接开头的位置（中文消息的扫描速度快约4倍）
+    r"(?=[BbAaSsEeMm])(?:"
+    r"(?P<bv>BV[0-9A-Za-z]{10})"                                    # BV号固定12位
+    r"|(?P<host>b23\.tv|bili2233\.cn)[/\\]+(?P<code>\w+)"           # 短链接，支持 / 和转义的 \/
+    r"|(?<![A-Za-z])(?P<kind>(?i:av|ss|ep|md))(?P<number>\d+)"
+    r")"
+)
+
+
+@dataclass
+class BiliLinks:
+    """消息中的B站链接（按出现顺序，去重）"""
+    bv: List[str] = field(default_factory=list)
+    av: List[str] = field(default_factory=list)
+    b23: List[Tuple[str, str]] = field(default_factory=list)
+    ss: List[str] = field(default_factory=list)
+    ep: List[str] = field(default_factory=list)
+    md: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.bv or self.av or self.b23 or self.ss or self.ep or self.md)
+
+    @property
+    def has_bangumi(self) -> bool:
+        """是否包含番剧链接"""
+        return bool(self.ss or self.ep or self.md)
+
+
+def scan_bilibili_links(text: str) -> BiliLinks:
+    """扫描消息中的B站链接
+
+    Args:
+        text: 消息内容（可以包含CQ码）
+
+    Returns:
+        BiliLinks实例，没有链接时为假值
+    """
+    links = BiliLinks()
+    for match in LINK_PATTERN.finditer(text):
+        if match.group("bv"):
+            found, value = links.bv, match.group("bv")
+        elif match.group("host"):
+            found, value = links.b23, (match.group("host"), match.group("code"))
+        else:
+            found, value = getattr(links, match.group("kind").lower()), match.group("number")
+        if value not in found:
+            found.append(value)
+    return links
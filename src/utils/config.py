@@ -1,46 +1,170 @@
 """配置管理"""
 import os
+import time
 import yaml
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Pattern, Tuple
 from dotenv import load_dotenv
 
+from src.utils.message_parser import compile_keywords
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """某一时刻的配置（加载时构建一次，之后只读）
+    
+    嵌套键展开成点号分隔的扁平键，get 只需要一次字典查找；
+    目标群、名字、关键词正则、固定回复等派生值预先计算好。
+    字典冻结为 MappingProxyType、列表冻结为元组，读取方拿到的值无法修改快照。
+    """
+    version: int
+    data: Mapping[str, Any]
+    flat: Mapping[str, Any]
+    bot_qq: str
+    admin_qq: str
+    target_groups: Tuple[str, ...]
+    target_group_set: FrozenSet[str]
+    names: Tuple[str, ...]
+    keywords: Tuple[str, ...]
+    keyword_pattern: Optional[Pattern]
+    fixed_replies: Tuple[Tuple[str, str], ...]
+    
+    @classmethod
+    def build(cls, data: Dict[str, Any], version: int) -> "ConfigSnapshot":
+        """从配置字典构建快照"""
+        data = _freeze(data)
+        flat: Dict[str, Any] = {}
+        _flatten(data, "", flat)
+        
+        def get(key: str, default: Any = None) -> Any:
+            value = flat.get(key)
+            return default if value is None else value
+        
+        groups = get("bot.target_groups") or []
+        if not groups:
+            single = get("bot.target_group", "")
+            groups = [single] if single else []
+        target_groups = tuple(str(group) for group in groups)
+        
+        personality = get("personality", {})
+        names = tuple(name for name in (personality.get("name", "沉舟"), personality.get("nickname", "舟舟")) if name)
+        keywords = tuple(get("keywords", []))
+        fixed_replies = tuple(
+            (str(keyword), str(reply))
+            for keyword, reply in (get("keyword_fixed_replies", {}) or {}).items()
+            if keyword and reply
+        )
+        
+        return cls(
+            version=version,
+            data=data,
+            flat=MappingProxyType(flat),
+            bot_qq=get("bot.qq_number", ""),
+            admin_qq=get("bot.admin_qq", ""),
+            target_groups=target_groups,
+            target_group_set=frozenset(target_groups),
+            names=names,
+            keywords=keywords,
+            keyword_pattern=compile_keywords(keywords),
+            fixed_replies=fixed_replies
+        )
+
+
+def _freeze(value: Any) -> Any:
+    """递归冻结配置值：字典转为只读映射，列表转为元组"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _flatten(node: Mapping[str, Any], prefix: str, flat: Dict[str, Any]) -> None:
+    """把嵌套字典展开成 {点号分隔的键: 值}（中间层的字典也保留）"""
+    for key, value in node.items():
+        path = f"{prefix}{key}"
+        flat[path] = value
+        if isinstance(value, Mapping):
+            _flatten(value, f"{path}.", flat)
+
+
 class Config:
     """配置管理器"""
     
     def __init__(self, config_path: str = "config/config.yaml"):
         self.config_path = Path(config_path)
-        self._config: Dict[str, Any] = {}
+        self._snapshot = ConfigSnapshot.build({}, 0)
+        self._mtime: float = 0.0
+        self._last_reload_check = time.monotonic()
         
         # 加载环境变量
         load_dotenv("config/.env")
         
         # 加载配置文件
         self._load_config()
+        self.reload_interval: float = self.get("bot.config_reload_interval", 5)
     
     def _load_config(self):
-        """加载配置文件"""
+        """加载配置文件（构建好新快照后整体替换，读取方不会看到一半的配置）"""
         if not self.config_path.exists():
             raise FileNotFoundError(f"配置文件不存在: {self.config_path}")
         
+        mtime = self.config_path.stat().st_mtime
         with open(self.config_path, "r", encoding="utf-8") as f:
-            self._config = yaml.safe_load(f)
+            data = yaml.safe_load(f)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            raise yaml.YAMLError(f"配置文件格式错误: {self.config_path}")
+        
+        self._snapshot = ConfigSnapshot.build(data, self._snapshot.version + 1)
+        self._mtime = mtime
     
-    def get(self, key: str, default: Any = None) -> Any:
-        """获取配置项（支持点号分隔的嵌套键）"""
-        keys = key.split(".")
-        value = self._config
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """当前配置快照（一次处理中多次读取时先取出快照，保证读到同一版本）"""
+        return self._snapshot
+    
+    @property
+    def version(self) -> int:
+        """配置版本（每次重新加载加一）"""
+        return self._snapshot.version
+    
+    def reload_if_changed(self) -> bool:
+        """配置文件被修改后重新加载
         
-        for k in keys:
-            if isinstance(value, dict):
-                value = value.get(k)
-            else:
-                return default
-            
-            if value is None:
-                return default
+        Returns:
+            是否重新加载了
+        """
+        try:
+            if self.config_path.stat().st_mtime == self._mtime:
+                return False
+            self._load_config()
+        except (OSError, yaml.YAMLError):
+            # 文件正在写入或格式错误时保留旧配置，下次再试
+            return False
+        return True
+    
+    def maybe_reload(self) -> bool:
+        """按间隔检查配置文件是否被修改（网页修改配置后无需重启）
         
-        return value
+        Returns:
+            是否重新加载了
+        """
+        if self.reload_interval <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_interval:
+            return False
+        self._last_reload_check = now
+        return self.reload_if_changed()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """获取配置项（支持点号分隔的嵌套键）"""
+        value = self._snapshot.flat.get(key)
+        return default if value is None else value
     
     def get_env(self, key: str, default: Optional[str] = None) -> Optional[str]:
         """获取环境变量"""
@@ -49,22 +173,32 @@ class Config:
     @property
     def bot_qq(self) -> str:
         """机器人QQ号"""
-        return self.get("bot.qq_number", "")
+        return self._snapshot.bot_qq
     
     @property
     def admin_qq(self) -> str:
         """管理员QQ号"""
-        return self.get("bot.admin_qq", "")
+        return self._snapshot.admin_qq
     
     @property
     def target_group(self) -> str:
-        """目标群号"""
-        return self.get("bot.target_group", "")
+        """目标群号（多群时为第一个群）"""
+        groups = self._snapshot.target_groups
+        return groups[0] if groups else ""
+    
+    @property
+    def target_groups(self) -> List[str]:
+        """所有目标群号（bot.target_groups，未配置时使用 bot.target_group）"""
+        return list(self._snapshot.target_groups)
+    
+    def is_target_group(self, group_id) -> bool:
+        """检查是否是目标群"""
+        return str(group_id) in self._snapshot.target_group_set
     
     @property
     def keywords(self) -> list:
         """关键词列表"""
-        return self.get("keywords", [])
+        return list(self._snapshot.keywords)
     
     @property
     def database_path(self) -> str:
@@ -1,5 +1,5 @@
 """配置验证器"""
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Mapping, Tuple
 from src.utils.logger import get_logger
 
 logger = get_logger("config_validator")
@@ -48,12 +48,16 @@ class ConfigValidator:
         required_fields = [
             ('bot.qq_number', '机器人QQ号'),
             ('bot.admin_qq', '管理员QQ号'),
-            ('bot.target_group', '目标群号'),
         ]
         
         for field_path, field_name in required_fields:
             if not self._get_nested_value(config, field_path):
                 self.errors.append(f"缺少必需配置: {field_name} ({field_path})")
+        
+        # 目标群：target_group 和 target_groups 至少配置一个
+        if (not self._get_nested_value(config, 'bot.target_group')
+                and not self._get_nested_value(config, 'bot.target_groups')):
+            self.errors.append("缺少必需配置: 目标群号 (bot.target_group 或 bot.target_groups)")
     
     def _validate_field_types(self, config: Dict[str, Any]) -> None:
         """验证字段类型"""
@@ -61,6 +65,7 @@ class ConfigValidator:
             ('bot.qq_number', str, 'QQ号必须是字符串'),
             ('bot.admin_qq', str, '管理员QQ号必须是字符串'),
             ('bot.target_group', str, '目标群号必须是字符串'),
+            ('bot.target_groups', (list, tuple), 'target_groups必须是群号列表'),
             ('ai.temperature', (int, float), 'AI温度参数必须是数字'),
             ('ai.max_tokens', int, 'max_tokens必须是整数'),
             ('conversation.max_messages', int, 'max_messages必须是整数'),
@@ -77,9 +82,27 @@ class ConfigValidator:
         range_checks = [
             ('ai.temperature', 0.0, 1.0, 'AI温度参数必须在0.0-1.0之间'),
             ('ai.max_tokens', 1, 4000, 'max_tokens必须在1-4000之间'),
+            ('ai.max_connections', 1, 200, 'max_connections必须在1-200之间'),
+            ('ai.prompt_cache.sender_cache_size', 1, 100000, 'prompt_cache.sender_cache_size必须在1-100000之间'),
+            ('ai.prompt_cache.sender_ttl', 1, 86400, 'prompt_cache.sender_ttl必须在1-86400秒之间'),
+            ('member_management.cache.max_size', 1, 1000000, 'member_management.cache.max_size必须在1-1000000之间'),
+            ('member_management.cache.ttl', 1, 86400, 'member_management.cache.ttl必须在1-86400秒之间'),
+            ('ai.stream.min_chunk_chars', 1, 200, 'stream.min_chunk_chars必须在1-200之间'),
+            ('bilibili.http.max_connections', 1, 100, 'bilibili.http.max_connections必须在1-100之间'),
+            ('bilibili.http.per_host_limit', 1, 100, 'bilibili.http.per_host_limit必须在1-100之间'),
             ('conversation.max_messages', 1, 100, 'max_messages必须在1-100之间'),
+            ('conversation.max_context_tokens', 100, 1000000, 'max_context_tokens必须在100-1000000之间'),
+            ('conversation.summary.trigger_tokens', 100, 1000000, 'summary.trigger_tokens必须在100-1000000之间'),
+            ('conversation.summary.keep_recent', 1, 100, 'summary.keep_recent必须在1-100之间'),
+            ('conversation.summary.max_chars', 50, 2000, 'summary.max_chars必须在50-2000之间'),
             ('memory.vector_db.search_results', 1, 20, 'search_results必须在1-20之间'),
             ('memory.vector_db.similarity_threshold', 0.0, 1.0, '相似度阈值必须在0.0-1.0之间'),
+            ('memory.write_behind.batch_size', 1, 1000, 'write_behind.batch_size必须在1-1000之间'),
+            ('memory.vector_db.local.ivf_min_size', 1, 100000000, 'vector_db.local.ivf_min_size必须在1-100000000之间'),
+            ('memory.vector_db.local.ivf_nprobe', 1, 4096, 'vector_db.local.ivf_nprobe必须在1-4096之间'),
+            ('memory.vector_db.local.rerank_factor', 1, 100, 'vector_db.local.rerank_factor必须在1-100之间'),
+            ('content_filter.local_model.flag_threshold', 0.5, 1.0, 'local_model.flag_threshold必须在0.5-1.0之间'),
+            ('content_filter.local_model.clean_threshold', 0.0, 0.5, 'local_model.clean_threshold必须在0.0-0.5之间'),
         ]
         
         for field_path, min_val, max_val, error_msg in range_checks:
@@ -122,7 +145,7 @@ class ConfigValidator:
         value = config
         
         for key in keys:
-            if isinstance(value, dict):
+            if isinstance(value, Mapping):
                 value = value.get(key)
             else:
                 return None
@@ -1,8 +1,14 @@
 """内容过滤器 - 敏感词检测和屏蔽"""
 import re
+import time
+from pathlib import Path
 from typing import Tuple, List, Optional
 from src.utils.config import get_config
 from src.utils.logger import get_logger
+from src.utils.aho_corasick import AhoCorasick, normalize_text
+from src.utils.jailbreak_detector import DEFAULT_JAILBREAK_RULES, JailbreakDetector
+from src.utils.moderation_cache import ModerationCache, moderation_key
+from src.utils.moderation_model import NgramNaiveBayes
 
 logger = get_logger("content_filter")
 
@@ -15,8 +21,29 @@ class ContentFilter:
         self._load_jailbreak_patterns()
         self.ai_filter_enabled = self.config.get("content_filter.ai_filter_enabled", True)
         
+        # 规则热加载（按间隔检查配置文件修改时间）
+        self.reload_interval: float = self.config.get("content_filter.reload_interval", 10)
+        self._last_reload_check = time.monotonic()
+        # 当前规则对应的配置版本
+        self._rules_version = self.config.version
+        
+        # 规范化后不超过这么多字的消息（如"早安"、纯表情）不调用AI审核
+        self.ai_skip_max_chars: int = self.config.get("content_filter.ai_skip_max_chars", 2)
+        
         # 延迟导入AI客户端，避免循环依赖
         self.ai_client = None
+        # 审核结论缓存（首次AI审核时创建）
+        self.verdict_cache: Optional[ModerationCache] = None
+        self.verdict_cache_enabled: bool = self.config.get("content_filter.verdict_cache.enabled", True)
+        
+        # 本地分类模型（AI审核前的第二层，只把拿不准的消息交给AI）
+        self.local_model: Optional[NgramNaiveBayes] = None
+        self._local_model_mtime = 0.0
+        self._local_stats = {
+            'local_clean': 0,
+            'local_flagged': 0,
+            'escalated': 0,
+        }
     
     def _get_ai_client(self):
         """延迟获取AI客户端"""
@@ -25,66 +52,117 @@ class ContentFilter:
             self.ai_client = get_ai_client()
         return self.ai_client
     
+    def _get_local_model(self) -> Optional[NgramNaiveBayes]:
+        """加载本地分类模型（未启用、未训练或模型文件更新时重新加载）"""
+        if not self.config.get("content_filter.local_model.enabled", True):
+            return None
+        
+        path = Path(self.config.get("content_filter.local_model.path", "data/moderation_model.json"))
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return None
+        
+        if self.local_model is None or mtime != self._local_model_mtime:
+            self._local_model_mtime = mtime
+            try:
+                model = NgramNaiveBayes.load(str(path))
+            except Exception as e:
+                logger.error(f"本地审核模型加载失败: {e}")
+                self.local_model = None
+                return None
+            self.local_model = model if model.is_trained else None
+            if self.local_model:
+                logger.info(f"已加载本地审核模型: {len(model.counts)} 个特征，"
+                            f"训练样本 不当{model.doc_counts[0]}/正常{model.doc_counts[1]}")
+        return self.local_model
+    
+    def _local_check(self, text: str) -> Optional[Tuple[bool, str]]:
+        """本地模型判断：置信度足够时返回结论，拿不准时返回None（交给AI）"""
+        model = self._get_local_model()
+        if model is None:
+            return None
+        
+        probability = model.predict_proba(text)
+        if probability >= self.config.get("content_filter.local_model.flag_threshold", 0.98):
+            self._local_stats['local_flagged'] += 1
+            logger.info(f"本地模型判定不当内容 ({probability:.3f}): {text[:30]}...")
+            return True, "本地模型"
+        if probability <= self.config.get("content_filter.local_model.clean_threshold", 0.02):
+            self._local_stats['local_clean'] += 1
+            return False, ""
+        
+        self._local_stats['escalated'] += 1
+        return None
+    
+    def _get_verdict_cache(self) -> Optional[ModerationCache]:
+        """延迟创建审核结论缓存（未启用时返回None）"""
+        if self.verdict_cache is None and self.verdict_cache_enabled:
+            try:
+                self.verdict_cache = ModerationCache(
+                    maxsize=self.config.get("content_filter.verdict_cache.max_size", 4096),
+                    ttl=self.config.get("content_filter.verdict_cache.ttl_hours", 24) * 3600,
+                    persist=self.config.get("content_filter.verdict_cache.persist", True)
+                )
+            except Exception as e:
+                logger.error(f"审核缓存初始化失败，不使用缓存: {e}")
+                self.verdict_cache_enabled = False
+        return self.verdict_cache
+    
     def _load_sensitive_words(self):
         """加载敏感词列表"""
         # 从配置文件读取敏感词
         self.sensitive_words = self.config.get("content_filter.sensitive_words", [])
         
-        # 编译正则表达式（支持变体，如加空格、符号等）
-        self.patterns = []
+        # 构建AC自动机（词和消息都去掉空格、符号后匹配，容忍中间插入符号的变体）
+        self.word_matcher: AhoCorasick[str] = AhoCorasick()
         for word in self.sensitive_words:
-            # 创建模糊匹配模式，允许中间插入空格、符号等
-            pattern = ''.join([f'{char}[\\s\\W]*' for char in word])
-            pattern = pattern.rstrip('[\\s\\W]*')  # 移除最后一个字符后的模式
-            self.patterns.append(re.compile(pattern, re.IGNORECASE))
+            self.word_matcher.add(normalize_text(word), word)
+        self.word_matcher.build()
         
         logger.info(f"已加载 {len(self.sensitive_words)} 个敏感词")
     
     def _load_jailbreak_patterns(self):
-        """加载越狱攻击检测模式"""
-        self.jailbreak_patterns = [
-            # 1. 提示词泄露尝试
-            re.compile(r'(输出|显示|告诉我|说出|复述|重复|翻译).{0,10}(系统提示|system prompt|提示词|指令|设定|prompt)', re.IGNORECASE),
-            re.compile(r'你的(系统提示|prompt|指令|设定|规则)是什么', re.IGNORECASE),
-            re.compile(r'(上面|之前|前面).{0,10}(说了什么|写了什么|内容|指令)', re.IGNORECASE),
-            
-            # 2. 身份覆盖尝试
-            re.compile(r'你现在是(?!沉舟|舟舟)', re.IGNORECASE),  # 不是原身份
-            re.compile(r'(扮演|假装|装作|当作).{0,10}(一个|你是)', re.IGNORECASE),
-            re.compile(r'忘记.{0,10}(之前|原来|以前).{0,10}(身份|角色|设定)', re.IGNORECASE),
-            re.compile(r'(现在|从现在开始).{0,10}你(不是|改成|变成|扮演)', re.IGNORECASE),
-            
-            # 3. 指令覆盖尝试
-            re.compile(r'忽略.{0,10}(之前|以前|上面|所有).{0,10}(指令|规则|限制|设定)', re.IGNORECASE),
-            re.compile(r'(重置|清除|删除|覆盖).{0,10}(指令|规则|限制|设定)', re.IGNORECASE),
-            re.compile(r'(新的|现在的|接下来的).{0,10}(指令|规则|任务)是', re.IGNORECASE),
-            re.compile(r'现在开始.{0,10}(新的|另一个)', re.IGNORECASE),
-            
-            # 4. 特殊模式激活
-            re.compile(r'(DAN|developer|开发者|调试|debug).{0,10}模式', re.IGNORECASE),
-            re.compile(r'(越狱|jailbreak|破解|绕过).{0,10}(模式|限制)', re.IGNORECASE),
-            re.compile(r'(激活|启用|开启).{0,10}(特殊|隐藏|管理员).{0,10}模式', re.IGNORECASE),
-            
-            # 5. 角色扮演诱导
-            re.compile(r'(我们来玩|玩一个|来玩).{0,10}(角色扮演|扮演游戏|RPG)', re.IGNORECASE),
-            re.compile(r'在(这个|那个).{0,10}(游戏|场景|故事).{0,10}(中|里).{0,10}你是', re.IGNORECASE),
-            
-            # 6. 规则测试
-            re.compile(r'测试.{0,10}(你的|系统).{0,10}(限制|规则|边界)', re.IGNORECASE),
-            re.compile(r'你(能不能|可以|可不可以).{0,10}(违反|打破|绕过)', re.IGNORECASE),
-            
-            # 7. 系统信息探测 ⚠️ 新增
-            re.compile(r'(查看|显示|告诉我|输出|获取).{0,15}(IP|ip|IP地址|ip地址|公网IP)', re.IGNORECASE),
-            re.compile(r'(查看|显示|告诉我|输出|获取).{0,15}(激活码|密钥|key|序列号|产品密钥)', re.IGNORECASE),
-            re.compile(r'(查看|显示|告诉我|输出|获取).{0,15}(系统信息|电脑信息|主机信息|机器信息)', re.IGNORECASE),
-            re.compile(r'(查看|显示|告诉我|输出|获取).{0,15}(环境变量|配置文件|config|\.env)', re.IGNORECASE),
-            re.compile(r'(查看|显示|告诉我|输出|获取).{0,15}(API.{0,5}key|api.{0,5}密钥|token)', re.IGNORECASE),
-            re.compile(r'(执行|运行).{0,10}(命令|cmd|powershell|bash|shell)', re.IGNORECASE),
-            re.compile(r'(读取|查看|打开).{0,10}(文件|目录|文件夹|路径)', re.IGNORECASE),
-            re.compile(r'ipconfig|ifconfig|whoami|hostname', re.IGNORECASE),
-        ]
-        
-        logger.info(f"已加载 {len(self.jailbreak_patterns)} 个越狱检测模式")
+        """加载越狱攻击检测规则（配置中的同名规则族覆盖默认规则）"""
+        rules = dict(DEFAULT_JAILBREAK_RULES)
+        custom_rules = self.config.get("content_filter.jailbreak_rules", {}) or {}
+        for family, patterns in custom_rules.items():
+            rules[family] = list(patterns or [])
+        
+        try:
+            detector = JailbreakDetector(rules)
+        except (re.error, ValueError) as e:
+            # 配置写错时保留原来的规则
+            if getattr(self, "jailbreak_detector", None) is not None:
+                logger.error(f"越狱检测规则有误，继续使用旧规则: {e}")
+                return
+            logger.error(f"越狱检测规则有误，使用默认规则: {e}")
+            detector = JailbreakDetector(DEFAULT_JAILBREAK_RULES)
+        
+        self.jailbreak_detector = detector
+        logger.info(f"已加载 {len(detector)} 个越狱检测模式（{detector.anchored_count} 个可预筛选）")
+    
+    def reload_rules_if_changed(self) -> bool:
+        """配置文件修改后重新加载敏感词和越狱规则（按间隔检查，不重启生效）
+        
+        Returns:
+            是否重新加载了
+        """
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_interval:
+            return False
+        self._last_reload_check = now
+        
+        # 配置可能已被其他模块重新加载，按版本号判断规则是否过期
+        self.config.reload_if_changed()
+        if self.config.version == self._rules_version:
+            return False
+        
+        logger.info("配置文件已修改，重新加载过滤规则")
+        self._load_sensitive_words()
+        self._load_jailbreak_patterns()
+        self._rules_version = self.config.version
+        return True
     
     def contains_sensitive_word(self, text: str) -> Tuple[bool, List[str]]:
         """
@@ -95,12 +173,8 @@ class ContentFilter:
         if not text:
             return False, []
         
-        matched_words = []
-        
-        # 检查每个敏感词
-        for i, pattern in enumerate(self.patterns):
-            if pattern.search(text):
-                matched_words.append(self.sensitive_words[i])
+        # 规范化后一次扫描匹配所有敏感词
+        matched_words = self.word_matcher.find_all(normalize_text(text))
         
         return len(matched_words) > 0, matched_words
     
@@ -108,20 +182,20 @@ class ContentFilter:
         """
         检测是否为越狱攻击尝试
         
-        返回: (是否为越狱尝试, 匹配的模式描述)
+        返回: (是否为越狱尝试, 匹配的模式描述（含命中的规则族）)
         """
         if not text:
             return False, ""
         
-        # 检查每个越狱模式
-        for pattern in self.jailbreak_patterns:
-            if pattern.search(text):
-                logger.warning(f"检测到越狱尝试: {text[:50]}...")
-                return True, "检测到可疑指令"
+        # 锚点预筛选后只执行候选规则
+        match = self.jailbreak_detector.match(text)
+        if match:
+            logger.warning(f"检测到越狱尝试 [{match.family}]: {text[:50]}...")
+            return True, f"检测到可疑指令({match.family})"
         
         return False, ""
     
-    def _ai_check_content(self, text: str) -> Tuple[bool, str]:
+    async def _ai_check_content(self, text: str) -> Tuple[bool, str]:
         """
         使用AI智能检测不当内容
         
@@ -130,6 +204,25 @@ class ContentFilter:
         if not self.ai_filter_enabled:
             return False, ""
         
+        # 很短或只有表情的消息按规则放行，不调用AI
+        key = moderation_key(text)
+        verdict_cache = self._get_verdict_cache()
+        if len(key) <= self.ai_skip_max_chars:
+            if verdict_cache is not None:
+                verdict_cache.record_skip()
+            return False, ""
+        
+        # 相同（规范化后）的消息直接使用缓存的结论
+        if verdict_cache is not None:
+            cached = verdict_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        # 本地模型有把握时不再调用AI
+        local_verdict = self._local_check(text)
+        if local_verdict is not None:
+            return local_verdict
+        
         try:
             ai_client = self._get_ai_client()
             
@@ -157,7 +250,7 @@ class ContentFilter:
 不要有任何其他解释。"""
 
             # 使用简单的上下文调用AI
-            response = ai_client.client.chat.completions.create(
+            response = await ai_client.client.chat.completions.create(
                 model=ai_client.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1,  # 降低温度，让判断更保守
@@ -171,21 +264,28 @@ class ContentFilter:
                 parts = result.split("|")
                 content_type = parts[1] if len(parts) > 1 else "不当内容"
                 logger.info(f"AI检测到不当内容: {content_type} - {text[:30]}...")
-                return True, content_type
+                verdict = (True, content_type)
+            else:
+                verdict = (False, "")
             
-            return False, ""
+            # 只缓存成功的判断，失败时下次重新审核
+            if verdict_cache is not None:
+                await verdict_cache.put(key, *verdict)
+            return verdict
             
         except Exception as e:
             logger.error(f"AI内容检测失败: {e}")
             # 失败时不拦截，避免误伤
             return False, ""
     
-    def should_ignore_message(self, text: str) -> Tuple[bool, str]:
+    async def should_ignore_message(self, text: str) -> Tuple[bool, str]:
         """
         判断是否应该忽略该消息
         
         返回: (是否忽略, 原因)
         """
+        self.reload_rules_if_changed()
+        
         # 1. 检查越狱尝试（最高优先级）
         is_jailbreak, jailbreak_reason = self.is_jailbreak_attempt(text)
         if is_jailbreak:
@@ -202,7 +302,7 @@ class ContentFilter:
         
         # 3. 如果关键词没匹配，使用AI智能检测（更全面）
         if self.ai_filter_enabled:
-            has_inappropriate, content_type = self._ai_check_content(text)
+            has_inappropriate, content_type = await self._ai_check_content(text)
             if has_inappropriate:
                 reason = f"AI检测: {content_type}"
                 logger.warning(f"AI检测到不当内容: {reason}")
@@ -210,6 +310,18 @@ class ContentFilter:
         
         return False, ""
     
+    def get_stats(self) -> dict:
+        """获取过滤统计"""
+        stats = {
+            'sensitive_words': len(self.sensitive_words),
+            'jailbreak_rules': len(self.jailbreak_detector),
+        }
+        if self.verdict_cache is not None:
+            stats['verdict_cache'] = self.verdict_cache.get_stats()
+        if self.local_model is not None:
+            stats['local_model'] = dict(self._local_stats)
+        return stats
+    
     def get_warning_message(self, reason: str = "") -> str:
         """获取警告消息
         
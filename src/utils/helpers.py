@@ -3,16 +3,7 @@ import re
 import random
 from typing import List, Optional
 
-# B站链接检测正则（全局编译，避免重复编译）
-_REG_BV = re.compile(r'BV[0-9A-Za-z]{10}')
-_REG_AV = re.compile(r'av(\d+)', re.IGNORECASE)
-_REG_B23 = re.compile(r'(b23\.tv|bili2233\.cn)')
-_REG_SS = re.compile(r'ss(\d+)', re.IGNORECASE)
-_REG_EP = re.compile(r'ep(\d+)', re.IGNORECASE)
-_REG_MD = re.compile(r'md(\d+)', re.IGNORECASE)
-
-# B站关键词（用于快速预检查）
-_BILIBILI_KEYWORDS = ['bilibili', 'b23.tv', 'BV', 'av', 'ss', 'ep', 'md', '哔哩哔哩']
+from src.utils.bilibili_links import scan_bilibili_links
 
 
 def random_choice(items: List[str]) -> str:
@@ -69,7 +60,7 @@ def contains_keyword(message: str, keywords: List[str]) -> bool:
 
 
 def has_bilibili_link(message: str) -> bool:
-    """检测消息中是否包含B站链接（优化版：快速预检查+正则匹配）
+    """检测消息中是否包含B站链接
     
     Args:
         message: 消息内容
@@ -77,16 +68,29 @@ def has_bilibili_link(message: str) -> bool:
     Returns:
         是否包含B站链接
     """
-    # 快速预检查：只有包含B站关键词时才进行正则匹配
-    if not any(keyword in message for keyword in _BILIBILI_KEYWORDS):
-        return False
+    return bool(scan_bilibili_links(message))
+
+
+def make_session_id(chat_type: str, chat_id: str) -> str:
+    """生成会话ID（每个群、每个私聊对象各自独立）
+    
+    Args:
+        chat_type: 聊天类型（group/private）
+        chat_id: 群号或私聊对象QQ号
+        
+    Returns:
+        会话ID，如 "group:123456"
+    """
+    return f"{chat_type}:{chat_id}"
+
+
+def session_chat_type(session_id: str) -> str:
+    """从会话ID中取出聊天类型
     
-    # 正则匹配
-    return bool(
-        _REG_BV.search(message) or 
-        _REG_AV.search(message) or 
-        _REG_B23.search(message) or 
-        _REG_SS.search(message) or 
-        _REG_EP.search(message) or 
-        _REG_MD.search(message)
-    )
+    Args:
+        session_id: 会话ID
+        
+    Returns:
+        聊天类型（group/private）
+    """
+    return session_id.split(":", 1)[0]
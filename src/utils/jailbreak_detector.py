@@ -0,0 +1,286 @@
+"""越狱攻击检测规则引擎
+
+每条规则是一个正则，按"规则族"分组。构建时从正则中提取必须出现的字面锚点词
+（如 输出/忽略/扮演/DAN/ipconfig），所有锚点合并成一个多选正则：
+匹配时先扫描找出锚点命中的候选规则，只对候选规则执行完整正则。
+"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import re
+
+# 默认规则 {规则族: [正则]}
+DEFAULT_JAILBREAK_RULES: Dict[str, List[str]] = {
+    # 1. 提示词泄露尝试
+    "prompt_leak": [
+        r'(输出|显示|告诉我|说出|复述|重复|翻译).{0,10}(系统提示|system prompt|提示词|指令|设定|prompt)',
+        r'你的(系统提示|prompt|指令|设定|规则)是什么',
+        r'(上面|之前|前面).{0,10}(说了什么|写了什么|内容|指令)',
+    ],
+    # 2. 身份覆盖尝试
+    "identity_override": [
+        r'你现在是(?!沉舟|舟舟)',  # 不是原身份
+        r'(扮演|假装|装作|当作).{0,10}(一个|你是)',
+        r'忘记.{0,10}(之前|原来|以前).{0,10}(身份|角色|设定)',
+        r'(现在|从现在开始).{0,10}你(不是|改成|变成|扮演)',
+    ],
+    # 3. 指令覆盖尝试
+    "instruction_override": [
+        r'忽略.{0,10}(之前|以前|上面|所有).{0,10}(指令|规则|限制|设定)',
+        r'(重置|清除|删除|覆盖).{0,10}(指令|规则|限制|设定)',
+        r'(新的|现在的|接下来的).{0,10}(指令|规则|任务)是',
+        r'现在开始.{0,10}(新的|另一个)',
+    ],
+    # 4. 特殊模式激活
+    "special_mode": [
+        r'(DAN|developer|开发者|调试|debug).{0,10}模式',
+        r'(越狱|jailbreak|破解|绕过).{0,10}(模式|限制)',
+        r'(激活|启用|开启).{0,10}(特殊|隐藏|管理员).{0,10}模式',
+    ],
+    # 5. 角色扮演诱导
+    "roleplay": [
+        r'(我们来玩|玩一个|来玩).{0,10}(角色扮演|扮演游戏|RPG)',
+        r'在(这个|那个).{0,10}(游戏|场景|故事).{0,10}(中|里).{0,10}你是',
+    ],
+    # 6. 规则测试
+    "rule_probe": [
+        r'测试.{0,10}(你的|系统).{0,10}(限制|规则|边界)',
+        r'你(能不能|可以|可不可以).{0,10}(违反|打破|绕过)',
+    ],
+    # 7. 系统信息探测
+    "system_probe": [
+        r'(查看|显示|告诉我|输出|获取).{0,15}(IP|ip|IP地址|ip地址|公网IP)',
+        r'(查看|显示|告诉我|输出|获取).{0,15}(激活码|密钥|key|序列号|产品密钥)',
+        r'(查看|显示|告诉我|输出|获取).{0,15}(系统信息|电脑信息|主机信息|机器信息)',
+        r'(查看|显示|告诉我|输出|获取).{0,15}(环境变量|配置文件|config|\.env)',
+        r'(查看|显示|告诉我|输出|获取).{0,15}(API.{0,5}key|api.{0,5}密钥|token)',
+        r'(执行|运行).{0,10}(命令|cmd|powershell|bash|shell)',
+        r'(读取|查看|打开).{0,10}(文件|目录|文件夹|路径)',
+        r'ipconfig|ifconfig|whoami|hostname',
+    ],
+}
+
+# 正则中的特殊字符（其余字符按字面匹配）
+_SPECIAL_CHARS = set(".^$*+?{}[]\\|()")
+
+
+@dataclass(frozen=True)
+class JailbreakMatch:
+    """命中的规则"""
+    family: str
+    pattern: str
+
+
+def _split_top_level(pattern: str, separator: str = "|") -> List[str]:
+    """按顶层的分隔符切分正则（忽略括号和字符类内部的分隔符）"""
+    parts = []
+    depth = 0
+    in_class = False
+    start = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    parts.append(pattern[start:])
+    return parts
+
+
+def _find_group_end(pattern: str, start: int) -> int:
+    """返回从 start 处左括号开始的分组的右括号位置"""
+    depth = 0
+    in_class = False
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError(f"括号不匹配: {pattern}")
+
+
+def _is_plain(text: str) -> bool:
+    """是否是纯字面文本（不含正则特殊字符）"""
+    return bool(text) and not any(char in _SPECIAL_CHARS for char in text)
+
+
+def _branch_anchors(branch: str) -> Optional[FrozenSet[str]]:
+    """提取一个分支中必须出现的字面锚点集合（命中其中之一才可能匹配）
+
+    依次扫描分支中的各个原子：连续的普通字符组成字面串，纯字面的分组
+    （如 (输出|显示)）提供一组候选词；可选的原子（?、*、{0,n}）和零宽断言不算。
+    在所有候选中选最短词最长的一组，找不到时返回 None（规则每次都要执行）。
+    """
+    candidates: List[FrozenSet[str]] = []
+    literal = ""
+    i = 0
+
+    def flush():
+        nonlocal literal
+        if literal:
+            candidates.append(frozenset([literal]))
+        literal = ""
+
+    while i < len(branch):
+        char = branch[i]
+        atom_set: Optional[FrozenSet[str]] = None
+        is_literal_char = False
+
+        if char == "(":
+            end = _find_group_end(branch, i)
+            body = branch[i + 1:end]
+            if body.startswith("?:"):
+                body = body[2:]
+            elif body.startswith("?"):
+                # 零宽断言、命名分组等不提供锚点
+                body = ""
+            alternatives = _split_top_level(body) if body else []
+            if alternatives and all(_is_plain(alt) for alt in alternatives):
+                atom_set = frozenset(alternatives)
+            next_i = end + 1
+        elif char == "[":
+            end = branch.index("]", i + 1)
+            next_i = end + 1
+        elif char == "\\":
+            escaped = branch[i + 1:i + 2]
+            # \. \- 等转义的符号按字面处理，\d \s 等字符类不是字面
+            is_literal_char = bool(escaped) and not escaped.isalnum()
+            next_i = i + 2
+            char = escaped
+        elif char in _SPECIAL_CHARS:
+            next_i = i + 1
+        else:
+            is_literal_char = True
+            next_i = i + 1
+
+        # 处理量词
+        optional = False
+        quantified = False
+        if next_i < len(branch) and branch[next_i] in "?*+{":
+            quantified = True
+            quantifier = branch[next_i]
+            if quantifier in "?*":
+                optional = True
+            elif quantifier == "{":
+                close = branch.index("}", next_i)
+                minimum = branch[next_i + 1:close].split(",")[0].strip()
+                optional = not minimum or int(minimum) == 0
+                next_i = close
+            next_i += 1
+            if next_i < len(branch) and branch[next_i] == "?":
+                next_i += 1
+
+        if is_literal_char and not quantified:
+            literal += char
+        else:
+            flush()
+            if is_literal_char and not optional:
+                atom_set = frozenset([char])
+            if atom_set is not None and not optional:
+                candidates.append(atom_set)
+        i = next_i
+    flush()
+
+    if not candidates:
+        return None
+    return max(candidates, key=lambda words: (min(len(word) for word in words), -len(words)))
+
+
+def extract_anchors(pattern: str) -> Optional[FrozenSet[str]]:
+    """提取正则的锚点词集合（顶层多分支时取各分支锚点的并集）"""
+    anchors = set()
+    for branch in _split_top_level(pattern):
+        branch_anchors = _branch_anchors(branch)
+        if branch_anchors is None:
+            return None
+        anchors.update(branch_anchors)
+    return frozenset(anchors)
+
+
+class JailbreakDetector:
+    """越狱检测规则引擎（锚点预筛选 + 候选规则正则匹配）"""
+
+    def __init__(self, rules: Dict[str, List[str]]):
+        # [(规则族, 正则原文, 编译后的正则)]
+        self.rules: List[Tuple[str, str, "re.Pattern[str]"]] = []
+        # 没有锚点、每次都要执行的规则下标
+        self._always: List[int] = []
+        # {锚点: 规则下标集合}
+        self._anchor_rules: Dict[str, Set[int]] = {}
+
+        for family, patterns in rules.items():
+            for pattern in patterns:
+                index = len(self.rules)
+                self.rules.append((family, pattern, re.compile(pattern, re.IGNORECASE)))
+                anchors = extract_anchors(pattern)
+                if anchors is None:
+                    self._always.append(index)
+                    continue
+                for anchor in anchors:
+                    self._anchor_rules.setdefault(anchor.casefold(), set()).add(index)
+
+        # 多选正则在同一位置只报告最长的锚点，所以每个锚点同时带上它所有前缀锚点的规则
+        self._anchor_closure: Dict[str, FrozenSet[int]] = {
+            anchor: frozenset().union(*(
+                indexes for other, indexes in self._anchor_rules.items() if anchor.startswith(other)
+            ))
+            for anchor in self._anchor_rules
+        }
+        self._anchor_regex: Optional["re.Pattern[str]"] = None
+        if self._anchor_rules:
+            longest_first = sorted(self._anchor_rules, key=len, reverse=True)
+            self._anchor_regex = re.compile("|".join(re.escape(anchor) for anchor in longest_first))
+
+    def candidates(self, text: str) -> List[int]:
+        """锚点预筛选：返回可能命中的规则下标（按规则顺序）"""
+        indexes = set(self._always)
+        if self._anchor_regex is not None:
+            folded = text.casefold()
+            search = self._anchor_regex.search
+            # 每次从上一个命中的下一个字符继续，重叠的锚点也不会漏掉
+            found = search(folded)
+            while found:
+                indexes.update(self._anchor_closure[found.group()])
+                found = search(folded, found.start() + 1)
+        return sorted(indexes)
+
+    def match(self, text: str) -> Optional[JailbreakMatch]:
+        """检测文本，返回第一条命中的规则"""
+        if not text:
+            return None
+        for index in self.candidates(text):
+            family, pattern, compiled = self.rules[index]
+            if compiled.search(text):
+                return JailbreakMatch(family, pattern)
+        return None
+
+    @property
+    def anchored_count(self) -> int:
+        """有锚点（可被预筛选跳过）的规则数"""
+        return len(self.rules) - len(self._always)
+
+    def __len__(self) -> int:
+        return len(self.rules)
@@ -0,0 +1,357 @@
+"""本地回答（时间、日期、星期、农历、倒计时）
+
+这类问题本机就能回答，不需要联网搜索。每个回答器判断能否回答并给出结果，
+按注册顺序依次尝试，第一个给出结果的生效。所有回答器都接受 now 参数，便于离线测试。
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+WEEKDAYS = ("一", "二", "三", "四", "五", "六", "日")
+
+# 农历数据（1900-2049）：低4位为闰月月份（0表示无闰月），
+# 第16~5位依次表示正月到十二月是否为大月（30天），第17位表示闰月是否为大月
+LUNAR_INFO = (
+    0x04bd8, 0x04ae0, 0x0a570, 0x054d5, 0x0d260, 0x0d950, 0x16554, 0x056a0, 0x09ad0, 0x055d2,  # 1900
+    0x04ae0, 0x0a5b6, 0x0a4d0, 0x0d250, 0x1d255, 0x0b540, 0x0d6a0, 0x0ada2, 0x095b0, 0x14977,  # 1910
+    0x04970, 0x0a4b0, 0x0b4b5, 0x06a50, 0x06d40, 0x1ab54, 0x02b60, 0x09570, 0x052f2, 0x04970,  # 1920
+    0x06566, 0x0d4a0, 0x0ea50, 0x16a95, 0x05ad0, 0x02b60, 0x186e3, 0x092e0, 0x1c8d7, 0x0c950,  # 1930
+    0x0d4a0, 0x1d8a6, 0x0b550, 0x056a0, 0x1a5b4, 0x025d0, 0x092d0, 0x0d2b2, 0x0a950, 0x0b557,  # 1940
+    0x06ca0, 0x0b550, 0x15355, 0x04da0, 0x0a5b0, 0x14573, 0x052b0, 0x0a9a8, 0x0e950, 0x06aa0,  # 1950
+    0x0aea6, 0x0ab50, 0x04b60, 0x0aae4, 0x0a570, 0x05260, 0x0f263, 0x0d950, 0x05b57, 0x056a0,  # 1960
+    0x096d0, 0x04dd5, 0x04ad0, 0x0a4d0, 0x0d4d4, 0x0d250, 0x0d558, 0x0b540, 0x0b6a0, 0x195a6,  # 1970
+    0x095b0, 0x049b0, 0x0a974, 0x0a4b0, 0x0b27a, 0x06a50, 0x06d40, 0x0af46, 0x0ab60, 0x09570,  # 1980
+    0x04af5, 0x04970, 0x064b0, 0x074a3, 0x0ea50, 0x06b58, 0x05ac0, 0x0ab60, 0x096d5, 0x092e0,  # 1990
+    0x0c960, 0x0d954, 0x0d4a0, 0x0da50, 0x07552, 0x056a0, 0x0abb7, 0x025d0, 0x092d0, 0x0cab5,  # 2000
+    0x0a950, 0x0b4a0, 0x0baa4, 0x0ad50, 0x055d9, 0x04ba0, 0x0a5b0, 0x15176, 0x052b0, 0x0a930,  # 2010
+    0x07954, 0x06aa0, 0x0ad50, 0x05b52, 0x04b60, 0x0a6e6, 0x0a4e0, 0x0d260, 0x0ea65, 0x0d530,  # 2020
+    0x05aa0, 0x076a3, 0x096d0, 0x04afb, 0x04ad0, 0x0a4d0, 0x1d0b6, 0x0d250, 0x0d520, 0x0dd45,  # 2030
+    0x0b5a0, 0x056d0, 0x055b2, 0x049b0, 0x0a577, 0x0a4b0, 0x0aa50, 0x1b255, 0x06d20, 0x0ada0,  # 2040
+)
+LUNAR_MIN_YEAR = 1900
+LUNAR_MAX_YEAR = LUNAR_MIN_YEAR + len(LUNAR_INFO) - 1
+# 农历1900年正月初一
+LUNAR_BASE_DATE = date(1900, 1, 31)
+
+LUNAR_MONTHS = ("正", "二", "三", "四", "五", "六", "七", "八", "九", "十", "冬", "腊")
+LUNAR_DAY_TENS = ("初", "十", "廿", "三")
+CHINESE_DIGITS = ("十", "一", "二", "三", "四", "五", "六", "七", "八", "九")
+HEAVENLY_STEMS = "甲乙丙丁戊己庚辛壬癸"
+EARTHLY_BRANCHES = "子丑寅卯辰巳午未申酉戌亥"
+ZODIAC = "鼠牛虎兔龙蛇马羊猴鸡狗猪"
+
+# 相对日期（按长度从长到短匹配，避免"大后天"被识别成"后天"）
+DAY_OFFSETS = (("大后天", 3), ("大前天", -3), ("后天", 2), ("前天", -2), ("明天", 1), ("昨天", -1), ("今天", 0))
+# 问句中表示"哪一天"的主语（"我今天没时间"、"你几月生日"这类闲聊不算提问）
+DAY_WORDS = "|".join(word for word, _ in DAY_OFFSETS) + "|现在|今儿"
+
+
+def _leap_month(year: int) -> int:
+    """闰月月份（0表示无闰月）"""
+    return LUNAR_INFO[year - LUNAR_MIN_YEAR] & 0xf
+
+
+def _leap_days(year: int) -> int:
+    """闰月天数"""
+    if not _leap_month(year):
+        return 0
+    return 30 if LUNAR_INFO[year - LUNAR_MIN_YEAR] & 0x10000 else 29
+
+
+def _month_days(year: int, month: int) -> int:
+    """农历某月（非闰月）的天数"""
+    return 30 if LUNAR_INFO[year - LUNAR_MIN_YEAR] & (0x10000 >> month) else 29
+
+
+def _year_days(year: int) -> int:
+    """农历一年的总天数"""
+    return sum(_month_days(year, month) for month in range(1, 13)) + _leap_days(year)
+
+
+def _lunar_months(year: int) -> List[Tuple[int, bool, int]]:
+    """农历一年中按顺序排列的月份 [(月, 是否闰月, 天数)]"""
+    leap = _leap_month(year)
+    months = []
+    for month in range(1, 13):
+        months.append((month, False, _month_days(year, month)))
+        if month == leap:
+            months.append((month, True, _leap_days(year)))
+    return months
+
+
+def solar_to_lunar(day: date) -> Tuple[int, int, int, bool]:
+    """公历转农历
+
+    Returns:
+        (农历年, 月, 日, 是否闰月)
+
+    Raises:
+        ValueError: 超出支持的范围
+    """
+    offset = (day - LUNAR_BASE_DATE).days
+    if offset < 0:
+        raise ValueError(f"日期超出农历数据范围: {day}")
+
+    year = LUNAR_MIN_YEAR
+    while year <= LUNAR_MAX_YEAR and offset >= _year_days(year):
+        offset -= _year_days(year)
+        year += 1
+    if year > LUNAR_MAX_YEAR:
+        raise ValueError(f"日期超出农历数据范围: {day}")
+
+    for month, is_leap, days in _lunar_months(year):
+        if offset < days:
+            return year, month, offset + 1, is_leap
+        offset -= days
+    raise ValueError(f"农历数据错误: {day}")
+
+
+def lunar_to_solar(year: int, month: int, day: int, is_leap: bool = False) -> date:
+    """农历转公历
+
+    Raises:
+        ValueError: 超出支持的范围或日期不存在
+    """
+    if not LUNAR_MIN_YEAR <= year <= LUNAR_MAX_YEAR:
+        raise ValueError(f"年份超出农历数据范围: {year}")
+
+    offset = sum(_year_days(y) for y in range(LUNAR_MIN_YEAR, year))
+    for lunar_month, leap, days in _lunar_months(year):
+        if lunar_month == month and leap == is_leap:
+            if not 1 <= day <= days:
+                raise ValueError(f"农历日期不存在: {year}-{month}-{day}")
+            return LUNAR_BASE_DATE + timedelta(days=offset + day - 1)
+        offset += days
+    raise ValueError(f"农历日期不存在: {year}-{'闰' if is_leap else ''}{month}-{day}")
+
+
+def format_lunar_day(day: int) -> str:
+    """农历日的中文写法（初一、十五、廿三）"""
+    if day == 10:
+        return "初十"
+    if day == 20:
+        return "二十"
+    if day == 30:
+        return "三十"
+    return LUNAR_DAY_TENS[day // 10] + CHINESE_DIGITS[day % 10]
+
+
+def lunar_year_name(year: int) -> str:
+    """农历年的干支和生肖（如 丙午马年）"""
+    return f"{HEAVENLY_STEMS[(year - 4) % 10]}{EARTHLY_BRANCHES[(year - 4) % 12]}{ZODIAC[(year - 4) % 12]}年"
+
+
+def format_lunar_date(day: date) -> str:
+    """公历日期对应的农历写法（如 丙午马年九月初七）"""
+    year, month, lunar_day, is_leap = solar_to_lunar(day)
+    return f"{lunar_year_name(year)}{'闰' if is_leap else ''}{LUNAR_MONTHS[month - 1]}月{format_lunar_day(lunar_day)}"
+
+
+def format_date(day: date) -> str:
+    """公历日期写法（如 2026年10月17日 星期六）"""
+    return f"{day.year}年{day.month}月{day.day}日 星期{WEEKDAYS[day.weekday()]}"
+
+
+def _day_offset(query: str) -> Tuple[int, str]:
+    """识别问题中的相对日期
+
+    Returns:
+        (相对今天的天数, 说法)
+    """
+    for word, offset in DAY_OFFSETS:
+        if word in query:
+            return offset, word
+    return 0, "今天"
+
+
+class LocalAnswerProvider:
+    """本地回答器基类"""
+
+    name = "base"
+
+    def answer(self, query: str, now: datetime) -> Optional[str]:
+        """能回答时返回答案，否则返回None"""
+        raise NotImplementedError
+
+
+class CountdownProvider(LocalAnswerProvider):
+    """节日倒计时（距离春节/国庆/周末还有几天）"""
+
+    name = "countdown"
+
+    TRIGGERS = ("还有几天", "还有多少天", "还有多久", "倒计时", "几天后", "多少天后")
+    # 公历节日 {名称: (月, 日)}
+    SOLAR_HOLIDAYS = {
+        "元旦": (1, 1), "情人节": (2, 14), "妇女节": (3, 8), "劳动节": (5, 1), "五一": (5, 1),
+        "儿童节": (6, 1), "高考": (6, 7), "国庆": (10, 1), "十一": (10, 1), "双十一": (11, 11),
+        "平安夜": (12, 24), "圣诞": (12, 25),
+    }
+    # 农历节日 {名称: (月, 日)}
+    LUNAR_HOLIDAYS = {
+        "春节": (1, 1), "过年": (1, 1), "元宵": (1, 15), "端午": (5, 5),
+        "七夕": (7, 7), "中秋": (8, 15), "重阳": (9, 9), "腊八": (12, 8),
+    }
+
+    def answer(self, query: str, now: datetime) -> Optional[str]:
+        if not any(trigger in query for trigger in self.TRIGGERS):
+            return None
+
+        today = now.date()
+        if "周末" in query:
+            days = (5 - today.weekday()) % 7
+            return "今天就是周末" if today.weekday() >= 5 else f"距离周末（周六）还有{days}天"
+
+        target = self._next_holiday(query, today)
+        if target is None:
+            return None
+        name, day = target
+        days = (day - today).days
+        if days == 0:
+            return f"今天就是{name}（{format_date(day)}）"
+        return f"距离{name}（{format_date(day)}）还有{days}天"
+
+    def _next_holiday(self, query: str, today: date) -> Optional[Tuple[str, date]]:
+        """今天或之后最近的一次节日"""
+        # 长的名称先匹配（"双十一"不能被识别成"十一"）
+        for name in sorted(self.SOLAR_HOLIDAYS, key=len, reverse=True):
+            if name in query:
+                month, day = self.SOLAR_HOLIDAYS[name]
+                target = date(today.year, month, day)
+                if target < today:
+                    target = date(today.year + 1, month, day)
+                return name, target
+
+        if "除夕" in query:
+            spring = self._next_lunar(1, 1, today + timedelta(days=1))
+            return ("除夕", spring - timedelta(days=1)) if spring else None
+
+        for name, (month, day) in self.LUNAR_HOLIDAYS.items():
+            if name in query:
+                target = self._next_lunar(month, day, today)
+                return (name, target) if target else None
+        return None
+
+    @staticmethod
+    def _next_lunar(month: int, day: int, today: date) -> Optional[date]:
+        """今天或之后最近的农历某月某日"""
+        lunar_year = solar_to_lunar(today)[0]
+        for year in (lunar_year, lunar_year + 1):
+            try:
+                target = lunar_to_solar(year, month, day)
+            except ValueError:
+                return None
+            if target >= today:
+                return target
+        return None
+
+
+class LunarProvider(LocalAnswerProvider):
+    """农历日期"""
+
+    name = "lunar"
+
+    # 今天农历几号、明天是阴历初几、农历今天是几号
+    PATTERN = re.compile(
+        rf"(?:{DAY_WORDS})(?:是|的)?(?:农历|阴历|旧历|初几)|^(?:农历|阴历|旧历)(?:{DAY_WORDS}|几月|几号|日期|是?多少)"
+    )
+
+    def answer(self, query: str, now: datetime) -> Optional[str]:
+        if not self.PATTERN.search(query):
+            return None
+        offset, word = _day_offset(query)
+        day = now.date() + timedelta(days=offset)
+        try:
+            return f"{word}是{format_date(day)}，农历{format_lunar_date(day)}"
+        except ValueError:
+            return None
+
+
+class WeekdayProvider(LocalAnswerProvider):
+    """星期几"""
+
+    name = "weekday"
+
+    # 今天星期几、明天是周几、星期几了（不含"你周几有空"）
+    PATTERN = re.compile(rf"(?:^|{DAY_WORDS})是?(?:星期几|周几|礼拜几)")
+
+    def answer(self, query: str, now: datetime) -> Optional[str]:
+        if not self.PATTERN.search(query):
+            return None
+        offset, word = _day_offset(query)
+        day = now.date() + timedelta(days=offset)
+        return f"{word}是星期{WEEKDAYS[day.weekday()]}（{day.year}年{day.month}月{day.day}日）"
+
+
+class DateProvider(LocalAnswerProvider):
+    """日期"""
+
+    name = "date"
+
+    # 今天几号、今天是几月几号、明天是哪天、今天的日期（不含"哪天一起吃饭"、"你几月生日"）
+    PATTERN = re.compile(
+        rf"(?:{DAY_WORDS})(?:是|的日期是)?(?:几月几|几号|几月|多少号|哪一?天|什么日期)|(?:{DAY_WORDS})的?日期|^(?:几月几[号日]|几号)"
+    )
+
+    def answer(self, query: str, now: datetime) -> Optional[str]:
+        if not self.PATTERN.search(query):
+            return None
+        offset, word = _day_offset(query)
+        return f"{word}是{format_date(now.date() + timedelta(days=offset))}"
+
+
+class TimeProvider(LocalAnswerProvider):
+    """当前时间"""
+
+    name = "time"
+
+    # 现在几点、现在是什么时间、几点了（不含"我今天没时间"、"明天几点出发"）
+    PATTERN = re.compile(
+        r"(?:现在|目前|当前|此刻|这会儿?)(?:是|的)?(?:几点|什么时间|啥时间|几时|时间)|^几点|几点了|(?:北京)?时间是?(?:多少|几点)|报时"
+    )
+
+    def answer(self, query: str, now: datetime) -> Optional[str]:
+        if not self.PATTERN.search(query):
+            return None
+        return f"现在是{format_date(now.date())} {now:%H:%M}"
+
+
+class LocalAnswers:
+    """本地回答器注册表"""
+
+    def __init__(self, providers: Optional[List[LocalAnswerProvider]] = None):
+        if providers is None:
+            # 具体的问题在前（"国庆还有几天"不应该被当成问日期）
+            providers = [CountdownProvider(), LunarProvider(), WeekdayProvider(), DateProvider(), TimeProvider()]
+        self.providers: List[LocalAnswerProvider] = list(providers)
+
+    def register(self, provider: LocalAnswerProvider, first: bool = False) -> None:
+        """注册回答器（first=True 时优先于已有的回答器）"""
+        if first:
+            self.providers.insert(0, provider)
+        else:
+            self.providers.append(provider)
+
+    def answer(self, query: str, now: Optional[datetime] = None) -> Optional[Tuple[str, str]]:
+        """尝试本地回答
+
+        Returns:
+            (回答器名称, 答案)，都不能回答时返回None
+        """
+        now = now or datetime.now()
+        for provider in self.providers:
+            result = provider.answer(query, now)
+            if result:
+                return provider.name, result
+        return None
+
+
+# 全局实例
+_local_answers: Optional[LocalAnswers] = None
+
+
+def get_local_answers() -> LocalAnswers:
+    """获取本地回答器注册表"""
+    global _local_answers
+    if _local_answers is None:
+        _local_answers = LocalAnswers()
+    return _local_answers
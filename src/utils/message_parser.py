@@ -0,0 +1,153 @@
+"""消息解析（每个事件只解析一次）
+
+把带CQ码的原始消息一次性拆成文本、@对象、CQ段，JSON卡片、小写文本、分词结果
+在第一次使用时才计算。同一事件依次经过多个匹配器，都通过 get_parsed_message 共用解析结果。
+"""
+import re
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from src.utils.logger import get_logger
+
+logger = get_logger("message_parser")
+
+CQ_PATTERN = re.compile(r"\[CQ:([\w.-]+)((?:,[^\]]*)?)\]")
+# CQ码参数值中的转义
+CQ_UNESCAPE = (("&#44;", ","), ("&#91;", "["), ("&#93;", "]"), ("&amp;", "&"))
+
+
+def unescape_cq(value: str) -> str:
+    """还原CQ码参数值中的转义字符"""
+    for escaped, char in CQ_UNESCAPE:
+        value = value.replace(escaped, char)
+    return value
+
+
+@dataclass
+class CQSegment:
+    """CQ码消息段"""
+    type: str
+    data: Dict[str, str]
+    raw: str
+
+
+@lru_cache(maxsize=8)
+def compile_keywords(keywords: Tuple[str, ...]) -> Optional[Pattern]:
+    """把关键词列表编译成一个正则（小写，长的优先），列表相同时复用"""
+    words = sorted({keyword.lower() for keyword in keywords if keyword}, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile("|".join(re.escape(word) for word in words))
+
+
+class ParsedMessage:
+    """解析后的消息"""
+
+    def __init__(self, raw_message: str):
+        self.raw = raw_message.strip()
+        self.segments: List[CQSegment] = []
+        self.at_targets: List[str] = []
+
+        # 一次扫描同时得到：去掉@的文本、去掉所有CQ码的纯文本
+        text_parts: List[str] = []
+        plain_parts: List[str] = []
+        last = 0
+        for match in CQ_PATTERN.finditer(self.raw):
+            between = self.raw[last:match.start()]
+            text_parts.append(between)
+            plain_parts.append(between)
+            last = match.end()
+
+            data = {}
+            for item in match.group(2).split(",")[1:]:
+                key, _, value = item.partition("=")
+                data[key] = unescape_cq(value)
+            segment = CQSegment(match.group(1), data, match.group(0))
+            self.segments.append(segment)
+
+            if segment.type == "at" and data.get("qq", "").isdigit():
+                self.at_targets.append(data["qq"])
+            else:
+                text_parts.append(segment.raw)
+        text_parts.append(self.raw[last:])
+        plain_parts.append(self.raw[last:])
+
+        # 去掉@后的文本（其他CQ码保留）
+        self.text = "".join(text_parts).strip()
+        # 去掉所有CQ码的纯文本
+        self.plain_text = "".join(plain_parts).strip()
+
+    def mentions(self, qq: str) -> bool:
+        """是否@了某人"""
+        return str(qq) in self.at_targets
+
+    def contains_keyword(self, keywords: Iterable[str]) -> bool:
+        """是否包含关键词（不区分大小写）"""
+        return self.matches(compile_keywords(tuple(keywords)))
+
+    def matches(self, pattern: Optional[Pattern]) -> bool:
+        """小写文本是否匹配预编译的关键词正则（见 compile_keywords）"""
+        return pattern is not None and pattern.search(self.lower) is not None
+
+    @cached_property
+    def lower(self) -> str:
+        """小写的文本（去掉@）"""
+        return self.text.lower()
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        """纯文本的 jieba 分词结果"""
+        # 延迟导入，第一次使用时才加载词典
+        import jieba
+        return jieba.lcut(self.plain_text)
+
+    @cached_property
+    def json_card(self) -> Optional[Dict[str, Any]]:
+        """QQ JSON卡片的内容（没有或解析失败时为None）"""
+        for segment in self.segments:
+            if segment.type == "json":
+                try:
+                    return json.loads(segment.data.get("data", ""))
+                except ValueError as e:
+                    logger.debug(f"JSON卡片解析失败: {e}")
+                    return None
+        return None
+
+    @cached_property
+    def card_url(self) -> Optional[str]:
+        """QQ JSON卡片中的跳转链接（qqdocurl）"""
+        card = self.json_card
+        if not isinstance(card, dict):
+            return None
+        detail = (card.get("meta") or {}).get("detail_1") or {}
+        return detail.get("qqdocurl") or None
+
+
+# 最近事件的解析结果 {id(事件): (事件, 解析结果)}
+_parsed_messages: "OrderedDict[int, Tuple[Any, ParsedMessage]]" = OrderedDict()
+_PARSED_CACHE_SIZE = 64
+
+
+def get_parsed_message(event: Any) -> ParsedMessage:
+    """获取事件的解析结果（同一事件只解析一次）
+
+    Args:
+        event: 消息事件（使用 raw_message）
+
+    Returns:
+        ParsedMessage实例
+    """
+    key = id(event)
+    item = _parsed_messages.get(key)
+    if item is not None and item[0] is event:
+        _parsed_messages.move_to_end(key)
+        return item[1]
+
+    parsed = ParsedMessage(event.raw_message)
+    _parsed_messages[key] = (event, parsed)
+    if len(_parsed_messages) > _PARSED_CACHE_SIZE:
+        _parsed_messages.popitem(last=False)
+    return parsed
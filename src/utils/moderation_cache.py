@@ -0,0 +1,130 @@
+"""AI内容审核结果缓存（内存LRU + SQLite持久化）"""
+import re
+import time
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from src.memory.database import get_database
+from src.utils.aho_corasick import normalize_text
+from src.utils.cache import LRUCache
+from src.utils.logger import get_logger
+
+logger = get_logger("moderation_cache")
+
+# QQ表情、图片等CQ码
+CQ_CODE_PATTERN = re.compile(r"\[CQ:[^\]]*\]")
+
+
+def moderation_key(text: str) -> str:
+    """审核缓存键：去掉CQ码后规范化（去空白、符号、表情，转小写）"""
+    return normalize_text(CQ_CODE_PATTERN.sub("", text))
+
+
+class ModerationCache:
+    """审核结论缓存
+
+    按规范化文本缓存 (是否不当, 类型)，条目写入 ttl 秒后失效；
+    结论同时写入SQLite（连同规范化文本，作为本地分类模型的训练数据），
+    重启后加载最近的条目。
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 86400, persist: bool = True):
+        self.ttl = ttl
+        self.persist = persist
+        # {键: (是否不当, 类型, 写入时间戳)}
+        self._memory: LRUCache[Tuple[bool, str, float]] = LRUCache(maxsize)
+        self.db = get_database() if persist else None
+
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'skipped': 0,
+        }
+
+        if self.db is not None:
+            self._init_table()
+            self._load()
+
+    def _init_table(self) -> None:
+        """创建缓存表"""
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS moderation_cache (
+                    text_hash TEXT PRIMARY KEY,
+                    text TEXT,
+                    flagged INTEGER,
+                    content_type TEXT,
+                    created_at REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(moderation_cache)")}
+            if "text" not in columns:
+                conn.execute("ALTER TABLE moderation_cache ADD COLUMN text TEXT")
+
+    def _load(self) -> None:
+        """加载未过期的结论（过期的结论保留在表中作为训练数据）"""
+        cutoff = time.time() - self.ttl
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT text_hash, flagged, content_type, created_at
+                FROM moderation_cache
+                WHERE created_at >= ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (cutoff, self._memory.maxsize)).fetchall()
+
+        # 从旧到新放入，最新的条目最后被淘汰
+        for row in reversed(rows):
+            self._memory.put(row["text_hash"], (bool(row["flagged"]), row["content_type"] or "", row["created_at"]))
+        if rows:
+            logger.info(f"已加载 {len(rows)} 条审核缓存")
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def record_skip(self) -> None:
+        """记录按规则跳过的审核"""
+        self._stats['skipped'] += 1
+
+    def get(self, key: str) -> Optional[Tuple[bool, str]]:
+        """读取缓存的结论
+
+        Returns:
+            (是否不当, 类型)，未命中返回None
+        """
+        item = self._memory.get(self._hash(key))
+        if item is not None and time.time() - item[2] <= self.ttl:
+            self._stats['hits'] += 1
+            return item[0], item[1]
+        self._stats['misses'] += 1
+        return None
+
+    async def put(self, key: str, flagged: bool, content_type: str) -> None:
+        """写入结论（持久化在数据库线程执行）"""
+        text_hash = self._hash(key)
+        now = time.time()
+        self._memory.put(text_hash, (flagged, content_type, now))
+
+        if self.db is not None:
+            try:
+                await self.db.run_async(self._save, text_hash, key, flagged, content_type, now)
+            except Exception as e:
+                logger.error(f"保存审核缓存失败: {e}")
+
+    def _save(self, text_hash: str, text: str, flagged: bool, content_type: str, created_at: float) -> None:
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO moderation_cache (text_hash, text, flagged, content_type, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (text_hash, text, 1 if flagged else 0, content_type, created_at))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计（saved_calls 为省下的AI审核调用次数）"""
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            **self._stats,
+            'size': len(self._memory),
+            'saved_calls': self._stats['hits'] + self._stats['skipped'],
+            'hit_ratio': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,122 @@
+"""本地内容审核模型（字符 n-gram 朴素贝叶斯）
+
+纯Python实现，只依赖标准库。用记录下来的AI审核结论训练，
+预测一条消息只需要几十次字典查找（微秒级），
+把明确正常、明确不当的消息挡在远程AI审核之前。
+"""
+import json
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from src.utils.moderation_cache import moderation_key
+
+MODEL_VERSION = 1
+
+
+def char_ngrams(text: str, max_n: int = 3) -> List[str]:
+    """提取规范化文本的字符 1~max_n 元组"""
+    text = moderation_key(text)
+    grams = []
+    for n in range(1, max_n + 1):
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+class NgramNaiveBayes:
+    """多项式朴素贝叶斯分类器（二分类：不当 / 正常）"""
+
+    def __init__(self, max_n: int = 3, alpha: float = 1.0):
+        self.max_n = max_n
+        self.alpha = alpha
+        # {n-gram: [不当样本中的次数, 正常样本中的次数]}
+        self.counts: Dict[str, List[int]] = {}
+        self.doc_counts = [0, 0]
+        self.gram_totals = [0, 0]
+        self._log_odds: Dict[str, float] = {}
+        self._unseen_log_odds = 0.0
+        self._prior_log_odds = 0.0
+
+    def train(self, samples: Iterable[Tuple[str, bool]]) -> "NgramNaiveBayes":
+        """训练模型
+
+        Args:
+            samples: (文本, 是否不当) 序列
+        """
+        for text, flagged in samples:
+            label = 0 if flagged else 1
+            self.doc_counts[label] += 1
+            for gram, count in Counter(char_ngrams(text, self.max_n)).items():
+                self.counts.setdefault(gram, [0, 0])[label] += count
+                self.gram_totals[label] += count
+        self._prepare()
+        return self
+
+    def _prepare(self) -> None:
+        """预先计算每个 n-gram 的对数几率（预测时只需要累加）"""
+        vocabulary = len(self.counts)
+        bad_denominator = self.gram_totals[0] + self.alpha * vocabulary
+        clean_denominator = self.gram_totals[1] + self.alpha * vocabulary
+        if not bad_denominator or not clean_denominator:
+            self._log_odds = {}
+            return
+
+        self._log_odds = {
+            gram: math.log((bad + self.alpha) / bad_denominator) - math.log((clean + self.alpha) / clean_denominator)
+            for gram, (bad, clean) in self.counts.items()
+        }
+        self._unseen_log_odds = math.log(clean_denominator / bad_denominator)
+        total_docs = sum(self.doc_counts)
+        self._prior_log_odds = math.log((self.doc_counts[0] + 1) / (self.doc_counts[1] + 1)) if total_docs else 0.0
+
+    @property
+    def is_trained(self) -> bool:
+        """两类样本都有才能使用"""
+        return bool(self._log_odds) and all(self.doc_counts)
+
+    def predict_proba(self, text: str) -> float:
+        """预测消息不当的概率（0-1）"""
+        log_odds = self._prior_log_odds
+        table = self._log_odds
+        unseen = self._unseen_log_odds
+        for gram in char_ngrams(text, self.max_n):
+            log_odds += table.get(gram, unseen)
+        # 防止 exp 溢出
+        if log_odds >= 0:
+            return 1.0 / (1.0 + math.exp(-min(log_odds, 700)))
+        exp = math.exp(max(log_odds, -700))
+        return exp / (1.0 + exp)
+
+    def save(self, path: str) -> None:
+        """保存模型（JSON）"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": MODEL_VERSION,
+            "max_n": self.max_n,
+            "alpha": self.alpha,
+            "doc_counts": self.doc_counts,
+            "gram_totals": self.gram_totals,
+            "counts": self.counts,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "NgramNaiveBayes":
+        """加载模型
+
+        Raises:
+            ValueError: 模型版本不兼容
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"模型版本不兼容: {data.get('version')}")
+
+        model = cls(max_n=data["max_n"], alpha=data["alpha"])
+        model.doc_counts = data["doc_counts"]
+        model.gram_totals = data["gram_totals"]
+        model.counts = data["counts"]
+        model._prepare()
+        return model
@@ -0,0 +1,98 @@
+"""联网搜索判断的本地规则打分器
+
+用词表和 jieba 词性标注给消息打分：时效词、疑问句式、专有名词（人名/地名/机构）加分，
+闲聊、知识概念、创作请求减分。分数足够高直接搜索，足够低直接不搜，
+中间拿不准的才交给AI判断。
+"""
+from dataclasses import dataclass, field
+from typing import List
+
+# 时效性强的词（出现即大概率需要实时信息）
+TEMPORAL_WORDS = {
+    "最近", "目前", "当前", "实时", "刚刚", "刚才", "昨天", "明天", "后天", "今年", "本周", "这周",
+    "更新", "版本", "发布", "上映", "上线", "开售", "比分", "赛程", "排名", "战绩", "比赛",
+    "价格", "多少钱", "股价", "行情", "开奖", "票房", "疫情", "地震", "台风",
+}
+# 疑问词
+QUESTION_WORDS = {"什么", "多少", "几", "哪", "哪里", "哪个", "谁", "怎么样", "如何", "是否", "啥", "有没有", "什么时候"}
+QUESTION_ENDINGS = ("?", "？", "吗", "呢", "么")
+# 专有名词词性：人名、地名、机构名、其他专名、英文
+ENTITY_FLAGS = {"nr", "ns", "nt", "nz", "eng"}
+# 时间词词性
+TIME_FLAGS = {"t"}
+# 闲聊
+CHITCHAT_WORDS = {
+    "早安", "晚安", "午安", "你好", "哈哈", "哈哈哈", "嘿嘿", "谢谢", "好的", "嗯嗯", "在吗",
+    "抱抱", "摸摸", "亲亲", "贴贴", "想你", "喜欢", "可爱", "无聊", "好累", "睡觉",
+    "你觉得", "你认为", "你会", "你是",
+}
+# 知识概念、创作类请求（不需要实时信息）
+STATIC_PATTERNS = ("是什么意思", "什么意思", "原理", "概念", "定义", "为什么会", "历史上",
+                   "写一", "写个", "写首", "帮我写", "翻译", "作文", "讲个故事", "编一个")
+
+
+@dataclass
+class ScoreResult:
+    """打分结果"""
+    score: int
+    reasons: List[str] = field(default_factory=list)
+
+
+class SearchScorer:
+    """联网搜索需求打分器"""
+
+    def __init__(self, search_threshold: int = 3, skip_threshold: int = 0):
+        self.search_threshold = search_threshold
+        self.skip_threshold = skip_threshold
+
+    def score(self, message: str) -> ScoreResult:
+        """给消息打分（分数越高越需要联网搜索）"""
+        # 延迟导入，第一次使用时才加载词典
+        import jieba.posseg
+
+        result = ScoreResult(0)
+        text = message.strip()
+        if len(text) <= 3:
+            result.score -= 2
+            result.reasons.append("short")
+
+        words = [(pair.word, pair.flag) for pair in jieba.posseg.cut(text)]
+
+        if any(word in text for word in TEMPORAL_WORDS):
+            result.score += 3
+            result.reasons.append("temporal")
+        elif any(flag in TIME_FLAGS for _, flag in words):
+            result.score += 2
+            result.reasons.append("time")
+
+        if text.endswith(QUESTION_ENDINGS) or any(word in text for word in QUESTION_WORDS):
+            result.score += 1
+            result.reasons.append("question")
+
+        entities = sum(1 for word, flag in words if flag in ENTITY_FLAGS and len(word) > 1)
+        if entities:
+            result.score += min(entities, 2)
+            result.reasons.append("entity")
+
+        if any(word in text for word in CHITCHAT_WORDS):
+            result.score -= 3
+            result.reasons.append("chitchat")
+
+        if any(pattern in text for pattern in STATIC_PATTERNS):
+            result.score -= 2
+            result.reasons.append("static")
+
+        return result
+
+    def decide(self, message: str):
+        """根据分数判断
+
+        Returns:
+            True 需要搜索 / False 不需要 / None 拿不准（交给AI判断）
+        """
+        score = self.score(message).score
+        if score >= self.search_threshold:
+            return True
+        if score <= self.skip_threshold:
+            return False
+        return None
@@ -1,12 +1,38 @@
 """通义 Web-Search 联网搜索工具"""
 import json
+import asyncio
 import requests
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from src.utils.aho_corasick import normalize_text
+from src.utils.cache import LRUCache
 from src.utils.logger import get_logger
 from src.utils.config import get_config
+from src.utils.local_answers import LocalAnswers, get_local_answers
+from src.utils.search_scorer import SearchScorer
 
 logger = get_logger("web_search")
 
+# 查询类别关键词（按顺序匹配）
+QUERY_CLASSES = (
+    ("weather", ("天气", "气温", "温度", "下雨", "晴天", "阴天")),
+    ("finance", ("股票", "股价", "金价", "油价", "汇率", "美元", "人民币")),
+    ("news", ("新闻", "热搜", "最新")),
+)
+# 各类搜索结果的默认缓存时间（秒）
+DEFAULT_RESULT_TTL = {
+    "weather": 600,
+    "news": 300,
+    "finance": 60,
+    "default": 300,
+}
+
+def classify_query(query: str) -> str:
+    """判断查询类别（weather / finance / news / default）"""
+    for query_class, keywords in QUERY_CLASSES:
+        if any(keyword in query for keyword in keywords):
+            return query_class
+    return "default"
+
 class WebSearchClient:
     """通义 Web-Search 客户端（使用通义千问的联网搜索功能）"""
     
@@ -21,6 +47,95 @@ class WebSearchClient:
         else:
             self.enabled = True
             logger.info("Web-Search 客户端初始化完成")
+        
+        # 搜索判断结果缓存（按规范化后的消息）
+        self._decisions: LRUCache[bool] = LRUCache(
+            self.config.get("web_search.decision_cache.max_size", 1024),
+            ttl=self.config.get("web_search.decision_cache.ttl", 600)
+        )
+        # 本地规则打分器（拿不准时才调用AI判断）
+        self.scorer: Optional[SearchScorer] = None
+        if self.config.get("web_search.rule_scorer.enabled", True):
+            self.scorer = SearchScorer(
+                search_threshold=self.config.get("web_search.rule_scorer.search_threshold", 3),
+                skip_threshold=self.config.get("web_search.rule_scorer.skip_threshold", 0)
+            )
+        # 本地回答（时间、日期、农历、倒计时等不需要联网的问题）
+        self.local_answers: Optional[LocalAnswers] = None
+        if self.config.get("web_search.local_answers.enabled", True):
+            self.local_answers = get_local_answers()
+        # 各层的判断次数 {层: {search: 次数, skip: 次数}}
+        self._decision_stats: Dict[str, Dict[str, int]] = {}
+        
+        # 搜索结果缓存，每个类别一个（缓存时间不同）
+        result_ttl = {**DEFAULT_RESULT_TTL, **(self.config.get("web_search.result_cache.ttl", {}) or {})}
+        result_cache_size = self.config.get("web_search.result_cache.max_size", 256)
+        self._results: Dict[str, LRUCache[str]] = {
+            query_class: LRUCache(result_cache_size, ttl=ttl)
+            for query_class, ttl in result_ttl.items()
+        }
+        # 进行中的搜索 {(类别, 规范化查询): Task}，相同的并发搜索共用一次请求
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._search_stats = {
+            'local': 0,
+            'hits': 0,
+            'coalesced': 0,
+            'requests': 0,
+        }
+    
+    async def search_async(self, query: str) -> Optional[str]:
+        """联网搜索（带缓存）
+        
+        本地能回答的问题（时间、日期、农历、倒计时）直接回答；
+        其他结果按类别缓存，相同的并发搜索共用同一个请求。
+        """
+        local = self.local_answer(query)
+        if local is not None:
+            return local
+        
+        if not self.enabled:
+            return None
+        
+        query_class = classify_query(query)
+        key = (query_class, normalize_text(query))
+        cache = self._results.get(query_class, self._results["default"])
+        cached = cache.get(key)
+        if cached is not None:
+            self._search_stats['hits'] += 1
+            logger.debug(f"搜索缓存命中 [{query_class}]: {query[:30]}...")
+            return cached
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self._search_stats['coalesced'] += 1
+        else:
+            self._search_stats['requests'] += 1
+            task = asyncio.create_task(self._fetch(key, query, cache))
+            self._inflight[key] = task
+        # 调用方被取消时不影响其他等待同一请求的调用方
+        return await asyncio.shield(task)
+    
+    async def _fetch(self, key: Tuple[str, str], query: str, cache: LRUCache[str]) -> Optional[str]:
+        """执行搜索请求并写入缓存（失败结果不缓存）"""
+        try:
+            result = await asyncio.to_thread(self.search, query)
+            if result:
+                cache.put(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+    
+    def local_answer(self, query: str) -> Optional[str]:
+        """尝试用本地回答器回答（不联网）"""
+        if self.local_answers is None:
+            return None
+        result = self.local_answers.answer(query)
+        if result is None:
+            return None
+        provider, answer = result
+        self._search_stats['local'] += 1
+        logger.debug(f"本地回答 [{provider}]: {query[:30]}...")
+        return answer
     
     def search(self, query: str) -> Optional[str]:
         """执行联网搜索（使用通义千问的 enable_search 参数）"""
@@ -36,9 +151,7 @@ class WebSearchClient:
             
             # 优化查询语句，让搜索更精准
             optimized_query = query
-            if "时间" in query or "几点" in query:
-                optimized_query = f"现在的准确时间是几点？{query}"
-            elif "天气" in query:
+            if "天气" in query:
                 optimized_query = f"今天实时天气情况：{query}"
             
             # 使用通义千问的联网搜索功能
@@ -48,7 +161,7 @@ class WebSearchClient:
                     "messages": [
                         {
                             "role": "system",
-                            "content": "你是一个实时信息查询助手。当用户询问时间时，请直接告诉用户当前的准确时间（小时和分钟）。当用户询问天气时，请告诉具体的天气状况和温度。请用简短、直接的方式回答，不要解释概念。"
+                            "content": "你是一个实时信息查询助手。当用户询问天气时，请告诉具体的天气状况和温度。请用简短、直接的方式回答，不要解释概念。"
                         },
                         {
                             "role": "user",
@@ -103,10 +216,40 @@ class WebSearchClient:
             return None
     
     def should_search(self, message: str) -> bool:
-        """判断是否需要联网搜索"""
+        """判断是否需要联网搜索
+        
+        依次经过：本地回答 → 结果缓存 → 关键词 → 本地规则打分 → AI判断，
+        前面的层能给出结论时不再往后走。本地能回答的问题不需要联网，
+        未配置搜索服务时也会"搜索"。
+        """
+        if self.local_answers is not None and self.local_answers.answer(message) is not None:
+            self._record_decision("local", True)
+            return True
+        
         if not self.enabled:
             return False
         
+        key = normalize_text(message)
+        cached = self._decisions.get(key)
+        if cached is not None:
+            self._record_decision("cache", cached)
+            return cached
+        
+        decision, tier = self._decide(message)
+        self._record_decision(tier, bool(decision))
+        if decision is None:
+            # AI判断失败时不搜索，也不缓存，下次重新判断
+            return False
+        
+        self._decisions.put(key, decision)
+        return decision
+    
+    def _decide(self, message: str) -> Tuple[Optional[bool], str]:
+        """逐层判断是否需要搜索
+        
+        Returns:
+            (判断结果，AI判断失败为None, 做出判断的层)
+        """
         # 1. 先检查明确的关键词（快速判断）
         search_keywords = [
             "天气", "气温", "温度", "下雨", "晴天", "阴天",
@@ -119,13 +262,38 @@ class WebSearchClient:
         
         if any(keyword in message for keyword in search_keywords):
             logger.debug(f"关键词匹配，触发搜索: {message[:30]}...")
-            return True
+            return True, "keyword"
         
-        # 2. 使用AI智能判断是否需要实时信息
-        return self._ai_should_search(message)
+        # 2. 本地规则打分，明确的情况直接判断
+        if self.scorer is not None:
+            decision = self.scorer.decide(message)
+            if decision is not None:
+                logger.debug(f"规则判断{'需要' if decision else '不需要'}搜索: {message[:30]}...")
+                return decision, "rule"
+        
+        # 3. 拿不准时使用AI智能判断是否需要实时信息
+        return self._ai_should_search(message), "ai"
+    
+    def _record_decision(self, tier: str, decision: bool) -> None:
+        """记录各层的判断次数"""
+        stats = self._decision_stats.setdefault(tier, {"search": 0, "skip": 0})
+        stats["search" if decision else "skip"] += 1
     
-    def _ai_should_search(self, message: str) -> bool:
-        """使用AI判断是否需要联网搜索"""
+    def get_stats(self) -> Dict[str, Any]:
+        """获取搜索判断统计"""
+        return {
+            'decisions': {tier: dict(counts) for tier, counts in self._decision_stats.items()},
+            'decision_cache': self._decisions.get_stats(),
+            'search': dict(self._search_stats),
+            'result_cache': {query_class: cache.get_stats() for query_class, cache in self._results.items()}
+        }
+    
+    def _ai_should_search(self, message: str) -> Optional[bool]:
+        """使用AI判断是否需要联网搜索
+        
+        Returns:
+            是否需要搜索，请求失败返回None
+        """
         try:
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -190,12 +358,12 @@ class WebSearchClient:
                         return False
             
             # 判断失败时，保守策略：不搜索
-            return False
+            return None
             
         except Exception as e:
             logger.debug(f"AI判断搜索失败: {e}")
             # 失败时不搜索，避免过度调用
-            return False
+            return None
 
 
 # 全局实例
@@ -0,0 +1,28 @@
+"""测试共用的 fixture"""
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.memory import write_behind
+from src.memory.database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    """临时数据库"""
+    database = Database(str(tmp_path / "bot.db"))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def writer(database, monkeypatch):
+    """使用临时数据库、不启动后台线程的写入队列（手动flush）"""
+    monkeypatch.setattr(write_behind, "get_database", lambda: database)
+    monkeypatch.setattr(write_behind.WriteBehindQueue, "_run", lambda self: None)
+    writer = write_behind.WriteBehindQueue()
+    yield writer
+    writer.stop()
@@ -0,0 +1,75 @@
+"""AC自动机测试"""
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.aho_corasick import AhoCorasick, normalize_text
+from src.utils.content_filter import ContentFilter
+
+
+class TestAhoCorasick:
+    """AC自动机测试类"""
+
+    def test_finds_overlapping_words(self):
+        """测试重叠、嵌套的模式词都能命中"""
+        automaton = AhoCorasick()
+        for word in ["he", "she", "his", "hers"]:
+            automaton.add(word, word)
+
+        hits = [(start, end, value) for start, end, value in automaton.iter("ushers")]
+
+        assert hits == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+    def test_rebuild_after_add(self):
+        """测试构建后继续添加词，结果不重复"""
+        automaton = AhoCorasick()
+        automaton.add("ab", "ab")
+        automaton.build()
+        automaton.add("b", "b")
+
+        assert automaton.find_all("xabab") == ["ab", "b"]
+
+    def test_normalize_strips_symbols(self):
+        """测试规范化去掉空白和符号并转小写"""
+        assert normalize_text("政 -治…") == "政治"
+        assert normalize_text("Hello, World_1") == "helloworld_1"
+
+
+class TestSensitiveWords:
+    """敏感词检测测试类"""
+
+    @pytest.fixture
+    def filter(self, monkeypatch):
+        """创建只含测试敏感词的过滤器"""
+        content_filter = ContentFilter()
+        get = content_filter.config.get
+        monkeypatch.setattr(
+            content_filter.config, "get",
+            lambda key, default=None: ["暴力", "赌博", "DAN"] if key == "content_filter.sensitive_words" else get(key, default)
+        )
+        content_filter._load_sensitive_words()
+        return content_filter
+
+    def test_tolerates_inserted_symbols(self, filter):
+        """测试词中间插入空格、符号仍能检测"""
+        for message in ["这是暴力", "暴 力", "暴*力！", "来赌。博吗", "d a n"]:
+            has_sensitive, words = filter.contains_sensitive_word(message)
+            assert has_sensitive is True, f"应该检测到敏感词: {message}"
+
+    def test_reports_all_matched_words(self, filter):
+        """测试返回所有命中的敏感词"""
+        has_sensitive, words = filter.contains_sensitive_word("赌博和暴力都不行，暴力！")
+
+        assert has_sensitive is True
+        assert sorted(words) == sorted(["赌博", "暴力"])
+
+    def test_normal_message(self, filter):
+        """测试正常消息不命中"""
+        assert filter.contains_sensitive_word("暴雨天不出门，力气都没了") == (False, [])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,132 @@
+"""B站链接识别与接口客户端测试（模拟HTTP请求）"""
+import asyncio
+import httpx
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.bilibili_api import BilibiliAPI
+from src.utils.bilibili_links import scan_bilibili_links
+
+
+class TestBiliLinks:
+    """B站链接识别测试类"""
+
+    def test_scan_all_kinds(self):
+        """测试一次扫描提取所有类型的链接"""
+        links = scan_bilibili_links(
+            "BV1xx411c7mD 和 av170001，还有 https://b23.tv/abc123 "
+            "https://www.bilibili.com/bangumi/play/ep374717 ss33378 md28229233 BV1xx411c7mD"
+        )
+
+        assert links.bv == ["BV1xx411c7mD"]
+        assert links.av == ["170001"]
+        assert links.b23 == [("b23.tv", "abc123")]
+        assert (links.ep, links.ss, links.md) == (["374717"], ["33378"], ["28229233"])
+        assert links.has_bangumi
+
+    def test_escaped_short_link_in_card(self):
+        """测试QQ卡片中转义的短链接"""
+        links = scan_bilibili_links('[CQ:json,data={"qqdocurl":"https:\\/\\/b23.tv\\/xYz789?share"}]')
+
+        assert links.b23 == [("b23.tv", "xYz789")]
+
+    def test_english_words_are_not_links(self):
+        """测试英文单词中的 ss/ep/av/md 不被误认"""
+        assert not scan_bilibili_links("I need to pass123 the class, step2 and have99 fun")
+        assert not scan_bilibili_links("今天天气不错")
+
+
+class TestBilibiliAPI:
+    """B站接口客户端测试类"""
+
+    @pytest.fixture
+    def api(self):
+        """创建使用模拟传输的客户端，记录每次请求"""
+        api = BilibiliAPI()
+        api.requests = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            api.requests.append(request.url)
+            await asyncio.sleep(0.01)
+            if request.url.host == "b23.tv":
+                return httpx.Response(302, headers={"location": "https://www.bilibili.com/video/BV1xx411c7mD"})
+            if request.url.path == "/x/web-interface/view":
+                bvid = request.url.params["bvid"]
+                if bvid == "BV1missing00":
+                    return httpx.Response(200, json={"code": -404, "message": "啥都木有"})
+                return httpx.Response(200, json={"code": 0, "data": {"bvid": bvid, "title": "测试视频"}})
+            if request.url.path == "/pgc/review/user":
+                return httpx.Response(200, json={"code": 0, "result": {"media": {"season_id": 33378}}})
+            if request.url.path == "/pgc/view/web/season":
+                return httpx.Response(200, json={"code": 0, "result": {"title": "测试番剧", **request.url.params}})
+            return httpx.Response(404)
+
+        api._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return api
+
+    @pytest.mark.asyncio
+    async def test_video_cached(self, api):
+        """测试同一视频只请求一次"""
+        first = await api.get_video("BV1xx411c7mD")
+        second = await api.get_video("BV1xx411c7mD")
+
+        assert first == second == {"bvid": "BV1xx411c7mD", "title": "测试视频"}
+        assert len(api.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_api_error_not_cached(self, api):
+        """测试接口报错时返回None且不缓存"""
+        assert await api.get_video("BV1missing00") is None
+        assert await api.get_video("BV1missing00") is None
+        assert len(api.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_short_link_cached_without_following(self, api):
+        """测试短链接只读取跳转地址，结果永久缓存"""
+        first = await api.resolve_short_link("b23.tv", "abc123")
+        second = await api.resolve_short_link("b23.tv", "abc123")
+
+        assert first == second == "https://www.bilibili.com/video/BV1xx411c7mD"
+        assert [url.host for url in api.requests] == ["b23.tv"]
+        assert api._links.ttl is None
+
+    @pytest.mark.asyncio
+    async def test_md_resolves_season_directly(self, api):
+        """测试MD号只需两次请求（MD→SS→番剧信息），之后全部命中缓存"""
+        ssid = await api.md_to_ss("28229233")
+        info = await api.get_bangumi(ssid=ssid)
+        await api.get_bangumi(ssid=await api.md_to_ss("28229233"))
+
+        assert ssid == "33378"
+        assert info["season_id"] == "33378"
+        assert [url.path for url in api.requests] == ["/pgc/review/user", "/pgc/view/web/season"]
+
+    @pytest.mark.asyncio
+    async def test_per_host_limit(self, api):
+        """测试同一域名的并发请求数受限"""
+        api.per_host_limit = 2
+        active = peak = 0
+        send = api._http_client.get
+
+        async def tracked_get(url, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            try:
+                return await send(url, **kwargs)
+            finally:
+                active -= 1
+
+        api._http_client.get = tracked_get
+        await asyncio.gather(*(api.get_video(f"BV1xx411c7m{i}") for i in range(6)))
+
+        assert peak == 2
+        assert len(api.requests) == 6
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,51 @@
+"""内存缓存测试"""
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils import cache
+from src.utils.cache import LRUCache
+
+
+class TestLRUCache:
+    """LRU缓存测试类"""
+
+    def test_evicts_least_recently_used(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        lru = LRUCache(maxsize=2)
+        lru.put("group:1", "a")
+        lru.put("group:2", "b")
+        lru.get("group:1")
+        lru.put("group:3", "c")
+
+        assert "group:2" not in lru
+        assert lru.keys() == ["group:1", "group:3"]
+        assert lru.get_stats()['evictions'] == 1
+
+    def test_ttl_expires_entries(self, monkeypatch):
+        """测试条目过期后视为未命中"""
+        now = [1000.0]
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+        lru = LRUCache(maxsize=8, ttl=10)
+        lru.put("key", "value")
+        now[0] += 5
+        assert lru.get("key") == "value"
+        now[0] += 6
+        assert lru.get("key") is None
+
+    def test_get_or_create_isolates_sessions(self):
+        """测试每个会话各自创建独立的对象"""
+        lru = LRUCache(maxsize=8)
+        first = lru.get_or_create("group:1", list)
+        first.append("消息")
+
+        assert lru.get_or_create("group:1", list) is first
+        assert lru.get_or_create("group:2", list) == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
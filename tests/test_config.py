@@ -0,0 +1,113 @@
+"""配置快照测试"""
+import os
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.config import Config
+
+CONFIG_TEXT = """
+bot:
+  qq_number: "10001"
+  admin_qq: "10002"
+  target_groups: [111, "222"]
+personality:
+  name: "沉舟"
+  nickname: "舟舟"
+features:
+  smart_reply: false
+  empty:
+keywords: ["天气", "Help"]
+keyword_fixed_replies:
+  "/help": "帮助信息"
+"""
+
+
+class TestConfig:
+    """配置快照测试类"""
+
+    @pytest.fixture
+    def config_file(self, tmp_path):
+        path = tmp_path / "config.yaml"
+        path.write_text(CONFIG_TEXT, encoding="utf-8")
+        return path
+
+    @pytest.fixture
+    def config(self, config_file):
+        return Config(str(config_file))
+
+    def _rewrite(self, path, text):
+        """写入新内容并确保修改时间变化"""
+        path.write_text(text, encoding="utf-8")
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    def test_get(self, config):
+        """测试扁平键读取与原来的逐层查找一致"""
+        assert config.get("bot.qq_number") == "10001"
+        assert config.get("personality")["nickname"] == "舟舟"
+        assert config.get("features.smart_reply", True) is False
+        assert config.get("features.empty", "默认") == "默认"
+        assert config.get("features.missing", 3) == 3
+        assert config.get("bot.qq_number.deeper", "默认") == "默认"
+
+    def test_snapshot_is_read_only(self, config):
+        """测试快照中的字典和列表都不能被修改"""
+        snapshot = config.snapshot
+        with pytest.raises(TypeError):
+            snapshot.flat["bot.qq_number"] = "20001"
+        with pytest.raises(TypeError):
+            snapshot.data["bot"]["qq_number"] = "20001"
+        with pytest.raises(TypeError):
+            config.get("personality")["name"] = "别人"
+        with pytest.raises(AttributeError):
+            config.get("keywords").append("新词")
+        assert config.get("bot") is snapshot.data["bot"]
+        assert config.get("bot.qq_number") == "10001"
+
+    def test_derived_values(self, config):
+        """测试预先计算的派生值"""
+        snapshot = config.snapshot
+
+        assert config.target_groups == ["111", "222"]
+        assert config.is_target_group(111) and not config.is_target_group(333)
+        assert snapshot.names == ("沉舟", "舟舟")
+        assert snapshot.keyword_pattern.search("need help") is not None
+        assert snapshot.fixed_replies == (("/help", "帮助信息"),)
+
+    def test_reload_swaps_snapshot(self, config, config_file):
+        """测试文件修改后整体替换快照，旧快照不受影响"""
+        old = config.snapshot
+        self._rewrite(config_file, CONFIG_TEXT.replace('"10001"', '"20001"'))
+
+        assert config.reload_if_changed() is True
+        assert config.bot_qq == "20001"
+        assert config.version == old.version + 1
+        assert old.bot_qq == "10001"
+        assert config.reload_if_changed() is False
+
+    def test_invalid_file_keeps_old_snapshot(self, config, config_file):
+        """测试写了一半或格式错误的文件不会替换配置"""
+        version = config.version
+        for text in ("bot: [unclosed", "只是一行文字"):
+            self._rewrite(config_file, text)
+            assert config.reload_if_changed() is False
+            assert config.version == version
+            assert config.bot_qq == "10001"
+
+    def test_maybe_reload_interval(self, config, config_file):
+        """测试按间隔检查，间隔内不读取文件"""
+        config.reload_interval = 3600
+        self._rewrite(config_file, CONFIG_TEXT.replace('"10001"', '"20001"'))
+        assert config.maybe_reload() is False
+
+        config._last_reload_check -= 3600
+        assert config.maybe_reload() is True
+        assert config.bot_qq == "20001"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
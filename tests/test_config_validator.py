@@ -7,6 +7,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from src.utils.config import Config
 from src.utils.config_validator import ConfigValidator, ConfigValidationError
 
 
@@ -89,6 +90,21 @@ class TestConfigValidator:
         assert is_valid is False
         assert any('0.0-1.0' in e for e in errors)
     
+    def test_validate_snapshot(self, tmp_path, monkeypatch):
+        """测试直接验证冻结后的配置快照（字典为只读映射、列表为元组）"""
+        monkeypatch.setenv('DEEPSEEK_API_KEY', 'test_key')
+        path = tmp_path / "config.yaml"
+        path.write_text(
+            'bot:\n  qq_number: "123"\n  admin_qq: "456"\n  target_groups: ["111"]\nai:\n  temperature: 3\n',
+            encoding="utf-8"
+        )
+
+        validator = ConfigValidator()
+        is_valid, errors, _ = validator.validate(Config(str(path)).snapshot.data)
+
+        assert is_valid is False
+        assert errors == ["AI温度参数必须在0.0-1.0之间 (当前值: 3)"]
+
     def test_validate_and_raise(self):
         """测试抛出异常"""
         config = {
@@ -0,0 +1,173 @@
+"""对话上下文环形缓冲区测试"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.memory.context as context_module
+from src.memory.context import ContextManager, estimate_tokens
+
+
+class TestContextManager:
+    """对话上下文测试类"""
+
+    @pytest.fixture
+    def manager(self, database, writer, monkeypatch):
+        monkeypatch.setattr(context_module, "get_database", lambda: database)
+        monkeypatch.setattr(context_module, "get_write_behind", lambda: writer)
+        manager = ContextManager()
+        manager.max_messages = 30
+        manager.max_tokens = 3000
+        monkeypatch.setattr(manager.summarizer, "enabled", False)
+        return manager
+
+    @pytest.fixture
+    def summarized(self, manager, monkeypatch):
+        """摘要生成器返回固定内容，记录每次收到的参数"""
+        calls = []
+
+        async def fake_summarize(previous, messages):
+            calls.append((previous, [m["content"] for m in messages]))
+            return f"摘要{len(calls)}"
+
+        monkeypatch.setattr(manager.summarizer, "summarize", fake_summarize)
+        monkeypatch.setattr(manager.summarizer, "keep_recent", 2)
+        return calls
+
+    def test_estimate_tokens(self):
+        """测试中文按字、英文按字符估算token"""
+        assert estimate_tokens("你好" * 50) == 61
+        assert estimate_tokens("hello " * 50) == 91
+        assert estimate_tokens("") == 1
+
+    def test_format_for_ai(self, manager):
+        """测试入队时转换好AI格式"""
+        manager.add_message("group:111", "user", "在吗", "小明")
+        manager.add_message("group:111", "assistant", "（点点头）在的")
+
+        assert manager.format_for_ai("group:111") == [
+            {"role": "user", "content": "[小明]: 在吗"},
+            {"role": "assistant", "content": "（点点头）在的"},
+        ]
+        assert manager.get_context("group:111")[0]["name"] == "小明"
+        assert manager.format_for_ai("group:222") == []
+
+    def test_window_trimmed_by_token_budget(self, manager):
+        """测试按token预算丢弃最早的消息，条数上限兜底"""
+        manager.max_tokens = 200
+        for i in range(10):
+            manager.add_message("group:111", "user", f"{i}" + "长" * 50)
+
+        session = manager._get_session("group:111")
+        assert session.tokens <= 200
+        assert session.tokens == sum(entry.tokens for entry in session.entries)
+        assert manager.get_context("group:111")[-1]["content"].startswith("9")
+        assert len(session.entries) == 5
+
+        manager.max_tokens = 100000
+        manager.max_messages = 3
+        for i in range(5):
+            manager.add_message("private:10001", "user", f"消息{i}")
+        assert [m["content"] for m in manager.get_context("private:10001")] == ["消息2", "消息3", "消息4"]
+
+    def test_reload_from_database(self, manager, writer):
+        """测试缓存淘汰后从数据库和未落盘的消息中恢复"""
+        manager.add_message("group:111", "user", "一", "小明")
+        writer.flush()
+        manager.add_message("group:111", "assistant", "二")
+        manager._cache.clear()
+
+        assert [m["content"] for m in manager.format_for_ai("group:111")] == ["[小明]: 一", "二"]
+
+        writer.flush()
+        manager._cache.clear()
+        assert [m["content"] for m in manager.format_for_ai("group:111")] == ["[小明]: 一", "二"]
+
+        manager.clear_context("group:111")
+        assert manager.get_context("group:111") == []
+        writer.flush()
+        assert manager.get_context("group:111") == []
+
+    def test_reload_while_flushing(self, manager, writer, monkeypatch):
+        """测试后台提交前重新加载：正在写入的消息不丢失，删除过的会话不会从数据库里复活"""
+        manager.add_message("group:111", "user", "一")
+        writer.flush()
+        write_contexts = writer._write_contexts
+        seen = []
+
+        def reload_then_write(contexts):
+            manager._cache.clear()
+            seen.append([m["content"] for m in manager.get_context("group:111")])
+            write_contexts(contexts)
+
+        monkeypatch.setattr(writer, "_write_contexts", reload_then_write)
+        manager.add_message("group:111", "assistant", "二")
+        writer.flush()
+        manager.clear_context("group:111")
+        manager.add_message("group:111", "user", "三")
+        writer.flush()
+        assert seen == [["一", "二"], ["三"]]
+
+        manager._cache.clear()
+        assert [m["content"] for m in manager.get_context("group:111")] == ["三"]
+
+    def test_expired_context_cleared(self, manager):
+        """测试超时的上下文被清空"""
+        manager.add_message("group:111", "user", "一")
+        session = manager._get_session("group:111")
+        session.last_active = (datetime.now() - timedelta(minutes=manager.timeout_minutes + 1)).isoformat()
+
+        assert manager.get_context("group:111") == []
+
+
+    def test_summary_replaces_oldest_span(self, manager, writer, summarized):
+        """测试较早的消息压缩成摘要放在窗口最前面，摘要可以滚动更新并从数据库恢复"""
+        for i in range(5):
+            manager.add_message("group:111", "user", f"消息{i}", "小明")
+
+        assert asyncio.run(manager.summarize_session("group:111"))
+        messages = manager.format_for_ai("group:111")
+        assert messages[0] == {"role": "system", "content": "【之前的对话摘要】\n摘要1"}
+        assert [m["content"] for m in messages[1:]] == ["[小明]: 消息3", "[小明]: 消息4"]
+        assert summarized[0] == (None, ["消息0", "消息1", "消息2"])
+
+        manager.add_message("group:111", "assistant", "回复")
+        assert asyncio.run(manager.summarize_session("group:111"))
+        assert summarized[1] == ("摘要1", ["消息3"])
+
+        writer.flush()
+        with writer.db.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM context_message").fetchone()[0] == 2
+        manager._cache.clear()
+        assert [m["content"] for m in manager.format_for_ai("group:111")] == [
+            "【之前的对话摘要】\n摘要2", "[小明]: 消息4", "回复"
+        ]
+
+        manager.clear_context("group:111")
+        writer.flush()
+        manager.add_message("group:111", "user", "新话题")
+        manager._cache.clear()
+        assert [m["content"] for m in manager.format_for_ai("group:111")] == ["新话题"]
+
+    def test_summary_scheduled_in_background(self, manager, summarized, monkeypatch):
+        """测试超过阈值时在后台生成摘要，不阻塞添加消息"""
+        monkeypatch.setattr(manager.summarizer, "enabled", True)
+        monkeypatch.setattr(manager.summarizer, "trigger_tokens", 50)
+
+        async def chat():
+            for i in range(6):
+                manager.add_message("group:111", "user", f"第{i}条消息" * 3)
+            assert "group:111" in manager.summarizer._running
+            await asyncio.gather(*manager.summarizer._background_tasks)
+
+        asyncio.run(chat())
+        assert manager.format_for_ai("group:111")[0]["role"] == "system"
+        assert manager.summarizer._running == set()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,92 @@
+"""数据库连接层测试"""
+import sqlite3
+import threading
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.memory.database import Database
+
+
+class TestDatabase:
+    """数据库连接层测试类"""
+
+    @pytest.fixture
+    def database(self, tmp_path):
+        """创建临时数据库"""
+        database = Database(str(tmp_path / "bot.db"))
+        yield database
+        database.close()
+
+    def test_connection_reused_per_thread_in_wal_mode(self, database):
+        """测试同一线程复用连接，不同线程使用各自的连接，且启用WAL"""
+        with database.get_connection() as conn:
+            first = conn
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        with database.get_connection() as conn:
+            assert conn is first
+
+        other = []
+
+        def worker():
+            with database.get_connection() as conn:
+                other.append(conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        assert other[0] is not first
+
+    def test_nested_connection_rolls_back_as_one_transaction(self, database):
+        """测试嵌套使用时由最外层统一提交或回滚"""
+        with pytest.raises(RuntimeError):
+            with database.get_connection() as outer:
+                outer.execute("INSERT INTO chat_log (chat_type, message_content) VALUES ('group', '外层')")
+                with database.get_connection() as inner:
+                    inner.execute("INSERT INTO chat_log (chat_type, message_content) VALUES ('group', '内层')")
+                raise RuntimeError("失败")
+
+        with database.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM chat_log").fetchone()[0] == 0
+
+    @pytest.mark.asyncio
+    async def test_run_async_uses_database_thread(self, database):
+        """测试异步接口在专用数据库线程中执行"""
+        def count():
+            with database.get_connection() as conn:
+                return threading.current_thread().name, conn.execute("SELECT COUNT(*) FROM group_member").fetchone()[0]
+
+        thread_name, total = await database.run_async(count)
+        assert thread_name.startswith("sqlite")
+        assert total == 0
+
+    def test_legacy_tables_migrated_to_sessions(self, tmp_path):
+        """测试旧表结构升级：聊天记录补充会话ID，上下文表改为按会话存储"""
+        db_path = tmp_path / "legacy.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE chat_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, chat_type TEXT, sender_id TEXT, sender_name TEXT,
+                message_type TEXT, message_content TEXT, is_bot INTEGER DEFAULT 0, created_at DATETIME
+            )
+        """)
+        conn.execute("CREATE TABLE conversation_context (chat_type TEXT PRIMARY KEY, messages TEXT)")
+        conn.execute("INSERT INTO chat_log (chat_type, message_content) VALUES ('group', '旧消息')")
+        conn.commit()
+        conn.close()
+
+        database = Database(str(db_path))
+        assert database.assign_legacy_sessions({"group": "group:111"}) == 1
+
+        with database.get_connection() as conn:
+            assert conn.execute("SELECT session_id FROM chat_log").fetchone()[0] == "group:111"
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(conversation_context)")}
+        assert "session_id" in columns
+        database.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,89 @@
+"""向量服务测试"""
+import asyncio
+import json
+import pytest
+import sys
+from pathlib import Path
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.memory import embedding
+from src.memory.database import Database
+
+
+class TestEmbeddingService:
+    """向量服务测试类"""
+
+    @pytest.fixture
+    def service(self, tmp_path, monkeypatch):
+        """创建使用临时数据库和模拟API的向量服务"""
+        database = Database(str(tmp_path / "bot.db"))
+        monkeypatch.setattr(embedding, "get_database", lambda: database)
+
+        service = embedding.EmbeddingService()
+        service.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            texts = json.loads(request.content)["input"]["texts"]
+            service.requests.append(texts)
+            return httpx.Response(200, json={"output": {"embeddings": [
+                {"text_index": i, "embedding": [float(len(text)), 0.5]} for i, text in enumerate(texts)
+            ]}})
+
+        service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return service
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_batched_and_deduplicated(self, service):
+        """测试并发请求合并为一次API调用，相同文本只请求一次"""
+        results = await asyncio.gather(
+            service.embed("早安"),
+            service.embed("你好呀"),
+            service.embed("早安")
+        )
+
+        assert results == [[2.0, 0.5], [3.0, 0.5], [2.0, 0.5]]
+        assert service.requests == [["早安", "你好呀"]]
+        assert service.get_stats()['deduplicated'] == 1
+
+    @pytest.mark.asyncio
+    async def test_inflight_request_shared(self, service):
+        """测试批次已发出、尚未返回时，相同文本等待同一个请求"""
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            texts = json.loads(request.content)["input"]["texts"]
+            service.requests.append(texts)
+            await release.wait()
+            return httpx.Response(200, json={"output": {"embeddings": [
+                {"text_index": i, "embedding": [float(len(text)), 0.5]} for i, text in enumerate(texts)
+            ]}})
+
+        service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        first = asyncio.create_task(service.embed("早安"))
+        while not service.requests:
+            await asyncio.sleep(0.01)
+        second = asyncio.create_task(service.embed("早安"))
+        await asyncio.sleep(service.batch_window * 2)
+        release.set()
+
+        assert await asyncio.gather(first, second) == [[2.0, 0.5], [2.0, 0.5]]
+        assert service.requests == [["早安"]]
+        assert service._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_disk_cache_survives_memory_eviction(self, service):
+        """测试内存缓存清空后从磁盘缓存读取，不再调用API"""
+        await service.embed("早安")
+        service.cache._memory.clear()
+
+        assert await service.embed("早安") == [2.0, 0.5]
+        assert len(service.requests) == 1
+        assert service.get_stats()['disk_hits'] == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
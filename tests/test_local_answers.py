@@ -0,0 +1,98 @@
+"""本地回答测试（不联网）"""
+import pytest
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.local_answers import (
+    LocalAnswerProvider, LocalAnswers, format_lunar_date, lunar_to_solar, solar_to_lunar
+)
+
+# 2026年10月17日 星期六 14:05（农历九月初八）
+NOW = datetime(2026, 10, 17, 14, 5)
+
+
+class TestLocalAnswers:
+    """本地回答测试类"""
+
+    @pytest.fixture
+    def answers(self):
+        return LocalAnswers()
+
+    def test_lunar_conversion(self):
+        """测试公历农历互转（含闰月）"""
+        assert solar_to_lunar(date(2024, 2, 10)) == (2024, 1, 1, False)
+        assert solar_to_lunar(date(2024, 9, 17)) == (2024, 8, 15, False)
+        assert solar_to_lunar(date(2025, 7, 25)) == (2025, 6, 1, True)
+        assert solar_to_lunar(date(2023, 3, 22)) == (2023, 2, 1, True)
+        assert lunar_to_solar(2026, 1, 1) == date(2026, 2, 17)
+        assert lunar_to_solar(2025, 6, 1, is_leap=True) == date(2025, 7, 25)
+        assert format_lunar_date(date(2026, 10, 17)) == "丙午马年九月初八"
+
+        with pytest.raises(ValueError):
+            lunar_to_solar(2024, 6, 1, is_leap=True)
+
+    def test_time_date_weekday(self, answers):
+        """测试时间、日期、星期"""
+        assert answers.answer("现在几点了", NOW) == ("time", "现在是2026年10月17日 星期六 14:05")
+        assert answers.answer("今天几号", NOW) == ("date", "今天是2026年10月17日 星期六")
+        assert answers.answer("明天星期几", NOW) == ("weekday", "明天是星期日（2026年10月18日）")
+        assert answers.answer("大后天几号", NOW) == ("date", "大后天是2026年10月20日 星期二")
+
+    def test_lunar(self, answers):
+        """测试农历日期"""
+        provider, answer = answers.answer("今天农历几号", NOW)
+
+        assert provider == "lunar"
+        assert answer.endswith("农历丙午马年九月初八")
+
+    def test_countdown(self, answers):
+        """测试节日倒计时（公历、农历、跨年）"""
+        assert answers.answer("双十一还有几天", NOW) == ("countdown", "距离双十一（2026年11月11日 星期三）还有25天")
+        assert answers.answer("距离春节还有多少天", NOW)[1] == "距离春节（2027年2月6日 星期六）还有112天"
+        assert answers.answer("除夕还有几天", NOW)[1] == "距离除夕（2027年2月5日 星期五）还有111天"
+        assert answers.answer("国庆还有几天", NOW)[1].startswith("距离国庆（2027年10月1日")
+        assert answers.answer("重阳节还有几天", datetime(2026, 10, 18))[1].startswith("今天就是重阳")
+        assert answers.answer("周末还有几天", datetime(2026, 10, 14))[1] == "距离周末（周六）还有3天"
+
+    def test_unanswerable(self, answers):
+        """测试不能本地回答的问题"""
+        assert answers.answer("北京天气怎么样", NOW) is None
+        assert answers.answer("原神什么时候更新", NOW) is None
+        assert answers.answer("考试还有几天", NOW) is None
+
+    @pytest.mark.parametrize("message", [
+        "我今天没时间", "时间过得好快", "哪天一起吃饭吧", "你几月生日", "明天几点出发",
+        "你周几有空", "我农历生日是初三", "日期定了吗",
+    ])
+    def test_chat_is_not_a_question(self, answers, message):
+        """测试日常聊天中提到时间、日期的词不会被当成提问"""
+        assert answers.answer(message, NOW) is None
+
+    @pytest.mark.parametrize("message, provider", [
+        ("现在几点", "time"), ("现在是什么时间", "time"), ("几点了", "time"),
+        ("今天是几月几号", "date"), ("明天是哪天", "date"), ("今天的日期", "date"),
+        ("今天星期几", "weekday"), ("星期几了", "weekday"), ("农历今天是几号", "lunar"),
+    ])
+    def test_question_forms(self, answers, message, provider):
+        """测试各种问法都能本地回答"""
+        assert answers.answer(message, NOW)[0] == provider
+
+    def test_register_provider(self, answers):
+        """测试注册自定义回答器"""
+        class VersionProvider(LocalAnswerProvider):
+            name = "version"
+
+            def answer(self, query, now):
+                return "1.0" if "版本" in query else None
+
+        answers.register(VersionProvider(), first=True)
+
+        assert answers.answer("现在是什么版本", NOW) == ("version", "1.0")
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
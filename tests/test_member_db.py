@@ -0,0 +1,66 @@
+"""群友信息缓存测试"""
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.memory.member_db as member_db_module
+from src.memory.member_db import MemberDatabase, MemberRecord
+
+
+class TestMemberDatabase:
+    """群友信息缓存测试类"""
+
+    @pytest.fixture
+    def member_db(self, database, writer, monkeypatch):
+        monkeypatch.setattr(member_db_module, "get_database", lambda: database)
+        monkeypatch.setattr(member_db_module, "get_write_behind", lambda: writer)
+        return MemberDatabase()
+
+    def _row(self, database, qq_id):
+        with database.get_connection() as conn:
+            return dict(conn.execute("SELECT * FROM group_member WHERE qq_id = ?", (qq_id,)).fetchone())
+
+    def test_activity_batched_until_flush(self, member_db, database, writer):
+        """测试已有群友的发言只更新内存，落盘时合并为一次更新"""
+        assert member_db.touch("20001", "路人甲") is False
+        assert member_db.add_or_update_member("20001", "路人甲", "甲")
+        assert self._row(database, "20001")["message_count"] == 1
+
+        for _ in range(3):
+            assert member_db.touch("20001", "路人甲", "新名片")
+        member = member_db.get_member("20001")
+        assert member["message_count"] == 4
+        assert member["group_card"] == "新名片"
+        assert self._row(database, "20001")["message_count"] == 1
+
+        writer.flush()
+        row = self._row(database, "20001")
+        assert row["message_count"] == 4
+        assert row["group_card"] == "新名片"
+        assert member_db.get_stats()['members_flushed'] == 1
+        assert member_db.get_stats()['pending'] == 0
+
+    def test_reload_keeps_pending_activity(self, member_db, database):
+        """测试缓存失效后重新读取时叠加未落盘的发言"""
+        member_db.add_or_update_member("20001", "路人甲")
+        member_db.add_or_update_member("20001", "路人甲")
+        member_db.set_remark("20001", "喜欢猫")
+
+        member = member_db.get_member("20001")
+        assert member["remark"] == "喜欢猫"
+        assert member["message_count"] == 2
+        assert self._row(database, "20001")["message_count"] == 1
+
+    def test_get_member_served_from_cache(self, member_db, database):
+        """测试读取群友信息不重复查库，返回的是副本"""
+        member_db.add_or_update_member("20001", "路人甲")
+        first = member_db.get_member("20001")
+        first["nickname"] = "被改掉"
+        assert member_db.get_member("20001")["nickname"] is None
+        assert member_db.get_stats()['cache']['hits'] >= 1
+        assert set(first) == set(self._row(database, "20001"))
+        assert not hasattr(MemberRecord.from_row(self._row(database, "20001")), "__dict__")
+        assert member_db.get_member("29999") is None
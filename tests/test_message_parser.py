@@ -0,0 +1,66 @@
+"""消息解析测试"""
+import json
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.helpers import contains_keyword, remove_at
+from src.utils.message_parser import ParsedMessage, get_parsed_message
+
+
+class TestParsedMessage:
+    """消息解析测试类"""
+
+    def test_at_and_text(self):
+        """测试@对象、去掉@的文本、纯文本"""
+        parsed = ParsedMessage(" [CQ:at,qq=123456] 舟舟看这个[CQ:face,id=178] [CQ:at,qq=all] ")
+
+        assert parsed.at_targets == ["123456"]
+        assert parsed.mentions("123456") and not parsed.mentions("654321")
+        assert parsed.text == remove_at(parsed.raw)
+        assert parsed.plain_text == "舟舟看这个"
+        assert [segment.type for segment in parsed.segments] == ["at", "face", "at"]
+
+    def test_keywords(self):
+        """测试关键词匹配与原实现一致（不区分大小写，忽略@）"""
+        keywords = ["天气", "Python", "笑话"]
+        for message in ["讲个笑话", "学PYTHON吗", "[CQ:at,qq=10086]你好", "今天天 气"]:
+            parsed = ParsedMessage(message)
+            assert parsed.contains_keyword(keywords) == contains_keyword(parsed.text, keywords)
+        assert not ParsedMessage("天气").contains_keyword([])
+
+    def test_json_card(self):
+        """测试解码QQ JSON卡片"""
+        card = {"meta": {"detail_1": {"title": "哔哩哔哩", "qqdocurl": "https://b23.tv/abc123?share=1"}}}
+        data = (json.dumps(card, ensure_ascii=False)
+                .replace(",", "&#44;").replace("[", "&#91;").replace("]", "&#93;"))
+        parsed = ParsedMessage(f"[CQ:json,data={data}]")
+
+        assert parsed.json_card == card
+        assert parsed.card_url == "https://b23.tv/abc123?share=1"
+        assert ParsedMessage("[CQ:json,data={broken]").card_url is None
+        assert ParsedMessage("普通消息").card_url is None
+
+    def test_lazy_tokens(self):
+        """测试分词在第一次使用时才计算，之后复用"""
+        parsed = ParsedMessage("[CQ:at,qq=1]我喜欢吃苹果")
+
+        assert "tokens" not in parsed.__dict__
+        assert "苹果" in parsed.tokens
+        assert parsed.tokens is parsed.tokens
+
+    def test_memoized_per_event(self):
+        """测试同一事件只解析一次"""
+        event = SimpleNamespace(raw_message="[CQ:at,qq=1] 你好")
+        other = SimpleNamespace(raw_message="[CQ:at,qq=1] 你好")
+
+        assert get_parsed_message(event) is get_parsed_message(event)
+        assert get_parsed_message(other) is not get_parsed_message(event)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
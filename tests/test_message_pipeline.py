@@ -0,0 +1,153 @@
+"""消息处理流水线测试"""
+import asyncio
+import time
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+from nonebot.adapters.onebot.v11 import GroupMessageEvent, Message
+from nonebot.adapters.onebot.v11.event import Sender
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import src.pipeline.message_pipeline as pipeline_module
+from src.pipeline.message_pipeline import (
+    MessagePipeline, TRIGGER_MENTION, TRIGGER_NAME, TRIGGER_KEYWORD, TRIGGER_SMART
+)
+from src.utils.config import Config
+
+CONFIG_TEXT = """
+bot:
+  qq_number: "10001"
+  admin_qq: "10002"
+  target_groups: ["111"]
+personality:
+  name: "沉舟"
+  nickname: "舟舟"
+keywords: ["天气"]
+features:
+  name_reply: {name_reply}
+"""
+
+
+def make_event(raw_message: str, group_id: int = 111) -> GroupMessageEvent:
+    """构造群消息事件"""
+    return GroupMessageEvent(
+        time=0, self_id=10001, post_type="message", sub_type="normal", user_id=20001,
+        message_type="group", message_id=1, message=Message(raw_message), original_message=Message(raw_message),
+        raw_message=raw_message, font=0, sender=Sender(user_id=20001, nickname="阿甲", card=""),
+        to_me=False, group_id=group_id
+    )
+
+
+class TestMessagePipeline:
+    """消息处理流水线测试类"""
+
+    @pytest.fixture
+    def stubs(self):
+        """过滤、联网搜索、记忆检索的替身（默认立即返回）"""
+        stubs = SimpleNamespace(filter_result=(False, ""), delay=0.0, cancelled=[])
+
+        async def stage(name, result):
+            try:
+                await asyncio.sleep(stubs.delay)
+            except asyncio.CancelledError:
+                stubs.cancelled.append(name)
+                raise
+            return result
+
+        async def should_ignore_message(text):
+            # 拒绝时立即返回，通过时和其他阶段一样耗时
+            await asyncio.sleep(0.01 if stubs.filter_result[0] else stubs.delay)
+            return stubs.filter_result
+
+        stubs.content_filter = SimpleNamespace(should_ignore_message=should_ignore_message)
+        stubs.web_search_client = SimpleNamespace(
+            should_search=lambda text: True,
+            search_async=lambda text: stage("search", "搜索结果")
+        )
+        stubs.memory_manager = SimpleNamespace(
+            vector_enabled=True,
+            search_related_memories=lambda text, session_id: stage("memories", "相关记忆")
+        )
+        return stubs
+
+    @pytest.fixture
+    def make_pipeline(self, tmp_path, stubs, monkeypatch):
+        def make_pipeline(name_reply: bool = True) -> MessagePipeline:
+            path = tmp_path / "config.yaml"
+            path.write_text(CONFIG_TEXT.format(name_reply=str(name_reply).lower()), encoding="utf-8")
+            config = Config(str(path))
+            monkeypatch.setattr(pipeline_module, "get_config", lambda: config)
+            monkeypatch.setattr(pipeline_module, "get_ai_client", lambda: None)
+            monkeypatch.setattr(pipeline_module, "get_memory_manager", lambda: stubs.memory_manager)
+            monkeypatch.setattr(pipeline_module, "get_web_search_client", lambda: stubs.web_search_client)
+            monkeypatch.setattr(pipeline_module, "get_content_filter", lambda: stubs.content_filter)
+            return MessagePipeline()
+        return make_pipeline
+
+    @pytest.mark.parametrize("raw_message, expected", [
+        ("[CQ:at,qq=10001] 舟舟今天天气怎么样", TRIGGER_MENTION),
+        ("舟舟今天天气怎么样", TRIGGER_NAME),
+        ("今天天气怎么样", TRIGGER_KEYWORD),
+        ("今天吃什么", TRIGGER_SMART),
+        ("舟舟快看 BV1xx411c7mD", None),
+        ("舟舟快看 BV1xx411c7mD 天气真好", TRIGGER_KEYWORD),
+        ("今天吃什么 BV1xx411c7mD", None),
+    ])
+    def test_trigger_priority(self, make_pipeline, raw_message, expected):
+        """测试触发优先级：@ > 名字 > 关键词 > 智能判断，带B站链接时跳过名字和智能触发"""
+        assert make_pipeline().prepare(make_event(raw_message)).trigger == expected
+
+    def test_non_target_group_and_disabled_name_reply(self, make_pipeline):
+        """测试非目标群不触发，关闭名字回复时由关键词触发"""
+        assert make_pipeline().prepare(make_event("舟舟今天天气怎么样", group_id=333)).trigger is None
+        assert make_pipeline(name_reply=False).prepare(make_event("舟舟今天天气怎么样")).trigger == TRIGGER_KEYWORD
+
+    def test_decline_falls_back_to_lower_trigger(self, make_pipeline):
+        """测试名字触发没有回复时交给关键词触发器，同一事件再次获取上下文时保持转交结果"""
+        pipeline = make_pipeline()
+        event = make_event("舟舟今天天气怎么样")
+        ctx = pipeline.prepare(event)
+
+        assert pipeline.decline(ctx) == TRIGGER_KEYWORD
+        assert pipeline.prepare(event).trigger == TRIGGER_KEYWORD
+        assert pipeline.decline(ctx) is None
+
+        ctx = pipeline.prepare(make_event("舟舟在吗"))
+        assert pipeline.decline(ctx) is None
+
+    @pytest.mark.asyncio
+    async def test_filter_rejection_cancels_prefetch(self, make_pipeline, stubs):
+        """测试过滤拒绝时取消联网搜索和记忆检索，并丢弃结果"""
+        stubs.filter_result = (True, "越狱尝试")
+        stubs.delay = 5
+        pipeline = make_pipeline()
+        ctx = pipeline.prepare(make_event("今天吃什么"))
+
+        start = time.perf_counter()
+        assert await pipeline.filter_and_prefetch(ctx) == (True, "越狱尝试")
+        assert time.perf_counter() - start < stubs.delay
+        assert sorted(stubs.cancelled) == ["memories", "search"]
+        assert ctx.search_context is None and ctx.related_memories is None
+
+    @pytest.mark.asyncio
+    async def test_prefetch_runs_alongside_filter(self, make_pipeline, stubs):
+        """测试过滤通过时搜索和记忆检索与过滤并行完成，之后的丰富阶段直接复用"""
+        stubs.delay = 0.2
+        pipeline = make_pipeline()
+        ctx = pipeline.prepare(make_event("今天吃什么"))
+
+        start = time.perf_counter()
+        assert await pipeline.filter_and_prefetch(ctx) == (False, "")
+        assert time.perf_counter() - start < stubs.delay * 2
+        assert ctx.search_context == "搜索结果"
+        assert ctx.related_memories == "相关记忆"
+        assert ctx.search_done and ctx.memories_done
+        assert stubs.cancelled == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
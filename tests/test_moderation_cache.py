@@ -0,0 +1,85 @@
+"""AI审核结论缓存测试"""
+import types
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils import moderation_cache
+from src.utils.content_filter import ContentFilter
+from src.utils.moderation_cache import ModerationCache, moderation_key
+
+
+class TestModerationCache:
+    """审核缓存测试类"""
+
+    @pytest.fixture(autouse=True)
+    def use_database(self, database, monkeypatch):
+        """审核缓存使用临时数据库"""
+        monkeypatch.setattr(moderation_cache, "get_database", lambda: database)
+
+    @pytest.fixture
+    def content_filter(self):
+        """创建使用模拟AI审核的过滤器"""
+        content_filter = ContentFilter()
+        content_filter.ai_filter_enabled = True
+        content_filter.verdict_cache_enabled = True
+        content_filter.calls = []
+
+        async def create(**kwargs):
+            content_filter.calls.append(kwargs["messages"][0]["content"])
+            answer = "YES|人身攻击" if "笨蛋" in kwargs["messages"][0]["content"] else "NO"
+            message = types.SimpleNamespace(content=answer)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+        content_filter.ai_client = types.SimpleNamespace(
+            model="test",
+            client=types.SimpleNamespace(chat=types.SimpleNamespace(
+                completions=types.SimpleNamespace(create=create)
+            ))
+        )
+        return content_filter
+
+    def test_key_ignores_symbols_and_cq_codes(self):
+        """测试缓存键去掉符号、空白和CQ码"""
+        assert moderation_key("哈哈哈！！") == moderation_key("哈 哈 哈~")
+        assert moderation_key("[CQ:face,id=178][CQ:face,id=66]") == ""
+
+    @pytest.mark.asyncio
+    async def test_repeated_messages_use_cached_verdict(self, content_filter):
+        """测试相同消息只调用一次AI审核"""
+        assert await content_filter._ai_check_content("哈哈哈哈") == (False, "")
+        assert await content_filter._ai_check_content("哈哈哈哈！") == (False, "")
+        assert await content_filter._ai_check_content("你这个笨蛋") == (True, "人身攻击")
+        assert await content_filter._ai_check_content("你这个笨蛋") == (True, "人身攻击")
+
+        assert len(content_filter.calls) == 2
+        stats = content_filter.get_stats()['verdict_cache']
+        assert stats['hits'] == 2
+        assert stats['saved_calls'] == 2
+
+    @pytest.mark.asyncio
+    async def test_short_and_emoji_messages_skip_ai(self, content_filter):
+        """测试很短或纯表情的消息不调用AI审核"""
+        assert await content_filter._ai_check_content("早安") == (False, "")
+        assert await content_filter._ai_check_content("[CQ:face,id=178]") == (False, "")
+
+        assert content_filter.calls == []
+        assert content_filter.get_stats()['verdict_cache']['skipped'] == 2
+
+    @pytest.mark.asyncio
+    async def test_verdicts_survive_restart(self):
+        """测试结论持久化，重启后仍然命中"""
+        cache = ModerationCache(maxsize=16, ttl=3600)
+        await cache.put(moderation_key("你这个笨蛋"), True, "人身攻击")
+
+        reloaded = ModerationCache(maxsize=16, ttl=3600)
+
+        assert reloaded.get(moderation_key("你这个笨蛋")) == (True, "人身攻击")
+        assert reloaded.get(moderation_key("没见过的消息")) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,45 @@
+"""本地审核模型测试"""
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.moderation_model import NgramNaiveBayes, char_ngrams
+
+SAMPLES = [
+    ("你这个笨蛋去死吧", True), ("滚开你这个垃圾", True), ("垃圾东西去死", True), ("笨蛋垃圾", True),
+    ("今天天气真好", False), ("晚上一起吃饭吗", False), ("这个游戏好好玩", False), ("早上好呀大家", False),
+    ("明天去公园玩", False), ("吃饭了吗", False),
+]
+
+
+class TestNgramNaiveBayes:
+    """朴素贝叶斯模型测试类"""
+
+    def test_ngrams_use_normalized_text(self):
+        """测试n-gram基于规范化文本（忽略符号）"""
+        assert char_ngrams("早，安!", max_n=2) == ["早", "安", "早安"]
+
+    def test_separates_classes(self):
+        """测试训练后能区分两类消息"""
+        model = NgramNaiveBayes().train(SAMPLES)
+
+        assert model.is_trained
+        assert model.predict_proba("你就是个垃圾笨蛋") > 0.9
+        assert model.predict_proba("大家晚上好呀一起玩游戏") < 0.1
+
+    def test_save_and_load(self, tmp_path):
+        """测试保存后加载的模型预测一致"""
+        model = NgramNaiveBayes().train(SAMPLES)
+        path = str(tmp_path / "model.json")
+        model.save(path)
+
+        loaded = NgramNaiveBayes.load(path)
+
+        assert loaded.predict_proba("去死吧垃圾") == pytest.approx(model.predict_proba("去死吧垃圾"))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,57 @@
+"""流式回复分句测试"""
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.ai.streaming import SentenceChunker
+
+
+def feed_all(chunker: SentenceChunker, tokens):
+    """逐个token喂入，返回切出的全部句子块（含结尾剩余）"""
+    chunks = []
+    for token in tokens:
+        chunks.extend(chunker.feed(token))
+    rest = chunker.flush()
+    if rest:
+        chunks.append(rest)
+    return chunks
+
+
+class TestSentenceChunker:
+    """分句器测试类"""
+
+    def test_splits_on_sentence_endings(self):
+        """测试按中文句末标点切分，token边界不影响结果"""
+        text = "今天天气真的很不错呢。要不要一起出去走走呀？我想去公园看看花~"
+        tokens = [text[i:i + 3] for i in range(0, len(text), 3)]
+
+        chunks = feed_all(SentenceChunker(min_chars=4), tokens)
+
+        assert chunks == ["今天天气真的很不错呢。", "要不要一起出去走走呀？", "我想去公园看看花~"]
+
+    def test_keeps_punctuation_runs_and_quotes_together(self):
+        """测试连续标点和右引号归到同一句"""
+        chunks = feed_all(SentenceChunker(min_chars=2), ["他说“真的吗？！”", "然后就走了……", "嗯"])
+
+        assert chunks == ["他说“真的吗？！”", "然后就走了……", "嗯"]
+
+    def test_merges_short_sentences(self):
+        """测试过短的句子与下一句合并"""
+        chunks = feed_all(SentenceChunker(min_chars=8), list("嗯。好的。那我们明天见吧！"))
+
+        assert chunks == ["嗯。好的。那我们明天见吧！"]
+
+    def test_waits_for_next_char_before_cutting(self):
+        """测试句末标点后还没有新内容时先不切分"""
+        chunker = SentenceChunker(min_chars=2)
+
+        assert chunker.feed("你好呀。") == []
+        assert chunker.feed("在吗") == ["你好呀。"]
+        assert chunker.flush() == "在吗"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,198 @@
+"""本地向量索引测试"""
+import numpy as np
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.memory.vector_index import LocalVectorIndex
+
+DIM = 16
+
+
+def make_items(count, seed=0, start=0):
+    """生成随机向量和元数据（两个群、三个发送者、按分钟递增的时间）"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, DIM)).astype(np.float32)
+    items = []
+    for i in range(count):
+        n = start + i
+        items.append((f"m{n}", vectors[i], f"消息{n}", {
+            "sender_id": f"{n % 3}",
+            "sender_name": f"群友{n % 3}",
+            "chat_type": "group",
+            "session_id": f"group:{n % 2}",
+            "timestamp": f"2026-10-17T{10 + n // 60:02d}:{n % 60:02d}:00",
+        }))
+    return items
+
+
+def brute_force(items, query, k, keep=lambda item: True):
+    """参考实现：逐条计算平方L2距离"""
+    scored = sorted(
+        (float(((np.asarray(item[1]) - query) ** 2).sum()), item[0]) for item in items if keep(item)
+    )
+    return [item_id for _, item_id in scored[:k]]
+
+
+class TestLocalVectorIndex:
+    """本地向量索引测试类"""
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = LocalVectorIndex(str(tmp_path / "vectors"))
+        yield index
+        index.close()
+
+    def test_query_matches_brute_force(self, index):
+        """测试精确检索结果、距离与逐条计算一致，重复ID被忽略"""
+        items = make_items(200)
+        assert index.add_many(items) == 200
+        assert index.add(*items[0]) is False
+
+        query = items[5][1] + 0.01
+        results = index.query(query, 5)
+        assert [r['id'] for r in results] == brute_force(items, query, 5)
+        assert results[0]['content'] == "消息5"
+        assert results[0]['distance'] == pytest.approx(((items[5][1] - query) ** 2).sum(), abs=1e-3)
+        assert index.count() == 200
+
+    def test_failed_first_batch_keeps_dim_unset(self, index, tmp_path):
+        """测试第一批写入失败时维度一起回滚，之后可以写入其他维度的向量"""
+        bad = [("x0", np.ones(8, dtype=np.float32), "坏数据", None)]
+        with pytest.raises(AttributeError):
+            index.add_many(bad)
+        assert index.dim is None and index.count() == 0
+
+        items = make_items(10)
+        assert index.add_many(items) == 10
+        assert index.query(items[3][1], 1)[0]['id'] == "m3"
+        index.close()
+
+        reopened = LocalVectorIndex(str(tmp_path / "vectors"))
+        assert reopened.dim == DIM and reopened.count() == 10
+        reopened.close()
+
+    def test_filters(self, index):
+        """测试按会话、发送者、时间范围过滤"""
+        items = make_items(120)
+        index.add_many(items)
+        query = items[7][1]
+
+        results = index.query(query, 10, session_id="group:1", sender_id="1")
+        expected = brute_force(items, query, 10, lambda item: item[3]["session_id"] == "group:1"
+                               and item[3]["sender_id"] == "1")
+        assert [r['id'] for r in results] == expected
+
+        results = index.query(query, 200, since="2026-10-17T10:30:00", until="2026-10-17T11:00:00")
+        assert len(results) == 31
+        assert index.query(query, 5, session_id="group:999") == []
+
+    @pytest.mark.parametrize("quantization", ["none", "float16", "int8"])
+    def test_persistence_delete_and_compact(self, tmp_path, quantization):
+        """测试重新打开后数据完整，删除后压缩，残留的向量被截断"""
+        path = str(tmp_path / "vectors")
+        items = make_items(50)
+        index = LocalVectorIndex(path, quantization=quantization, rerank_factor=10)
+        index.add_many(items[:30])
+        index.add_many(items[30:])
+        assert index.delete(["m1", "m2", "m3"]) == 3
+        index.close()
+
+        # 模拟元数据提交前崩溃：向量文件多出一行
+        with open(Path(path) / "vectors.f32", "ab") as f:
+            np.ones(DIM, dtype=np.float32).tofile(f)
+
+        index = LocalVectorIndex(path, quantization=quantization, rerank_factor=10)
+        assert index.count() == 47
+        assert index.get_stats()['deleted'] == 3
+        query = items[40][1]
+        before = [r['id'] for r in index.query(query, 5)]
+        assert "m1" not in [r['id'] for r in index.query(items[1][1], 47)]
+
+        assert index.compact() == 3
+        assert index.get_stats()['rows'] == 47
+        assert [r['id'] for r in index.query(query, 5)] == before
+        extra = make_items(5, seed=1, start=50)
+        index.add_many(extra)
+        index.close()
+
+        index = LocalVectorIndex(path, quantization=quantization, rerank_factor=10)
+        assert index.count() == 52
+        alive = [item for item in items if item[0] not in ("m1", "m2", "m3")] + extra
+        assert [r['id'] for r in index.query(query, 5)] == brute_force(alive, query, 5)
+        index.close()
+
+    def test_ivf_recall(self, tmp_path):
+        """测试IVF近似检索的召回率，训练后新增的向量也能检索到"""
+        rng = np.random.default_rng(1)
+        centers = rng.standard_normal((20, DIM)).astype(np.float32) * 5
+        vectors = centers[rng.integers(0, 20, 2000)] + rng.standard_normal((2000, DIM)).astype(np.float32)
+        items = [(f"m{i}", vectors[i], f"消息{i}", {"session_id": "group:1", "timestamp": ""}) for i in range(2000)]
+
+        index = LocalVectorIndex(str(tmp_path / "vectors"), index="ivf", ivf_min_size=1000, ivf_nprobe=4)
+        index.add_many(items[:1500])
+        assert index.get_stats()['ivf_lists'] > 0
+        index.add_many(items[1500:])
+
+        hits = 0
+        for i in range(0, 2000, 40):
+            expected = set(brute_force(items, vectors[i], 10))
+            hits += len(expected & {r['id'] for r in index.query(vectors[i], 10)})
+        assert hits / (50 * 10) >= 0.9
+        assert index.query(vectors[1999], 1)[0]['id'] == "m1999"
+        index.close()
+
+    def test_ivf_retrained_as_index_grows(self, tmp_path):
+        """测试数据量翻倍后重新训练IVF（簇数增加），重新打开后仍记得训练时的条数"""
+        path = str(tmp_path / "vectors")
+        items = make_items(2000)
+        index = LocalVectorIndex(path, index="ivf", ivf_min_size=500)
+        index.add_many(items[:500])
+        assert index.get_stats()['ivf_lists'] == 22
+        index.add_many(items[500:999])
+        assert index.get_stats()['ivf_trained_size'] == 500
+        index.add_many(items[999:1000])
+        stats = index.get_stats()
+        assert stats['ivf_trained_size'] == 1000
+        assert stats['ivf_lists'] == 31
+        index.close()
+
+        index = LocalVectorIndex(path, index="ivf", ivf_min_size=500)
+        assert index.get_stats()['ivf_trained_size'] == 1000
+        index.add_many(items[1000:1999])
+        assert index.get_stats()['ivf_lists'] == 31
+        index.add_many(items[1999:])
+        assert index.get_stats()['ivf_lists'] == 44
+        index.close()
+
+    @pytest.mark.parametrize("quantization", ["float16", "int8"])
+    def test_quantization_rerank(self, tmp_path, quantization):
+        """测试量化后重排的召回率，返回的距离是全精度距离"""
+        items = make_items(3000, seed=2)
+        index = LocalVectorIndex(str(tmp_path / "vectors"), quantization=quantization, rerank_factor=4)
+        index.add_many(items)
+        stats = index.get_stats()
+        assert stats['quantization'] == quantization
+        assert stats['matrix_mb'] < 3000 * DIM * 4 / 1024 / 1024
+
+        rng = np.random.default_rng(3)
+        hits = 0
+        for _ in range(50):
+            query = rng.standard_normal(DIM).astype(np.float32)
+            results = index.query(query, 10)
+            hits += len(set(brute_force(items, query, 10)) & {r['id'] for r in results})
+            vector = next(item[1] for item in items if item[0] == results[0]['id'])
+            assert results[0]['distance'] == pytest.approx(float(((vector - query) ** 2).sum()), rel=1e-4)
+        assert hits / (50 * 10) >= 0.97
+
+        # 过滤后的检索也经过重排
+        results = index.query(items[8][1], 3, session_id="group:0")
+        assert results[0]['id'] == "m8"
+        index.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
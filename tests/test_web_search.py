@@ -0,0 +1,155 @@
+"""联网搜索测试"""
+import time
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.search_scorer import SearchScorer
+from src.utils.web_search import DEFAULT_RESULT_TTL, WebSearchClient, classify_query
+
+
+class TestSearchDecision:
+    """搜索判断测试类"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        """创建使用模拟AI判断的客户端"""
+        client = WebSearchClient()
+        client.enabled = True
+        client.ai_calls = []
+
+        def ai_should_search(message):
+            client.ai_calls.append(message)
+            return True
+
+        monkeypatch.setattr(client, "_ai_should_search", ai_should_search)
+        return client
+
+    def test_scorer_clear_cases(self):
+        """测试规则打分能判断明确的情况"""
+        scorer = SearchScorer()
+
+        assert scorer.decide("上海明天会下雨吗") is True
+        assert scorer.decide("原神什么时候更新") is True
+        assert scorer.decide("帮我写首诗") is False
+        assert scorer.decide("舟舟在吗") is False
+
+    def test_ai_only_for_ambiguous_messages(self, client):
+        """测试只有拿不准的消息才调用AI判断"""
+        assert client.should_search("今天天气怎么样") is True
+        assert client.should_search("马斯克最近在干嘛") is True
+        assert client.should_search("我好累啊") is False
+        assert client.should_search("周杰伦新专辑叫什么") is True
+
+        assert client.ai_calls == ["周杰伦新专辑叫什么"]
+        decisions = client.get_stats()['decisions']
+        assert decisions['keyword'] == {"search": 1, "skip": 0}
+        assert decisions['rule'] == {"search": 1, "skip": 1}
+        assert decisions['ai'] == {"search": 1, "skip": 0}
+
+    def test_decisions_are_memoized(self, client):
+        """测试相同消息（忽略符号）的判断结果被缓存"""
+        client.should_search("周杰伦新专辑叫什么")
+        client.should_search("周杰伦新专辑叫什么？？")
+
+        assert len(client.ai_calls) == 1
+        assert client.get_stats()['decisions']['cache'] == {"search": 1, "skip": 0}
+
+    def test_ai_failure_is_not_cached(self, client, monkeypatch):
+        """测试AI判断失败时不搜索也不缓存"""
+        monkeypatch.setattr(client, "_ai_should_search", lambda message: None)
+
+        assert client.should_search("周杰伦新专辑叫什么") is False
+        assert "周杰伦新专辑叫什么" not in client._decisions
+
+
+class TestSearchCache:
+    """搜索结果缓存测试类"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        """创建使用模拟搜索请求的客户端"""
+        client = WebSearchClient()
+        client.enabled = True
+        client.queries = []
+
+        def search(query):
+            client.queries.append(query)
+            time.sleep(0.05)
+            return f"结果: {query}"
+
+        monkeypatch.setattr(client, "search", search)
+        return client
+
+    def test_classify_query(self):
+        """测试按关键词划分查询类别"""
+        assert classify_query("北京今天天气") == "weather"
+        assert classify_query("美元汇率多少") == "finance"
+        assert classify_query("今天有什么新闻") == "news"
+        assert classify_query("原神什么时候更新") == "default"
+
+    @pytest.mark.asyncio
+    async def test_time_answered_locally(self, client):
+        """测试时间问题不联网"""
+        answer = await client.search_async("现在几点了")
+
+        assert answer.startswith("现在是")
+        assert client.queries == []
+        assert client.get_stats()['search']['local'] == 1
+
+    def test_local_answer_triggers_search_without_api_key(self, client):
+        """测试本地能回答的问题在未配置搜索服务时也会"搜索"（走本地回答）"""
+        client.enabled = False
+
+        assert client.should_search("国庆还有几天") is True
+        assert client.should_search("北京天气怎么样") is False
+        assert client.should_search("我今天没时间") is False
+
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_are_coalesced(self, client):
+        """测试相同的并发搜索只请求一次，之后命中缓存"""
+        results = await asyncio.gather(
+            client.search_async("北京天气怎么样"),
+            client.search_async("北京天气怎么样？"),
+            client.search_async("美元汇率多少")
+        )
+        again = await client.search_async("北京天气怎么样")
+
+        assert results[0] == results[1] == again == "结果: 北京天气怎么样"
+        assert sorted(client.queries) == sorted(["北京天气怎么样", "美元汇率多少"])
+        stats = client.get_stats()['search']
+        assert stats['coalesced'] == 1
+        assert stats['hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_results_cached_per_class(self, client):
+        """测试每类结果存入各自的缓存（使用各自的缓存时间）"""
+        await client.search_async("美元汇率多少")
+        await client.search_async("北京天气怎么样")
+        await client.search_async("今天有什么新闻")
+        await client.search_async("原神什么时候更新")
+
+        ttl = {**DEFAULT_RESULT_TTL, **(client.config.get("web_search.result_cache.ttl", {}) or {})}
+        for query_class in ("finance", "weather", "news", "default"):
+            cache = client._results[query_class]
+            assert len(cache) == 1, query_class
+            assert cache.ttl == ttl[query_class]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_search(self, client):
+        """测试一个调用方被取消时，其他调用方仍能拿到结果"""
+        first = asyncio.create_task(client.search_async("今天有什么新闻"))
+        second = asyncio.create_task(client.search_async("今天有什么新闻"))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "结果: 今天有什么新闻"
+        assert len(client.queries) == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
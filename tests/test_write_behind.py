@@ -0,0 +1,120 @@
+"""后台批量写入测试"""
+import pytest
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.memory import memory_manager
+
+
+class TestWriteBehindQueue:
+    """后台批量写入测试类"""
+
+    def test_chat_logs_written_in_one_flush(self, writer):
+        """测试聊天记录排队后一次性写入"""
+        for i in range(3):
+            writer.add_chat_log(("group:111", "group", "10001", "测试", "text", f"消息{i}", 0, f"2024-01-01T00:00:0{i}"))
+
+        with writer.db.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM chat_log").fetchone()[0] == 0
+
+        writer.flush()
+
+        with writer.db.get_connection() as conn:
+            rows = conn.execute("SELECT message_content FROM chat_log ORDER BY id").fetchall()
+        assert [row[0] for row in rows] == ["消息0", "消息1", "消息2"]
+        assert writer.get_stats()['flushes'] == 1
+
+    def test_context_appends_only_new_messages(self, writer):
+        """测试上下文只追加新消息，同一会话排队中的消息一次写入，删除会覆盖未写入的消息"""
+        writer.append_context("group:111", {"role": "user", "content": "一", "name": "甲"}, "2024-01-01T00:00:00", 1)
+        writer.append_context("group:111", {"role": "assistant", "content": "二"}, "2024-01-01T00:00:01", 2)
+        writer.append_context("private:10001", {"role": "user", "content": "三"}, "2024-01-01T00:00:02", 1)
+        writer.delete_context("private:10001")
+
+        pending = writer.get_pending_context("private:10001")
+        assert pending['reset'] is True and pending['messages'] == []
+        writer.flush()
+        writer.append_context("group:111", {"role": "user", "content": "四"}, "2024-01-01T00:00:03", 3)
+        writer.flush()
+
+        with writer.db.get_connection() as conn:
+            contexts = conn.execute("SELECT session_id, chat_type, message_count, last_active FROM conversation_context").fetchall()
+            messages = conn.execute("SELECT session_id, content, name FROM context_message ORDER BY id").fetchall()
+        assert [tuple(row) for row in contexts] == [("group:111", "group", 3, "2024-01-01T00:00:03")]
+        assert [tuple(row) for row in messages] == [
+            ("group:111", "一", "甲"), ("group:111", "二", None), ("group:111", "四", None)
+        ]
+        assert writer.get_stats()['contexts_coalesced'] == 1
+
+    def test_context_trimmed_to_window(self, writer):
+        """测试数据库中只保留最近的上下文消息"""
+        writer.context_keep = 3
+        for i in range(5):
+            writer.append_context("group:111", {"role": "user", "content": f"消息{i}"}, "2024-01-01T00:00:00", i + 1)
+        writer.flush()
+
+        with writer.db.get_connection() as conn:
+            rows = conn.execute("SELECT content FROM context_message ORDER BY id").fetchall()
+        assert [row[0] for row in rows] == ["消息2", "消息3", "消息4"]
+
+    def test_failed_chat_logs_retried_first(self, writer, monkeypatch):
+        """测试聊天记录写入失败时不丢失，下次落盘时排在新记录前面重试"""
+        write_chat_logs = writer._write_chat_logs
+        calls = []
+
+        def flaky(rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            write_chat_logs(rows)
+
+        monkeypatch.setattr(writer, "_write_chat_logs", flaky)
+        for i in range(2):
+            writer.add_chat_log(("group:111", "group", "10001", "测试", "text", f"消息{i}", 0, f"2024-01-01T00:00:0{i}"))
+        with pytest.raises(RuntimeError):
+            writer.flush()
+        assert writer.get_stats()['pending_rows'] == 2
+
+        writer.add_chat_log(("group:111", "group", "10001", "测试", "text", "消息2", 0, "2024-01-01T00:00:02"))
+        writer.flush()
+
+        with writer.db.get_connection() as conn:
+            rows = conn.execute("SELECT message_content FROM chat_log ORDER BY id").fetchall()
+        assert [row[0] for row in rows] == ["消息0", "消息1", "消息2"]
+        assert calls == [2, 3]
+        stats = writer.get_stats()
+        assert stats['rows_retried'] == 2
+        assert stats['pending_rows'] == 0
+
+    @pytest.mark.asyncio
+    async def test_recent_messages_include_pending_rows(self, writer, monkeypatch):
+        """测试最近消息包含尚未落盘的聊天记录，且不重复"""
+        monkeypatch.setattr(memory_manager, "get_database", lambda: writer.db)
+        monkeypatch.setattr(memory_manager, "get_write_behind", lambda: writer)
+        monkeypatch.setattr(memory_manager, "get_context_manager", lambda: None)
+        monkeypatch.setattr(memory_manager, "get_vector_store", lambda: None)
+        manager = memory_manager.MemoryManager()
+
+        for i in range(3):
+            writer.add_chat_log(("group:111", "group", "10001", "甲", "text", f"消息{i}", 0, f"2024-01-01T00:00:0{i}"))
+        writer.flush()
+        writer.add_chat_log(("group:111", "group", "0", "舟舟", "text", "消息3", 1, "2024-01-01T00:00:03"))
+        writer.add_chat_log(("group:222", "group", "10001", "甲", "text", "别的群", 0, "2024-01-01T00:00:04"))
+
+        messages = await manager.get_recent_messages("group:111", limit=3)
+        assert [m['content'] for m in messages] == ["消息1", "消息2", "消息3"]
+        assert messages[-1]['role'] == "assistant"
+
+        # 队列快照之后、查询数据库之前落盘的记录只出现一次
+        pending = writer.get_pending_chat_logs("group:111")
+        writer.flush()
+        monkeypatch.setattr(writer, "get_pending_chat_logs", lambda session_id: pending)
+        messages = await manager.get_recent_messages("group:111", limit=10)
+        assert [m['content'] for m in messages] == ["消息0", "消息1", "消息2", "消息3"]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
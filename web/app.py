@@ -31,6 +31,15 @@ LOG_DIR = BASE_DIR / 'data' / 'logs'
 DB_PATH = BASE_DIR / 'data' / 'bot.db'
 
 
+def get_db_connection():
+    """打开数据库连接（WAL模式 + 忙等待，和机器人进程并发读写时不会报 database is locked）"""
+    import sqlite3
+    conn = sqlite3.connect(DB_PATH, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
 class BotManager:
     """Bot进程管理器"""
     
@@ -275,8 +284,11 @@ def config():
                 # 确保目录存在
                 CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
                 
-                with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+                # 先写临时文件再替换，机器人热加载时不会读到写了一半的配置
+                tmp_path = CONFIG_PATH.with_suffix('.yaml.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
                     yaml.dump(data['config'], f, allow_unicode=True, default_flow_style=False)
+                os.replace(tmp_path, CONFIG_PATH)
             
             # 保存环境变量
             if 'env' in data:
@@ -296,8 +308,7 @@ def stats_today():
     """今日统计"""
     try:
         # 从数据库读取统计数据
-        import sqlite3
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         today = datetime.now().strftime('%Y-%m-%d')
@@ -351,8 +362,7 @@ def recent_logs():
 def get_members():
     """获取群友列表"""
     try:
-        import sqlite3
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -387,10 +397,9 @@ def get_members():
 def update_member(qq_id):
     """更新群友信息"""
     try:
-        import sqlite3
         data = request.json
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # 更新群友信息